@@ -5,9 +5,13 @@ from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.shortcuts import render
+from django.utils.html import strip_tags
 from django.utils.safestring import mark_safe
 
-from notes.helpers.numskull import append_turn, ask_openai, get_history, relevant_context
+from notes import answer_cache
+from notes.helpers.numskull import (
+    append_turn, ask_openai, get_history, relevant_context, stream_answer, wants_stream,
+)
 from notes.helpers.site_help import match_site_help
 from notes.models import InfoBotQuery
 from notes.utils import search_similar
@@ -90,10 +94,52 @@ def chat_view(request):
             """
 
             context_key = f"chat:{subject_name}"
-            messages = get_history(request, context_key) + [
+            history = get_history(request, context_key)
+
+            # Opening questions can reuse an answer already given in this
+            # subject (notes/answer_cache.py); follow-ups always go to the model.
+            question_vec = None
+            if not history:
+                question_vec, cached = answer_cache.lookup(context_key, query)
+                if cached:
+                    # Chat logs store the rendered HTML; history wants the text.
+                    append_turn(request, context_key, query, strip_tags(cached.answer))
+                    answer = mark_safe(cached.answer)
+                    log = InfoBotQuery.objects.create(
+                        question=query,
+                        answer=cached.answer,
+                        sources=cached.sources,
+                        source_type='ai',
+                        context_key=context_key,
+                        cached_from=cached,
+                    )
+                    if is_ajax:
+                        return JsonResponse({"answer": answer, "query_id": log.id})
+                    return render(request, "chat/chat.html", {"query": query, "answer": answer, "notes": retrieved_notes})
+
+            messages = history + [
                 {"role": "user", "content": prompt}
             ]
 
+            def finish(raw_answer):
+                """Record the exchange; return the JSON body for the answer."""
+                raw_answer = raw_answer.strip()
+                append_turn(request, context_key, query, raw_answer)
+
+                answer_html = _markdown_to_html(raw_answer)
+                log = InfoBotQuery.objects.create(
+                    question=query,
+                    answer=answer_html,
+                    sources=", ".join(note.title for _, note in retrieved),
+                    source_type='ai',
+                    context_key=context_key,
+                    query_embedding=question_vec,
+                )
+                return {"answer": answer_html, "query_id": log.id}
+
+            if is_ajax and wants_stream(request):
+                return stream_answer(request, messages, finish)
+
             raw_answer, error = ask_openai(messages)
             if error:
                 answer = mark_safe(f"<p>{error}</p>")
@@ -101,19 +147,9 @@ def chat_view(request):
                     return JsonResponse({"answer": answer, "query_id": None})
                 return render(request, "chat/chat.html", {"query": query, "answer": answer, "notes": []})
 
-            raw_answer = raw_answer.strip()
-            append_turn(request, context_key, query, raw_answer)
-
-            answer_html = _markdown_to_html(raw_answer)
-            answer = mark_safe(answer_html)
-
-            log = InfoBotQuery.objects.create(
-                question=query,
-                answer=answer_html,
-                sources=", ".join(note.title for _, note in retrieved),
-                source_type='ai',
-            )
-            query_id = log.id
+            result = finish(raw_answer)
+            answer = mark_safe(result["answer"])
+            query_id = result["query_id"]
 
     if is_ajax:
         return JsonResponse({"answer": answer or "", "query_id": query_id})
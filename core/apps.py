@@ -6,7 +6,13 @@ class CoreConfig(AppConfig):
     name = 'core'
 
     def ready(self):
+        import core.signals  # noqa: F401
+
         # Without this, every LaTeX render spawns a node process that crashes
         # on startup under uWSGI. See core/katex_warmup.py for the details.
         from .katex_warmup import warm_katex_options
         warm_katex_options()
+        # Formulas go to one long-lived KaTeX process rather than a process
+        # each. See core/katex_server.py.
+        from .katex_server import install
+        install()
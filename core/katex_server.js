@@ -0,0 +1,100 @@
+// Long-lived KaTeX renderer for core/katex_server.py.
+//
+// Runs inside markdown-katex's bundled node binary (PKG_EXECPATH set to the
+// binary makes it run this script instead of its CLI), so it renders with the
+// very KaTeX build that binary does. Options are parsed by the CLI's own
+// commander program, so the HTML is byte-for-byte what `katex --input` writes.
+//
+// Protocol, on stdin/stdout: each frame is a 4-byte big-endian length followed
+// by that many bytes of UTF-8 JSON.
+//   request:  {"id": 1, "items": [[["--display-mode"], "x^2"], ...]}
+//   response: {"id": 1, "results": [{"html": "..."} | {"error": "..."}, ...]}
+// A request carries any number of formulas; results come back in order.
+/* eslint no-console:0 */
+"use strict";
+
+const fs = require("fs");
+const path = require("path");
+
+const KATEX_DIR = process.env.KATEX_DIR || "/snapshot/KaTeX";
+const katex = require(KATEX_DIR);
+const CLI = require.resolve(path.join(KATEX_DIR, "cli.js"));
+const COMMANDER = path.dirname(require.resolve("commander", {paths: [KATEX_DIR]}));
+
+const optionsByArgs = new Map();
+
+// The options `katex <args>` would pass to renderToString (see cli.js).
+function optionsFor(args) {
+    const key = JSON.stringify(args);
+    if (!optionsByArgs.has(key)) {
+        // commander keeps parsed values on its program, so every argument list
+        // gets a freshly loaded one.
+        for (const id of Object.keys(require.cache)) {
+            if (id === CLI || id.indexOf(COMMANDER) === 0) {
+                delete require.cache[id];
+            }
+        }
+        const program = require(CLI);
+        if (program.exitOverride) {
+            program.exitOverride();
+        }
+        const options = program.parse(["node", "katex"].concat(args)).opts();
+        let macroStrings = [];
+        if (options.macroFile) {
+            macroStrings = fs.readFileSync(options.macroFile, "utf-8").toString().split("\n");
+        }
+        macroStrings = macroStrings.concat(options.macro);
+        const macros = {};
+        for (const m of macroStrings) {
+            const i = m.search(":");
+            if (i !== -1) {
+                macros[m.substring(0, i).trim()] = m.substring(i + 1).trim();
+            }
+        }
+        options.macros = macros;
+        options.output = options.format;
+        optionsByArgs.set(key, options);
+    }
+    return optionsByArgs.get(key);
+}
+
+function render(item) {
+    const args = item[0];
+    const tex = item[1];
+    try {
+        // renderToString fills in options.macros with \gdef's, so each formula
+        // gets its own copy, as a fresh CLI process would.
+        const options = Object.assign({}, optionsFor(args));
+        options.macros = Object.assign({}, options.macros);
+        return {html: katex.renderToString(tex, options)};
+    } catch (e) {
+        return {error: String((e && e.message) || e)};
+    }
+}
+
+function send(message) {
+    const body = Buffer.from(JSON.stringify(message), "utf-8");
+    const header = Buffer.alloc(4);
+    header.writeUInt32BE(body.length, 0);
+    process.stdout.write(Buffer.concat([header, body]));
+}
+
+let pending = Buffer.alloc(0);
+
+process.stdin.on("data", function(chunk) {
+    pending = Buffer.concat([pending, chunk]);
+    while (pending.length >= 4) {
+        const length = pending.readUInt32BE(0);
+        if (pending.length < 4 + length) {
+            break;
+        }
+        const request = JSON.parse(pending.slice(4, 4 + length).toString("utf-8"));
+        pending = pending.slice(4 + length);
+        send({id: request.id, results: request.items.map(render)});
+    }
+});
+
+// The client closing the pipe is the signal to stop.
+process.stdin.on("end", function() {
+    process.exit(0);
+});
@@ -0,0 +1,241 @@
+"""Render KaTeX in one long-lived node process instead of one per formula.
+
+markdown-katex renders each formula by running its bundled node binary on a
+temp file (``wrapper.tex2html``): a 37 MB process started, parsed and torn
+down per formula, ~130 ms each before katex_warmup.py's fix and still most of
+every render after it. A question with a dozen formulas spent over a second in
+process start-up alone.
+
+``install()`` (called from CoreConfig.ready) swaps ``wrapper.tex2html`` for
+``tex2html`` below, which sends the formula to a ``katex_server.js`` process
+started on first use and kept for the life of the worker, over a pipe with
+length-prefixed JSON frames. The server runs in the same bundled binary with
+the CLI's own option parsing, so the HTML is identical to the CLI's.
+
+Many formulas can go in one round trip: ``batched(render, texts)`` renders
+``texts`` once collecting their formulas, sends them all at once, then renders
+again from the results. rerender_content uses it.
+
+Anything wrong with the server (markdown-katex resolving a user-installed
+katex instead of its bundled binary, a crash, a hang past
+KATEX_SERVER_TIMEOUT) falls back to the CLI, and the server is retried after
+RETRY_AFTER seconds. A TeX error is not a server failure: it raises
+wrapper.KatexError, as the CLI does.
+"""
+import atexit
+import json
+import logging
+import os
+import select
+import struct
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SCRIPT = Path(__file__).with_name("katex_server.js")
+HEADER = struct.Struct(">I")
+RETRY_AFTER = 60
+
+_cli_tex2html = None
+_local = threading.local()
+
+
+class KatexServerError(Exception):
+    """The server could not answer; the caller renders with the CLI instead."""
+
+
+class KatexServer:
+    """One katex_server.js process, owned by the process that started it."""
+
+    def __init__(self, binary):
+        self.binary = binary
+        self._lock = threading.Lock()
+        self._proc = None
+        self._pid = None
+        self._next_id = 0
+        self._down_until = 0
+
+    def _start(self):
+        self._proc = subprocess.Popen(
+            [self.binary, str(SCRIPT)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            # stderr is never read, and an inherited uWSGI datagram socket
+            # kills node 10 at boot (see katex_warmup.py).
+            stderr=subprocess.DEVNULL,
+            env={**os.environ, "PKG_EXECPATH": self.binary},
+        )
+        self._pid = os.getpid()
+
+    def close(self):
+        proc, self._proc = self._proc, None
+        # After a fork the process belongs to the parent: leave it running.
+        if proc is None or self._pid != os.getpid():
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=1)
+        except Exception:
+            proc.kill()
+
+    def _read(self, size, deadline):
+        data = b""
+        fd = self._proc.stdout.fileno()
+        while len(data) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise KatexServerError("timed out")
+            chunk = os.read(fd, size - len(data))
+            if not chunk:
+                raise KatexServerError(f"exited with {self._proc.poll()}")
+            data += chunk
+        return data
+
+    def _round_trip(self, items):
+        self._next_id += 1
+        body = json.dumps({"id": self._next_id, "items": items}).encode()
+        self._proc.stdin.write(HEADER.pack(len(body)) + body)
+        self._proc.stdin.flush()
+
+        deadline = time.monotonic() + getattr(settings, "KATEX_SERVER_TIMEOUT", 10)
+        size, = HEADER.unpack(self._read(HEADER.size, deadline))
+        response = json.loads(self._read(size, deadline))
+        if response.get("id") != self._next_id or len(response["results"]) != len(items):
+            raise KatexServerError("response out of step with the request")
+        return response["results"]
+
+    def render(self, items):
+        """[(args, tex), ...] -> [{"html": ...} or {"error": ...}, ...], in order."""
+        with self._lock:
+            if time.monotonic() < self._down_until:
+                raise KatexServerError("down after a recent failure")
+            try:
+                if self._pid != os.getpid() or self._proc is None or self._proc.poll() is not None:
+                    self.close()
+                    self._start()
+                return self._round_trip(items)
+            except (OSError, ValueError, KeyError, KatexServerError) as exc:
+                self.close()
+                self._down_until = time.monotonic() + RETRY_AFTER
+                raise KatexServerError(str(exc)) from exc
+
+
+_server = None
+
+
+def get_server():
+    """The process's KatexServer, or None where the CLI has to be used."""
+    global _server
+    if not getattr(settings, "KATEX_SERVER_ENABLED", True):
+        return None
+    if _server is None:
+        from markdown_katex import wrapper
+
+        try:
+            binary = str(wrapper._get_pkg_bin_path())
+            # A user-installed katex on PATH takes precedence in markdown-katex;
+            # its version may render differently from the bundled one.
+            if wrapper.get_bin_cmd() != [binary]:
+                logger.info("markdown-katex uses %s; not starting the KaTeX server", wrapper.get_bin_cmd())
+                _server = False
+                return None
+        except (AttributeError, NotImplementedError, OSError):
+            logger.info("markdown-katex internals changed; not starting the KaTeX server", exc_info=True)
+            _server = False
+            return None
+        _server = KatexServer(binary)
+        atexit.register(_server.close)
+    return _server or None
+
+
+def cli_args(options):
+    """The katex CLI arguments for markdown-katex ``options`` (as wrapper._iter_cmd_parts)."""
+    args = []
+    for name, value in (options or {}).items():
+        arg = name if name.startswith("--") else "--" + name
+        if value is True:
+            args.append(arg)
+        elif value is not False:
+            args.extend([arg, str(value)])
+    return tuple(args)
+
+
+def _html(tex, result):
+    from markdown_katex import wrapper
+
+    if "error" in result:
+        raise wrapper.KatexError(f"Error processing '{tex}': {result['error']}")
+    return result["html"].strip()
+
+
+def tex2html(tex, options=None):
+    """Drop-in for markdown_katex.wrapper.tex2html that uses the server."""
+    key = (tex, cli_args(options))
+    collecting = getattr(_local, "collecting", None)
+    if collecting is not None:
+        collecting.add(key)
+        return ""
+    prefetched = getattr(_local, "prefetched", {})
+    if key in prefetched:
+        return _html(tex, prefetched[key])
+
+    server = get_server()
+    if server is not None:
+        try:
+            result, = server.render([key[::-1]])
+        except KatexServerError as exc:
+            logger.warning("KaTeX server unavailable, rendering with the CLI: %s", exc)
+        else:
+            return _html(tex, result)
+    return _cli_tex2html(tex, options)
+
+
+def batched(render, texts):
+    """[render(text) for text in texts], with every formula in them rendered in one round trip."""
+    server = get_server() if _cli_tex2html is not None else None
+    if server is None or not texts:
+        return [render(text) for text in texts]
+
+    _local.collecting = set()
+    try:
+        for text in texts:
+            render(text)
+        items = list(_local.collecting)
+    finally:
+        _local.collecting = None
+    try:
+        results = server.render([key[::-1] for key in items]) if items else []
+    except KatexServerError as exc:
+        logger.warning("KaTeX server unavailable, rendering with the CLI: %s", exc)
+        results = []
+
+    _local.prefetched = dict(zip(items, results))
+    try:
+        return [render(text) for text in texts]
+    finally:
+        _local.prefetched = {}
+
+
+def install():
+    """Route markdown-katex's renders through the server. Returns True if installed."""
+    global _cli_tex2html
+    try:
+        from markdown_katex import wrapper
+    except ImportError:
+        return False
+    if _cli_tex2html is None:
+        _cli_tex2html = wrapper.tex2html
+        wrapper.tex2html = tex2html
+    return True
+
+
+def start_worker():
+    """Initializer for render worker processes, which skip CoreConfig.ready."""
+    from .katex_warmup import warm_katex_options
+
+    warm_katex_options()
+    install()
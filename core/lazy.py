@@ -0,0 +1,23 @@
+"""Defer heavy imports until a request actually needs them.
+
+Loading the URLconf imports every app's views and admin, and those used to
+import openai (over half a second on its own) and build clients at module
+level. Every uWSGI worker paid for that at boot, and carried the memory,
+even if it only ever served pages that never call a model.
+
+``lazy_openai_client`` returns a stand-in that imports openai and builds the
+real client the first time an attribute is used, so call sites keep writing
+``client.chat.completions.create(...)`` and tests can still patch the
+module's ``client``. ``core/startup.py`` checks that none of the deferred
+modules creep back into startup.
+"""
+from django.utils.functional import SimpleLazyObject
+
+
+def lazy_openai_client(**kwargs):
+    """An OpenAI client that is only imported and constructed on first use."""
+    def build():
+        from openai import OpenAI
+        return OpenAI(**kwargs)
+
+    return SimpleLazyObject(build)
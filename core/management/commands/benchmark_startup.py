@@ -0,0 +1,67 @@
+"""
+Profile a fresh worker's startup (django.setup() plus the URLconf) under
+``python -X importtime`` and fail if it has regressed: a deferred heavy
+module (openai, SymPy, PyMuPDF, ...) is imported at boot, startup is over
+STARTUP_IMPORT_BUDGET_MS / STARTUP_RSS_BUDGET_MB, or it is worse than a
+saved baseline by more than --tolerance.
+
+    python manage.py benchmark_startup
+    python manage.py benchmark_startup --runs 5 --save startup.json
+    python manage.py benchmark_startup --baseline startup.json
+"""
+import json
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.startup import StartupProfile, budgets, profile_startup, regressions
+
+
+class Command(BaseCommand):
+    help = "Measure worker startup time and memory, and fail on a regression."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=3,
+                            help="Fresh interpreters to profile; the median is reported (default 3).")
+        parser.add_argument("--save", help="Write this run's profile here, to use as a baseline")
+        parser.add_argument("--baseline", help="A profile saved by an earlier --save to compare against")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="How far over the baseline counts as noise (default 0.2 = 20%%).")
+
+    def handle(self, *args, **options):
+        runs = [profile_startup() for _ in range(max(1, options["runs"]))]
+        # Median of each metric; the slowest imports come from the median run.
+        median = sorted(runs, key=lambda p: p.import_ms)[len(runs) // 2]
+        profile = StartupProfile(
+            import_ms=statistics.median(p.import_ms for p in runs),
+            wall_ms=statistics.median(p.wall_ms for p in runs),
+            rss_mb=statistics.median(p.rss_mb for p in runs),
+            deferred=sorted({name for p in runs for name in p.deferred}),
+            slowest=median.slowest,
+        )
+
+        import_budget, rss_budget = budgets()
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n🚀 Worker startup ({len(runs)} runs, median)\n"))
+        self.stdout.write(f"  imports   {profile.import_ms:>8.0f}ms   (budget {import_budget}ms)")
+        self.stdout.write(f"  wall      {profile.wall_ms:>8.0f}ms")
+        self.stdout.write(f"  peak RSS  {profile.rss_mb:>8.0f}MB   (budget {rss_budget}MB)")
+        self.stdout.write("\n  Slowest top-level imports:")
+        for name, ms in profile.slowest:
+            self.stdout.write(f"    {ms:>8.1f}ms  {name}")
+
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump(profile.as_dict(), f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\n💾 Saved to {options['save']}"))
+
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+
+        problems = regressions(profile, baseline, options["tolerance"])
+        if problems:
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(f"  ❌ {problem}"))
+            raise CommandError(f"Startup regressed ({len(problems)} problem{'s' if len(problems) > 1 else ''})")
+        self.stdout.write(self.style.SUCCESS("\n✅ Startup is within budget"))
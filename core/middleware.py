@@ -1,4 +1,4 @@
-from core.models import Subject
+from core.subjects import subjects
 
 
 class SubjectMiddleware:
@@ -15,24 +15,18 @@ class SubjectMiddleware:
 
         if subject_slug:
             # User is explicitly selecting a subject
-            try:
-                subject = Subject.objects.get(slug=subject_slug, is_active=True)
-                request.session['current_subject'] = subject.slug
-            except Subject.DoesNotExist:
-                # Invalid subject, default to Maths
-                request.session['current_subject'] = 'maths'
+            subject = subjects.get(subject_slug, active_only=True)
+            # Invalid subject, default to Maths
+            request.session['current_subject'] = subject.slug if subject else 'maths'
         elif 'current_subject' not in request.session:
             # No subject in session, default to Maths
             request.session['current_subject'] = 'maths'
 
-        # Add subject to request context for easy access
-        try:
-            request.current_subject = Subject.objects.get(
-                slug=request.session.get('current_subject', 'maths')
-            )
-        except Subject.DoesNotExist:
-            # Fallback if something goes wrong
-            request.current_subject = Subject.objects.filter(slug='maths').first()
+        # Add subject to request context for easy access; from memory, not the
+        # database (core/subjects.py). Maths is the fallback if something goes wrong.
+        request.current_subject = (
+            subjects.get(request.session.get('current_subject', 'maths')) or subjects.get('maths')
+        )
 
         response = self.get_response(request)
         return response
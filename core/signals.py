@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Subject
+from .subjects import subjects
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def reload_subjects(sender, **kwargs):
+    """Drop this process's copy of the Subject table (core/subjects.py)."""
+    subjects.invalidate()
@@ -0,0 +1,134 @@
+"""Measure what a fresh worker pays to start: imports, time and memory.
+
+``profile_startup`` starts a new interpreter under ``python -X importtime``,
+runs ``django.setup()`` and loads the URLconf (which imports every app's
+views and admin), then reports:
+
+* ``import_ms``: the sum of every module's own import time, from -X importtime;
+* ``wall_ms``: setup and URLconf loading as timed by the child;
+* ``rss_mb``: the child's peak resident memory once loaded;
+* ``deferred``: any of DEFERRED_MODULES that got imported anyway;
+* ``slowest``: the top-level imports with the highest cumulative time.
+
+DEFERRED_MODULES are only imported by the code that uses them (see
+core/lazy.py). core/tests.py fails if one of them comes back into startup;
+``manage.py benchmark_startup`` also fails if startup exceeds
+STARTUP_IMPORT_BUDGET_MS / STARTUP_RSS_BUDGET_MB.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+from dataclasses import asdict, dataclass, field
+
+from django.conf import settings
+
+DEFERRED_MODULES = (
+    "openai",
+    "sympy",
+    "sklearn",
+    "fitz",
+    "matplotlib",
+    "manim",
+    "reportlab.platypus",
+)
+
+_CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+wall = time.perf_counter() - start
+try:
+    # Peak RSS of this process's own address space. ru_maxrss on Linux is
+    # carried over from the parent across fork/exec, so it would report the
+    # test runner's or manage.py's peak instead.
+    with open("/proc/self/status") as f:
+        rss_mb = next(int(l.split()[1]) for l in f if l.startswith("VmHWM:")) / 2**10
+except (OSError, StopIteration):
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / 2**20 if sys.platform == "darwin" else rss / 2**10   # bytes on macOS, KiB elsewhere
+print(json.dumps({"wall_ms": wall * 1000, "rss_mb": rss_mb, "modules": sorted(sys.modules)}))
+"""
+
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+@dataclass
+class StartupProfile:
+    import_ms: float
+    wall_ms: float
+    rss_mb: float
+    deferred: list = field(default_factory=list)
+    slowest: list = field(default_factory=list)   # [(module, cumulative ms)]
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def budgets():
+    return (
+        getattr(settings, "STARTUP_IMPORT_BUDGET_MS", 1500),
+        getattr(settings, "STARTUP_RSS_BUDGET_MB", 128),
+    )
+
+
+def _parse_importtime(stderr):
+    total_us, top_level = 0, []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        total_us += int(self_us)
+        if not indent:
+            top_level.append((name, int(cumulative_us) / 1000))
+    return total_us / 1000, top_level
+
+
+def profile_startup(top=10):
+    """Start a fresh interpreter with this project's settings and profile it."""
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "lcstats.settings")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), env.get("PYTHONPATH")]))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD],
+        capture_output=True, text=True, env=env, cwd=settings.BASE_DIR, timeout=120,
+    )
+    if proc.returncode:
+        raise RuntimeError(f"Startup profile failed:\n{proc.stderr[-2000:]}")
+
+    child = json.loads(proc.stdout.strip().splitlines()[-1])
+    import_ms, top_level = _parse_importtime(proc.stderr)
+    loaded = set(child["modules"])
+    return StartupProfile(
+        import_ms=import_ms,
+        wall_ms=child["wall_ms"],
+        rss_mb=child["rss_mb"],
+        deferred=[name for name in DEFERRED_MODULES if name in loaded],
+        slowest=sorted(top_level, key=lambda item: item[1], reverse=True)[:top],
+    )
+
+
+def regressions(profile, baseline=None, tolerance=0.2):
+    """Reasons this profile counts as a regression (an empty list if none).
+
+    Compared against the settings budgets and, if given, a saved baseline
+    profile dict, allowing ``tolerance`` (a fraction) for noise.
+    """
+    problems = [f"{name} is imported at startup" for name in profile.deferred]
+    import_budget, rss_budget = budgets()
+    if profile.import_ms > import_budget:
+        problems.append(f"imports took {profile.import_ms:.0f}ms (budget {import_budget}ms)")
+    if profile.rss_mb > rss_budget:
+        problems.append(f"RSS is {profile.rss_mb:.0f}MB (budget {rss_budget}MB)")
+    if baseline:
+        for metric, unit in (("import_ms", "ms"), ("rss_mb", "MB")):
+            limit = baseline[metric] * (1 + tolerance)
+            value = getattr(profile, metric)
+            if value > limit:
+                problems.append(f"{metric} {value:.0f}{unit} is over the baseline's {baseline[metric]:.0f}{unit}")
+    return problems
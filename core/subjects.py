@@ -0,0 +1,60 @@
+"""Process-local copy of the Subject table.
+
+SubjectMiddleware looked the current subject up on every request (twice when
+switching), for a table of two rows that changes about once a year. The
+registry loads every subject in one query on first use and serves lookups
+from memory after that.
+
+Saving or deleting a subject drops it (core/signals.py), but only in the
+worker that made the change; SUBJECT_REGISTRY_MAX_AGE bounds how long any
+other worker keeps serving the old rows.
+
+The Subject instances are shared by every request in the process, so treat
+them as read-only.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+
+class SubjectRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subjects = None   # in Meta ordering
+        self._by_slug = {}
+        self._loaded_at = 0.0
+
+    def invalidate(self):
+        """Drop the rows; the next lookup reloads them."""
+        with self._lock:
+            self._subjects = None
+
+    def _rows(self):
+        with self._lock:
+            max_age = getattr(settings, "SUBJECT_REGISTRY_MAX_AGE", 300)
+            stale = max_age and time.monotonic() - self._loaded_at > max_age
+            if self._subjects is None or stale:
+                from .models import Subject
+
+                self._subjects = list(Subject.objects.all())
+                self._by_slug = {subject.slug: subject for subject in self._subjects}
+                self._loaded_at = time.monotonic()
+            return self._subjects, self._by_slug
+
+    def all(self):
+        return list(self._rows()[0])
+
+    def active(self):
+        """Subjects available to students, in display order."""
+        return [subject for subject in self._rows()[0] if subject.is_active]
+
+    def get(self, slug, active_only=False):
+        """The subject with this slug, or None."""
+        subject = self._rows()[1].get(slug)
+        if subject is None or (active_only and not subject.is_active):
+            return None
+        return subject
+
+
+subjects = SubjectRegistry()
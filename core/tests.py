@@ -1,3 +1,156 @@
-from django.test import TestCase
+import sys
+from unittest.mock import patch
 
-# Create your tests here.
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from core import katex_server
+from core.middleware import SubjectMiddleware
+from core.models import Subject
+from core.subjects import subjects
+from core.lazy import lazy_openai_client
+from core.startup import StartupProfile, profile_startup, regressions
+
+
+class StartupTests(SimpleTestCase):
+    """A fresh worker must not import the heavy modules core/lazy.py defers."""
+
+    def test_startup_defers_heavy_modules(self):
+        # Time and RSS depend on the host; manage.py benchmark_startup checks
+        # those against the budgets.
+        profile = profile_startup()
+        self.assertEqual(profile.deferred, [], "deferred modules are imported at startup again")
+        self.assertTrue(profile.slowest)
+
+    @override_settings(STARTUP_IMPORT_BUDGET_MS=500, STARTUP_RSS_BUDGET_MB=100)
+    def test_regressions_against_budgets_and_baseline(self):
+        profile = StartupProfile(import_ms=450, wall_ms=600, rss_mb=90, deferred=["sympy"])
+        self.assertEqual(regressions(profile), ["sympy is imported at startup"])
+
+        baseline = {"import_ms": 300, "rss_mb": 90}
+        self.assertEqual(
+            regressions(StartupProfile(import_ms=450, wall_ms=600, rss_mb=95), baseline),
+            ["import_ms 450ms is over the baseline's 300ms"],
+        )
+        self.assertEqual(regressions(StartupProfile(import_ms=600, wall_ms=600, rss_mb=120)), [
+            "imports took 600ms (budget 500ms)",
+            "RSS is 120MB (budget 100MB)",
+        ])
+
+    def test_lazy_client_is_built_on_first_use(self):
+        built = []
+
+        class FakeOpenAI:
+            def __init__(self, **kwargs):
+                built.append(kwargs)
+                self.models = "models"
+
+        client = lazy_openai_client(api_key="sk-x")
+        fake_module = type(sys)("openai")
+        fake_module.OpenAI = FakeOpenAI
+        with patch.dict(sys.modules, {"openai": fake_module}):
+            self.assertEqual(built, [])
+            self.assertEqual(client.models, "models")
+            self.assertEqual(client.models, "models")
+        self.assertEqual(built, [{"api_key": "sk-x"}])
+
+
+class KatexServerTests(SimpleTestCase):
+    """Formulas go to the long-lived KaTeX process, with the CLI as the fallback."""
+
+    FORMULAS = [("x^2", None), (r"\frac{a}{b}", {"display-mode": True}), (r"\sqrt{2}", {"fleqn": True})]
+
+    def test_html_matches_the_cli(self):
+        self.assertIsNotNone(katex_server.get_server())
+        for tex, options in self.FORMULAS:
+            self.assertEqual(
+                katex_server.tex2html(tex, dict(options or {})),
+                katex_server._cli_tex2html(tex, dict(options or {})),
+            )
+
+    def test_tex_errors_raise_like_the_cli(self):
+        from markdown_katex.wrapper import KatexError
+
+        with self.assertRaisesRegex(KatexError, r"Error processing '\\frac\{': KaTeX parse error"):
+            katex_server.tex2html(r"\frac{")
+
+    def test_batched_sends_every_formula_in_one_round_trip(self):
+        from interactive_lessons.services.render_cache import render_markdown, render_markdown_many
+
+        texts = ["$`a+1`$ and $`b^2`$", "```math\n\\int_0^1 x\n```", "no maths"]
+        server = katex_server.get_server()
+        with patch.object(server, "render", wraps=server.render) as render:
+            html = render_markdown_many(texts)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(len(render.call_args.args[0]), 3)
+        self.assertEqual(html, {text: render_markdown(text) for text in texts})
+
+    def test_falls_back_to_the_cli_when_the_server_fails(self):
+        broken = katex_server.KatexServer("/nonexistent/katex")
+        with patch.object(katex_server, "_server", broken), \
+                patch.object(katex_server, "_cli_tex2html", return_value="cli html") as cli, \
+                self.assertLogs("core.katex_server", "WARNING") as logs:
+            self.assertEqual(katex_server.tex2html("x"), "cli html")
+            # Down for RETRY_AFTER seconds: no new attempt per formula.
+            with patch.object(broken, "_start") as start:
+                self.assertEqual(katex_server.tex2html("y"), "cli html")
+            start.assert_not_called()
+        self.assertEqual(cli.call_count, 2)
+        self.assertIn("No such file", logs.output[0])
+
+    @override_settings(KATEX_SERVER_ENABLED=False)
+    def test_disabled(self):
+        self.assertIsNone(katex_server.get_server())
+        with patch.object(katex_server, "_cli_tex2html", return_value="cli html"):
+            self.assertEqual(katex_server.tex2html("x"), "cli html")
+
+
+class SubjectRegistryTests(TestCase):
+    """Subjects come from memory; only the first request of a process queries them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Subject.objects.get_or_create(name="Maths", defaults={"slug": "maths", "display_order": 1})
+        Subject.objects.get_or_create(name="Physics", defaults={"slug": "physics", "display_order": 2})
+
+    def setUp(self):
+        # Test transactions roll back without signals, so start each test clean.
+        subjects.invalidate()
+        self.addCleanup(subjects.invalidate)
+        self.middleware = SubjectMiddleware(lambda request: request)
+
+    def get(self, session, **params):
+        request = RequestFactory().get("/", params)
+        request.session = session
+        return self.middleware(request)
+
+    def test_middleware_queries_once_per_process(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get({}).current_subject.slug, "maths")
+        with self.assertNumQueries(0):
+            session = {}
+            self.assertEqual(self.get(session, subject="physics").current_subject.slug, "physics")
+            self.assertEqual(session["current_subject"], "physics")
+            self.assertEqual(self.get(session).current_subject.slug, "physics")
+            self.assertEqual(self.get(session, subject="chemistry").current_subject.slug, "maths")
+
+    def test_inactive_subjects_cannot_be_selected(self):
+        Subject.objects.filter(slug="physics").update(is_active=False)
+        session = {}
+        self.assertEqual(self.get(session, subject="physics").current_subject.slug, "maths")
+        self.assertEqual([subject.slug for subject in subjects.active()], ["maths"])
+
+    def test_save_and_delete_reload_the_registry(self):
+        self.assertIsNone(subjects.get("chemistry"))
+        chemistry = Subject.objects.create(name="Chemistry", display_order=3)
+        self.assertEqual(subjects.get("chemistry", active_only=True), chemistry)
+        self.assertEqual([subject.slug for subject in subjects.active()], ["maths", "physics", "chemistry"])
+        chemistry.delete()
+        self.assertIsNone(subjects.get("chemistry"))
+
+    @override_settings(SUBJECT_REGISTRY_MAX_AGE=60)
+    def test_other_workers_changes_show_up_after_max_age(self):
+        subjects.get("maths")
+        Subject.objects.filter(slug="physics").update(name="Applied Physics")
+        self.assertEqual(subjects.get("physics").name, "Physics")
+        with patch("core.subjects.time.monotonic", return_value=subjects._loaded_at + 61):
+            self.assertEqual(subjects.get("physics").name, "Applied Physics")
@@ -15,7 +15,6 @@ from .models import (
     ExamQuestionFeedback
 )
 from .forms import ExtractQuestionsForm
-from .utils import extract_pdf_page_ranges, split_pdf_into_questions
 
 
 class ExamQuestionPartInline(admin.StackedInline):
@@ -101,7 +100,8 @@ class ExamPaperAdmin(admin.ModelAdmin):
         if request.method == 'POST':
             form = ExtractQuestionsForm(request.POST)
             if form.is_valid():
-                # Extract questions based on form data
+                # Extract questions based on form data (utils imports PyMuPDF, so not at startup)
+                from .utils import extract_pdf_page_ranges, split_pdf_into_questions
                 try:
                     pdf_path = paper.source_pdf.path
                     question_images = []
@@ -2,7 +2,6 @@
 GPT-4 Vision-based grading service for exam questions.
 Uses marking scheme images to grade student answers.
 """
-from openai import OpenAI
 import base64
 import logging
 from django.core.files.storage import default_storage
@@ -19,6 +18,7 @@ _client = None
 def get_client():
     global _client
     if _client is None:
+        from openai import OpenAI
         _client = OpenAI()
     return _client
 
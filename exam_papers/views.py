@@ -604,9 +604,9 @@ def papers_and_solutions(request):
 @login_required
 def worksheet_generator(request):
     """Public view for selecting exam questions to print as a worksheet."""
-    from core.models import Subject
+    from core.subjects import subjects as subject_registry
 
-    subjects = Subject.objects.filter(is_active=True)
+    subjects = subject_registry.active()
     selected_topic_id = request.GET.get('topic')
     selected_subject_id = request.GET.get('subject')
 
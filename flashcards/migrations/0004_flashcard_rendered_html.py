@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flashcards", "0003_flashcard_external_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flashcard",
+            name="rendered_hash",
+            field=models.CharField(blank=True, editable=False, help_text="sha1 of the renderer and source text the HTML columns were rendered from", max_length=40),
+        ),
+        migrations.AddField(
+            model_name="flashcard",
+            name="front_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="flashcard",
+            name="back_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="flashcard",
+            name="distractor_1_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="flashcard",
+            name="distractor_2_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="flashcard",
+            name="distractor_3_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="flashcard",
+            name="explanation_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
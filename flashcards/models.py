@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from interactive_lessons.models import Topic
+from interactive_lessons.services.rendered_content import RenderedContent
 import random
 import uuid
 
@@ -63,7 +64,7 @@ class FlashcardSet(models.Model):
         return self.cards.count()
 
 
-class Flashcard(models.Model):
+class Flashcard(RenderedContent):
     """
     Individual flashcard with rich content on both sides.
     Follows RevisionSection pattern for content storage.
@@ -114,6 +115,22 @@ class Flashcard(models.Model):
         help_text="Optional explanation shown after answering (why answer is correct)"
     )
 
+    # Rendered by save(); see interactive_lessons/services/rendered_content.py.
+    rendered_fields = {
+        "front_text": "front_html",
+        "back_text": "back_html",
+        "distractor_1": "distractor_1_html",
+        "distractor_2": "distractor_2_html",
+        "distractor_3": "distractor_3_html",
+        "explanation": "explanation_html",
+    }
+    front_html = models.TextField(blank=True, editable=False)
+    back_html = models.TextField(blank=True, editable=False)
+    distractor_1_html = models.TextField(blank=True, editable=False)
+    distractor_2_html = models.TextField(blank=True, editable=False)
+    distractor_3_html = models.TextField(blank=True, editable=False)
+    explanation_html = models.TextField(blank=True, editable=False)
+
     # Ordering
     order = models.PositiveIntegerField(
         default=0,
@@ -146,16 +163,20 @@ class Flashcard(models.Model):
             preview += "..."
         return f"{self.flashcard_set.title} - Card {self.order}: {preview}"
 
-    def get_shuffled_options(self):
+    def get_shuffled_options(self, rendered=False):
         """
         Return list of all 4 options shuffled, with correct answer marked.
         Returns: list of dicts with 'text' and 'is_correct' keys
+        With rendered=True, 'text' is the option's stored HTML.
         """
+        text = self.rendered_html if rendered else {
+            field: getattr(self, field) for field in ('back_text', 'distractor_1', 'distractor_2', 'distractor_3')
+        }
         options = [
-            {'text': self.back_text, 'is_correct': True, 'id': 'correct'},
-            {'text': self.distractor_1, 'is_correct': False, 'id': 'dist1'},
-            {'text': self.distractor_2, 'is_correct': False, 'id': 'dist2'},
-            {'text': self.distractor_3, 'is_correct': False, 'id': 'dist3'},
+            {'text': text['back_text'], 'is_correct': True, 'id': 'correct'},
+            {'text': text['distractor_1'], 'is_correct': False, 'id': 'dist1'},
+            {'text': text['distractor_2'], 'is_correct': False, 'id': 'dist2'},
+            {'text': text['distractor_3'], 'is_correct': False, 'id': 'dist3'},
         ]
         random.shuffle(options)
         return options
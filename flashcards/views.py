@@ -7,11 +7,10 @@ from django.http import JsonResponse
 from django.urls import reverse
 from django.views.decorators.http import require_POST
 from interactive_lessons.models import Topic
+from interactive_lessons.services.rendered_content import prerender
 from .models import FlashcardSet, Flashcard, FlashcardAttempt
 from .services import import_flashcards_from_data, preview_flashcard_import
 import json
-import markdown
-from markdown_katex import KatexExtension
 
 
 @login_required
@@ -125,29 +124,21 @@ def study_set(request, topic_slug, set_id):
     # Prepare card data for frontend (with shuffled options)
     cards_data = []
 
-    for card in cards:
-        # Create fresh markdown instance for each conversion to avoid state issues
-        md_front = markdown.Markdown(extensions=[KatexExtension()])
-        md_back = markdown.Markdown(extensions=[KatexExtension()])
-        md_exp = markdown.Markdown(extensions=[KatexExtension()])
+    for card in prerender(cards):
+        # Card text is stored rendered (Flashcard.rendered_fields)
+        html = card.rendered_html
 
         attempt = attempts_map[card.id]
         is_self_assess = attempt.mastery_level == 'know'
 
-        # Render options with markdown (only needed for multiple choice mode)
-        shuffled_options = card.get_shuffled_options()
-        for option in shuffled_options:
-            md_opt = markdown.Markdown(extensions=[KatexExtension()])
-            option['text'] = md_opt.convert(option['text'])
-
         cards_data.append({
             'id': card.id,
-            'front_text': md_front.convert(card.front_text),
+            'front_text': html['front_text'],
             'front_image': card.front_image.url if card.front_image else None,
-            'back_text': md_back.convert(card.back_text),
+            'back_text': html['back_text'],
             'back_image': card.back_image.url if card.back_image else None,
-            'explanation': md_exp.convert(card.explanation) if card.explanation else None,
-            'options': shuffled_options,  # Already shuffled with rendered text
+            'explanation': html['explanation'] if card.explanation else None,
+            'options': card.get_shuffled_options(rendered=True),
             'order': card.order,
             'is_self_assess': is_self_assess,  # True for 'know' cards
             'attempt': {
@@ -1,10 +1,61 @@
 import logging
 from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import EmailMultiAlternatives
+from django.db.models import Exists, OuterRef, Q
 from django.template.loader import render_to_string
 
 logger = logging.getLogger(__name__)
 
+BADGE_GENERATION_KEY = "homework_badge:generation"
+
+
+def student_assignments(student):
+    """
+    Published assignments set for a student, through a class or individually,
+    each annotated with has_submitted. One query, however many there are.
+    """
+    from .models import HomeworkAssignment, HomeworkSubmission
+
+    return HomeworkAssignment.objects.filter(
+        Q(pk__in=HomeworkAssignment.objects.filter(assigned_classes__students=student).values('pk'))
+        | Q(pk__in=HomeworkAssignment.objects.filter(assigned_students=student).values('pk')),
+        is_published=True,
+    ).annotate(
+        has_submitted=Exists(HomeworkSubmission.objects.filter(student=student, assignment=OuterRef('pk')))
+    )
+
+
+def _badge_key(student_id):
+    generation = cache.get_or_set(BADGE_GENERATION_KEY, 0, timeout=None)
+    return f"homework_badge:{generation}:{student_id}"
+
+
+def outstanding_count(student):
+    """
+    Number of the student's assignments not yet submitted (the nav badge).
+
+    Cached per student for HOMEWORK_BADGE_TTL seconds. A submission clears
+    that student's entry; assignment and class changes clear everyone's.
+    """
+    key = _badge_key(student.pk)
+    count = cache.get(key)
+    if count is None:
+        count = student_assignments(student).filter(has_submitted=False).count()
+        cache.set(key, count, timeout=getattr(settings, 'HOMEWORK_BADGE_TTL', 60))
+    return count
+
+
+def forget_outstanding_count(student_id=None):
+    """Drop one student's cached badge count, or every student's if None."""
+    if student_id is not None:
+        cache.delete(_badge_key(student_id))
+        return
+    try:
+        cache.incr(BADGE_GENERATION_KEY)
+    except ValueError:
+        cache.set(BADGE_GENERATION_KEY, 1, timeout=None)
+
 
 def send_assignment_published_email(assignment):
     """
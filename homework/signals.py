@@ -1,7 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.contrib.auth.models import Group
 from django.dispatch import receiver
-from .models import TeacherProfile
+from .models import HomeworkAssignment, HomeworkSubmission, TeacherClass, TeacherProfile
+from .services import forget_outstanding_count
 
 
 @receiver(post_save, sender=TeacherProfile)
@@ -21,4 +22,25 @@ def add_teacher_to_group(sender, instance, created, **kwargs):
 
         # Give is_staff so they can access Django Admin
         instance.user.is_staff = True
-        instance.user.save()
\ No newline at end of file
+        instance.user.save()
+
+
+@receiver(post_save, sender=HomeworkSubmission)
+@receiver(post_delete, sender=HomeworkSubmission)
+def refresh_student_badge(sender, instance, **kwargs):
+    """The student's outstanding homework count changed."""
+    forget_outstanding_count(instance.student_id)
+
+
+@receiver(post_save, sender=HomeworkAssignment)
+@receiver(post_delete, sender=HomeworkAssignment)
+@receiver(m2m_changed, sender=HomeworkAssignment.assigned_classes.through)
+@receiver(m2m_changed, sender=HomeworkAssignment.assigned_students.through)
+@receiver(m2m_changed, sender=TeacherClass.students.through)
+def refresh_all_badges(sender, **kwargs):
+    """
+    Publishing, editing or reassigning an assignment, or changing a class,
+    can change any number of students' counts.
+    """
+    if kwargs.get('action', 'post_').startswith('post_'):
+        forget_outstanding_count()
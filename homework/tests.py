@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Subject
+from homework.models import HomeworkAssignment, HomeworkSubmission, TeacherClass, TeacherProfile
+from homework.services import outstanding_count, student_assignments
+from homework.views import get_homework_summary
+from interactive_lessons.models import Topic
+
+
+class HomeworkBadgeTests(TestCase):
+    """The nav badge: one query per student, cached until their homework changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        subject, _ = Subject.objects.get_or_create(name="Maths", defaults={"slug": "maths"})
+        cls.topic = Topic.objects.create(subject=subject, name="Algebra")
+        cls.teacher = TeacherProfile.objects.create(user=User.objects.create_user("teacher"), display_name="Ms Byrne")
+        cls.student = User.objects.create_user("aoife")
+        cls.klass = TeacherClass.objects.create(teacher=cls.teacher, name="6th Year")
+        cls.klass.students.add(cls.student)
+
+        now = timezone.now()
+        cls.overdue = cls.assign("Overdue", now - timedelta(days=1), classes=[cls.klass])
+        cls.due_soon = cls.assign("Due soon", now + timedelta(days=2), students=[cls.student])
+        # Both ways at once, counted once
+        cls.later = cls.assign("Later", now + timedelta(days=10), classes=[cls.klass], students=[cls.student])
+        cls.assign("Draft", now + timedelta(days=10), classes=[cls.klass], is_published=False)
+        cls.submitted = cls.assign("Done", now + timedelta(days=5), classes=[cls.klass])
+        HomeworkSubmission.objects.create(student=cls.student, assignment=cls.submitted)
+
+    @classmethod
+    def assign(cls, title, due_date, classes=(), students=(), is_published=True):
+        assignment = HomeworkAssignment.objects.create(
+            teacher=cls.teacher, topic=cls.topic, title=title, due_date=due_date, is_published=is_published,
+        )
+        assignment.assigned_classes.set(classes)
+        assignment.assigned_students.set(students)
+        return assignment
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_count_is_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(outstanding_count(self.student), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(outstanding_count(self.student), 3)
+
+    def test_submitting_clears_the_count(self):
+        outstanding_count(self.student)
+        HomeworkSubmission.objects.create(student=self.student, assignment=self.later)
+        self.assertEqual(outstanding_count(self.student), 2)
+
+    def test_publishing_and_enrolling_clear_the_count(self):
+        other = User.objects.create_user("cian")
+        self.assertEqual(outstanding_count(other), 0)
+        self.klass.students.add(other)
+        self.assertEqual(outstanding_count(other), 3)
+
+        draft = HomeworkAssignment.objects.get(title="Draft")
+        draft.is_published = True
+        draft.save()
+        self.assertEqual(outstanding_count(other), 4)
+
+    def test_summary_and_dashboard_share_the_query(self):
+        assignments = {a.title: a.has_submitted for a in student_assignments(self.student)}
+        self.assertEqual(assignments, {"Overdue": False, "Due soon": False, "Later": False, "Done": True})
+
+        summary = get_homework_summary(self.student)
+        self.assertEqual(summary["overdue"], [self.overdue])
+        self.assertEqual(summary["due_soon"], [self.due_soon])
+        self.assertEqual(summary["incomplete"], [self.later])
+        self.assertEqual(summary["total_count"], 3)
+
+    def test_dashboard_and_badge(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse("homework:student_dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["homework_badge_count"], 3)
+        self.assertEqual([a["assignment"] for a in response.context["completed_assignments"]], [self.submitted])
+        self.assertEqual(len(response.context["active_assignments"]), 3)
@@ -17,6 +17,7 @@ from .models import (
     HomeworkSubmission,
     HomeworkNotificationSnooze
 )
+from .services import student_assignments
 
 
 def get_homework_summary(user):
@@ -24,17 +25,6 @@ def get_homework_summary(user):
     Get summary of student's homework status for notifications.
     Returns dict with overdue, due_soon, and incomplete counts/lists.
     """
-    # Get all assignments for this student
-    class_assignments = HomeworkAssignment.objects.filter(
-        assigned_classes__students=user,
-        is_published=True
-    )
-    individual_assignments = HomeworkAssignment.objects.filter(
-        assigned_students=user,
-        is_published=True
-    )
-    all_assignments = (class_assignments | individual_assignments).distinct()
-
     overdue = []
     due_soon = []  # Due within 3 days
     incomplete = []
@@ -42,20 +32,14 @@ def get_homework_summary(user):
     now = timezone.now()
     soon_threshold = now + timedelta(days=3)
 
-    for assignment in all_assignments:
-        # Check if submitted
-        has_submitted = HomeworkSubmission.objects.filter(
-            student=user,
-            assignment=assignment
-        ).exists()
-
-        if not has_submitted:
-            if assignment.due_date < now:
-                overdue.append(assignment)
-            elif assignment.due_date <= soon_threshold:
-                due_soon.append(assignment)
-            else:
-                incomplete.append(assignment)
+    # Only those not yet submitted
+    for assignment in student_assignments(user).filter(has_submitted=False):
+        if assignment.due_date < now:
+            overdue.append(assignment)
+        elif assignment.due_date <= soon_threshold:
+            due_soon.append(assignment)
+        else:
+            incomplete.append(assignment)
 
     return {
         'overdue': overdue,
@@ -76,17 +60,9 @@ def student_homework_dashboard(request):
     """
     user = request.user
 
-    # Get all assignments for this student (from classes + individual assignments)
-    class_assignments = HomeworkAssignment.objects.filter(
-        assigned_classes__students=user,
-        is_published=True
-    )
-    individual_assignments = HomeworkAssignment.objects.filter(
-        assigned_students=user,
-        is_published=True
-    )
-
-    all_assignments = (class_assignments | individual_assignments).distinct().order_by('-due_date')
+    # Get all assignments for this student (from classes + individual
+    # assignments), each with has_submitted
+    all_assignments = student_assignments(user).order_by('-due_date')
 
     # Annotate with completion status
     assignments_with_status = []
@@ -108,11 +84,7 @@ def student_homework_dashboard(request):
             if progress.is_completed:
                 completed_count += 1
 
-        # Check if submitted
-        has_submitted = HomeworkSubmission.objects.filter(
-            student=user,
-            assignment=assignment
-        ).exists()
+        has_submitted = assignment.has_submitted
 
         is_overdue = timezone.now() > assignment.due_date
         days_until_due = (assignment.due_date - timezone.now()).days
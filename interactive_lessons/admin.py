@@ -8,7 +8,8 @@ from django.db import models, transaction
 from django.forms import Textarea
 from django.shortcuts import redirect, render
 
-from .models import Topic, Section, Question, QuestionPart, StudentInquiry
+from .models import Topic, Section, Question, QuestionPart, GradedAnswer, StudentInquiry
+from .services.regrade import regrade_attempts
 
 
 # --- Topic Admin --------------------------------------------------------------
@@ -224,7 +225,7 @@ class QuestionAdmin(admin.ModelAdmin):
     list_per_page = 50  # Pagination for better performance
 
     # Add actions for bulk operations
-    actions = ['duplicate_questions']
+    actions = ['duplicate_questions', 'regrade_attempts']
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         """Customize the section dropdown to show only section names"""
@@ -267,6 +268,26 @@ class QuestionAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         return qs.select_related('topic', 'section').prefetch_related('parts')
 
+    @admin.action(description="Regrade student attempts against the current answers")
+    def regrade_attempts(self, request, queryset):
+        """Local checks only; answers that need the model are left for
+        `manage.py regrade_attempts --use-llm`."""
+        parts = QuestionPart.objects.filter(question__in=queryset)
+        result = regrade_attempts(parts)
+        self.message_user(
+            request,
+            f"Regraded {result.attempts} attempt(s): {result.changed} changed, "
+            f"{len(result.students)} student total(s) refreshed.",
+        )
+        skipped = result.needs_model + result.unverified
+        if skipped:
+            self.message_user(
+                request,
+                f"{skipped} attempt(s) could not be re-marked without the model "
+                f"and were left as they were.",
+                level=messages.WARNING,
+            )
+
     # --- Copyright Badge Display ----------------------------------------------
 
     def copyright_badge(self, obj):
@@ -336,6 +357,27 @@ class QuestionAdmin(admin.ModelAdmin):
         return super().response_change(request, obj)
 
 
+# --- Graded Answer Admin -----------------------------------------------------
+
+@admin.register(GradedAnswer)
+class GradedAnswerAdmin(admin.ModelAdmin):
+    """The graded-answer cache: which answers students keep submitting."""
+    list_display = ("student_answer", "question_part", "score", "hint_used", "solution_used",
+                    "hit_count", "created_at")
+    list_filter = ("is_correct", "hint_used", "solution_used")
+    search_fields = ("student_answer", "feedback")
+    ordering = ("-hit_count",)
+    list_select_related = ("question_part__question",)
+    readonly_fields = [f.name for f in GradedAnswer._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Entries are written by the cache; delete one to have it marked again"""
+        return False
+
+
 # --- Student Inquiry Admin ----------------------------------------------------
 
 @admin.register(StudentInquiry)
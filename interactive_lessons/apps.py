@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class InteractiveLessonsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'interactive_lessons'
+
+    def ready(self):
+        import interactive_lessons.signals  # noqa: F401
@@ -0,0 +1,83 @@
+"""
+Time compare_algebraic over the question bank's own answer keys, with and
+without the numeric sampling pre-check (utils_math.numeric_verdict).
+
+Every QuestionPart answer that parses as an expression is graded against
+four student answers: the key as written, SymPy's expand() and factor() of
+it (equivalent rewrites a student might type), and the key plus one (wrong).
+Both modes must reach the same verdict on every case; any that don't are
+listed. No API calls, and nothing is written.
+
+    python manage.py benchmark_algebraic_marking
+    python manage.py benchmark_algebraic_marking --limit 200
+"""
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from sympy import Expr, expand, factor
+
+from interactive_lessons.models import QuestionPart
+from interactive_lessons.services.utils_math import _parse_any, compare_algebraic
+
+
+class Command(BaseCommand):
+    help = "Benchmark algebraic answer checking with and without numeric sampling."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=0,
+                            help="Only use the first N parts with an answer (default: all).")
+
+    def handle(self, *args, **options):
+        cases = self._cases(options["limit"])
+        if not cases:
+            self.stdout.write(self.style.WARNING("No algebraic answer keys found."))
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n🧮 {len(cases)} answers against {len({c for _, c in cases})} keys\n"))
+
+        results = {}
+        for label, numeric in (("simplify only", False), ("sampling first", True)):
+            with override_settings(ALGEBRAIC_NUMERIC_CHECK=numeric):
+                timings, verdicts = [], []
+                for student, correct in cases:
+                    start = time.perf_counter()
+                    verdicts.append(compare_algebraic(student, correct))
+                    timings.append(time.perf_counter() - start)
+            results[label] = (np.array(timings) * 1000, verdicts)
+
+        self.stdout.write(f"{'mode':<16}{'total':>10}{'p50':>10}{'p95':>10}{'max':>10}")
+        for label, (ms, _) in results.items():
+            self.stdout.write(
+                f"{label:<16}{ms.sum():>8.0f}ms{np.percentile(ms, 50):>8.2f}ms"
+                f"{np.percentile(ms, 95):>8.2f}ms{ms.max():>8.0f}ms"
+            )
+
+        baseline, fast = (results[label][1] for label in results)
+        drift = [case for case, a, b in zip(cases, baseline, fast) if a != b]
+        if drift:
+            self.stdout.write(self.style.ERROR(f"\n❌ {len(drift)} verdicts differ:"))
+            for student, correct in drift[:20]:
+                self.stdout.write(f"   {student!r} vs key {correct!r}")
+        else:
+            self.stdout.write(self.style.SUCCESS("\n✅ Same verdict on every case"))
+
+    def _cases(self, limit):
+        answers = (
+            QuestionPart.objects.exclude(answer__isnull=True).exclude(answer="")
+            .order_by("id").values_list("answer", flat=True)
+        )
+        if limit:
+            answers = answers[:limit]
+
+        cases = []
+        for key in dict.fromkeys(answers):   # each distinct key once, in order
+            try:
+                parsed = _parse_any(key)
+            except Exception:
+                continue
+            if not isinstance(parsed, Expr):
+                continue
+            students = {key, str(expand(parsed)), str(factor(parsed)), str(parsed + 1)}
+            cases.extend((student, key) for student in sorted(students))
+        return cases
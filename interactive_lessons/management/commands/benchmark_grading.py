@@ -0,0 +1,120 @@
+"""Replay a grading corpus and report latency per marking path and verdict drift.
+
+Cases come from export_grading_corpus. Each one runs through parse_interval,
+normalise_numeric_answer, compare_algebraic and mark_student_answer, with
+gpt_grade stubbed (services/grading_benchmark.py). Cases run one at a time
+in a grading worker, so an answer that hangs SymPy is cut off at --timeout
+and reported, and doesn't stall the run.
+
+Save the verdicts from one version, then compare the next against them:
+
+    python manage.py benchmark_grading grading_corpus.json --save before.json
+    (change the marker)
+    python manage.py benchmark_grading grading_corpus.json --baseline before.json
+    python manage.py benchmark_grading grading_corpus.json --baseline before.json --fail-on-drift
+"""
+import json
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from interactive_lessons.services.grading_benchmark import PATHS, replay_case, verdict_drift
+from interactive_lessons.services.grading_pool import GradingPool, GradingTimeout
+
+
+class Command(BaseCommand):
+    help = "Benchmark the answer-marking paths over an exported corpus."
+
+    def add_arguments(self, parser):
+        parser.add_argument("corpus", help="File written by export_grading_corpus")
+        parser.add_argument("--save", help="Write this run's verdicts and timings here")
+        parser.add_argument("--baseline", help="Verdicts saved by an earlier run to compare against")
+        parser.add_argument("--fail-on-drift", action="store_true",
+                            help="Exit with an error if any verdict differs from the baseline")
+        parser.add_argument("--timeout", type=float, default=10.0,
+                            help="Seconds allowed per case (default 10)")
+        parser.add_argument("--in-process", action="store_true",
+                            help="Run cases in this process: no timeout, no worker overhead")
+        parser.add_argument("--limit", type=int, default=0,
+                            help="Only replay the first N cases")
+
+    def handle(self, *args, **options):
+        with open(options["corpus"]) as f:
+            cases = json.load(f)["cases"]
+        if options["limit"]:
+            cases = cases[:options["limit"]]
+        if not cases:
+            raise CommandError("The corpus has no cases")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n⏱️  Replaying {len(cases)} cases\n"))
+        timings = {path: [] for path in PATHS}
+        verdicts, timed_out = {}, []
+        # One worker: cases run back to back, so timings aren't skewed by contention.
+        pool = GradingPool(size=0 if options["in_process"] else 1)
+        try:
+            for done, case in enumerate(cases, 1):
+                try:
+                    replayed = pool.run(replay_case, case, timeout=options["timeout"])
+                except GradingTimeout:
+                    timed_out.append(case["id"])
+                    verdicts[case["id"]] = "timeout"
+                    continue
+                for path, seconds in replayed["timings"].items():
+                    timings[path].append(seconds)
+                verdicts[case["id"]] = replayed["verdict"]
+                if done % 100 == 0:
+                    self.stdout.write(f"   {done}/{len(cases)}", ending="\r")
+                    self.stdout.flush()
+        finally:
+            pool.shutdown()
+
+        self._report_latency(timings)
+        self._report_accuracy(cases, verdicts)
+        if timed_out:
+            self.stdout.write(self.style.WARNING(f"⚠️ {len(timed_out)} cases timed out after {options['timeout']}s:"))
+            for cid in timed_out[:20]:
+                self.stdout.write(f"   {cid}")
+
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump({"verdicts": verdicts, "timings": timings}, f)
+            self.stdout.write(f"Saved verdicts to {options['save']}")
+
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)["verdicts"]
+            drift = verdict_drift(verdicts, baseline)
+            if not drift:
+                self.stdout.write(self.style.SUCCESS(f"✅ No verdict drift against {options['baseline']}"))
+                return
+            by_id = {case["id"]: case for case in cases}
+            self.stdout.write(self.style.ERROR(f"❌ {len(drift)} verdicts differ from {options['baseline']}:"))
+            for cid in drift[:20]:
+                self.stdout.write(f"   {by_id[cid]['answer']!r} (key {by_id[cid]['key']!r}): "
+                                  f"{baseline[cid]} → {verdicts[cid]}")
+            if options["fail_on_drift"]:
+                raise CommandError(f"{len(drift)} verdicts drifted")
+
+    def _report_latency(self, timings):
+        self.stdout.write(f"\n{'path':<26}{'cases':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+        for path in PATHS:
+            if not timings[path]:
+                continue
+            ms = np.array(timings[path]) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            self.stdout.write(
+                f"{path:<26}{ms.size:>7}{p50:>8.2f}ms{p95:>8.2f}ms{p99:>8.2f}ms{ms.max():>8.0f}ms"
+            )
+
+    def _report_accuracy(self, cases, verdicts):
+        """How often local marking agrees with the verdict stored at the time."""
+        agree = total = 0
+        for case in cases:
+            verdict = verdicts.get(case["id"])
+            if not isinstance(verdict, dict) or "score" not in verdict or verdict["model"]:
+                continue   # exam cases, timeouts, and scores that came from the model
+            total += 1
+            agree += (verdict["score"] >= 90) == case["is_correct"]
+        if total:
+            self.stdout.write(f"\nAgrees with the stored verdict on {agree}/{total} locally marked answers "
+                              f"({100 * agree / total:.1f}%)")
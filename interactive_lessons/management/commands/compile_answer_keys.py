@@ -0,0 +1,51 @@
+"""Compile every QuestionPart's answer into QuestionPart.answer_key.
+
+Saving a part compiles its key (services/answer_keys.py); this fills in
+parts saved before the column existed and any row changed with .update(),
+an import or raw SQL. Parts whose key is already current are skipped.
+
+    python manage.py compile_answer_keys --dry-run
+    python manage.py compile_answer_keys
+    python manage.py compile_answer_keys --all      # recompile every part
+"""
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from interactive_lessons.models import QuestionPart
+from interactive_lessons.services.answer_keys import compile_answer_key, is_current, key_text
+
+CHUNK = 500
+
+
+class Command(BaseCommand):
+    help = "Compile QuestionPart answers into stored answer keys for marking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true",
+                            help="Recompile every part, not just stale ones")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Count stale parts, write nothing")
+
+    def handle(self, *args, **options):
+        parts = QuestionPart.objects.only("id", "answer", "solution", "answer_key")
+        stale = [p for p in parts.iterator(chunk_size=CHUNK)
+                 if options["all"] or not is_current(p.answer_key, key_text(p))]
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"Would compile {len(stale)} of {parts.count()} answer keys"))
+            return
+
+        kinds = Counter()
+        for part in stale:
+            part.answer_key = compile_answer_key(key_text(part))
+            kinds[part.answer_key["kind"]] += 1
+        # bulk_update skips save(), so nothing is compiled twice.
+        QuestionPart.objects.bulk_update(stale, ["answer_key"], batch_size=CHUNK)
+
+        summary = ", ".join(f"{count} {kind}" for kind, count in kinds.most_common()) or "nothing stale"
+        self.stdout.write(self.style.SUCCESS(f"✅ Compiled {len(stale)} answer keys ({summary})"))
+        if kinds["text"]:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {kinds['text']} answers did not parse and will always be marked by GPT"
+            ))
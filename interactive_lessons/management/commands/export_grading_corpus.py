@@ -0,0 +1,111 @@
+"""Export real submissions as an anonymised corpus for benchmark_grading.
+
+Each distinct (part, answer) pair from QuestionAttempt and ExamQuestionAttempt
+becomes one case: the part's answer key and question text, the student's
+answer, the verdict stored at the time, and how many times it was submitted.
+No user, attempt or timestamp is written.
+
+    python manage.py export_grading_corpus grading_corpus.json
+    python manage.py export_grading_corpus grading_corpus.json --limit 5000
+"""
+import json
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from exam_papers.models import ExamQuestionAttempt
+from interactive_lessons.services.answer_keys import key_text
+from interactive_lessons.services.grade_cache import normalise_answer
+from interactive_lessons.services.grading_benchmark import CORPUS_VERSION, case_id
+from students.models import QuestionAttempt
+
+
+class Command(BaseCommand):
+    help = "Export anonymised (part, answer, stored verdict) cases for benchmark_grading."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Corpus file to write (JSON)")
+        parser.add_argument("--limit", type=int, default=0,
+                            help="Keep only the N most submitted answers per source (default: all)")
+
+    def handle(self, *args, **options):
+        cases = self._practice_cases() + self._exam_cases()
+        if options["limit"]:
+            kept = []
+            for source in ("practice", "exam"):
+                ranked = sorted((c for c in cases if c["source"] == source), key=lambda c: -c["count"])
+                kept += ranked[:options["limit"]]
+            cases = kept
+
+        with open(options["output"], "w") as f:
+            json.dump({
+                "version": CORPUS_VERSION,
+                "exported_at": timezone.now().isoformat(),
+                "cases": cases,
+            }, f, indent=1, ensure_ascii=False)
+
+        sources = Counter(c["source"] for c in cases)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Wrote {len(cases)} cases ({sources['practice']} practice, {sources['exam']} exam) "
+            f"to {options['output']}"
+        ))
+
+    def _practice_cases(self):
+        cases = {}
+        attempts = (
+            QuestionAttempt.objects.filter(question_part__isnull=False)
+            .select_related("question_part")
+            .only("student_answer", "score_awarded", "is_correct",
+                  "question_part__answer", "question_part__solution", "question_part__prompt")
+            .order_by("id")
+        )
+        for attempt in attempts.iterator(chunk_size=2000):
+            answer = normalise_answer(attempt.student_answer)
+            if not answer:
+                continue
+            part = attempt.question_part
+            cid = case_id("practice", part.pk, answer)
+            if cid in cases:
+                cases[cid]["count"] += 1
+                continue
+            # The first verdict is the one the student saw before any regrade.
+            cases[cid] = {
+                "id": cid,
+                "source": "practice",
+                "part": part.pk,
+                "question": part.prompt or "",
+                "key": key_text(part),
+                "answer": answer,
+                "score": attempt.score_awarded,
+                "is_correct": attempt.is_correct,
+                "count": 1,
+            }
+        return list(cases.values())
+
+    def _exam_cases(self):
+        cases = {}
+        attempts = ExamQuestionAttempt.objects.only(
+            "question_part_id", "student_answer", "marks_awarded", "max_marks", "is_correct",
+        ).order_by("id")
+        for attempt in attempts.iterator(chunk_size=2000):
+            answer = normalise_answer(attempt.student_answer)
+            if not answer:
+                continue
+            cid = case_id("exam", attempt.question_part_id, answer)
+            if cid in cases:
+                cases[cid]["count"] += 1
+                continue
+            score = 100 * attempt.marks_awarded / attempt.max_marks if attempt.max_marks else 0
+            cases[cid] = {
+                "id": cid,
+                "source": "exam",
+                "part": attempt.question_part_id,
+                "question": "",
+                "key": "",
+                "answer": answer,
+                "score": round(score, 1),
+                "is_correct": attempt.is_correct,
+                "count": 1,
+            }
+        return list(cases.values())
@@ -0,0 +1,37 @@
+"""Delete cached marks past GRADE_CACHE_TTL_DAYS.
+
+Expired rows are already ignored by lookups; this just stops the table
+growing without bound. Wire it to a daily scheduled task in production.
+
+    python manage.py purge_graded_answers --dry-run
+    python manage.py purge_graded_answers
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from interactive_lessons.models import GradedAnswer
+
+
+class Command(BaseCommand):
+    help = "Delete cached marks older than GRADE_CACHE_TTL_DAYS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report what would be deleted, delete nothing")
+
+    def handle(self, *args, **options):
+        ttl_days = getattr(settings, "GRADE_CACHE_TTL_DAYS", 30)
+        expired = GradedAnswer.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=ttl_days)
+        )
+        count = expired.count()
+        if not count:
+            self.stdout.write("Nothing to delete")
+        elif options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"Would delete {count} expired graded answers"))
+        else:
+            expired.delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {count} expired graded answers"))
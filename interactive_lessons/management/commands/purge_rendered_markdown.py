@@ -0,0 +1,39 @@
+"""Delete cached renders nobody has viewed for --days (default 90).
+
+Renders are addressed by their text, so edited or deleted questions leave
+their old HTML behind; this stops the table growing without bound. A worker
+marks a row as used when it loads it into memory, so a purged row that is
+still in use is just rendered again after the next restart.
+
+    python manage.py purge_rendered_markdown --dry-run
+    python manage.py purge_rendered_markdown --days 30
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from interactive_lessons.models import RenderedMarkdown
+
+
+class Command(BaseCommand):
+    help = "Delete cached renders not used for --days."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=90,
+                            help="Delete renders last used more than this many days ago (default 90)")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report what would be deleted, delete nothing")
+
+    def handle(self, *args, **options):
+        unused = RenderedMarkdown.objects.filter(
+            last_used_at__lt=timezone.now() - timedelta(days=options["days"])
+        )
+        count = unused.count()
+        if not count:
+            self.stdout.write("Nothing to delete")
+        elif options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"Would delete {count} unused renders"))
+        else:
+            unused.delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {count} unused renders"))
@@ -0,0 +1,80 @@
+"""Re-mark stored QuestionAttempts against the current answer keys.
+
+Run it after correcting a part's answer: attempts marked against the old
+key are re-marked in parallel grading processes (services/regrade.py), and
+the affected students' totals and homework are refreshed. No model calls
+unless --use-llm is given; answers only the model can score are counted and
+left as they were.
+
+    python manage.py regrade_attempts --part 412 --part 413 --dry-run
+    python manage.py regrade_attempts --question 97
+    python manage.py regrade_attempts --all --workers 8
+    python manage.py regrade_attempts --part 412 --use-llm
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from interactive_lessons.models import QuestionPart
+from interactive_lessons.services.regrade import CHUNK_SIZE, regrade_attempts
+
+
+class Command(BaseCommand):
+    help = "Re-mark QuestionAttempts on the given parts against their current answers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--part", type=int, action="append", default=[],
+                            help="QuestionPart id (repeatable)")
+        parser.add_argument("--question", type=int, action="append", default=[],
+                            help="Question id: every part of it (repeatable)")
+        parser.add_argument("--all", action="store_true",
+                            help="Every part that has attempts")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                            help="Grading processes (default: one per CPU; 0 grades in this process)")
+        parser.add_argument("--use-llm", action="store_true",
+                            help="Ask the model about answers the local checks can't score")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                            help=f"Attempts per bulk update (default {CHUNK_SIZE})")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report what would change, write nothing")
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            parts = QuestionPart.objects.filter(attempts__isnull=False).distinct()
+        elif options["part"] or options["question"]:
+            parts = QuestionPart.objects.filter(pk__in=options["part"]) | \
+                QuestionPart.objects.filter(question_id__in=options["question"])
+        else:
+            raise CommandError("Choose attempts to regrade with --part, --question or --all")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n🔁 Regrading attempts on {parts.count()} parts with {options['workers']} workers\n"
+        ))
+
+        def progress(done, total):
+            if done == total or done % 50 == 0:
+                self.stdout.write(f"   {done}/{total} answers marked", ending="\r" if done < total else "\n")
+                self.stdout.flush()
+
+        result = regrade_attempts(
+            parts,
+            workers=options["workers"],
+            use_llm=options["use_llm"],
+            chunk_size=options["chunk_size"],
+            dry_run=options["dry_run"],
+            progress=progress,
+        )
+
+        verb = "Would change" if options["dry_run"] else "Changed"
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {verb} {result.changed} of {result.attempts} attempts "
+            f"({result.answers} distinct answers, {len(result.students)} students)"
+        ))
+        if result.needs_model:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {result.needs_model} attempts need the model to score them; rerun with --use-llm"
+            ))
+        if result.unverified:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {result.unverified} attempts could not be checked in time and were left as they were"
+            ))
@@ -0,0 +1,120 @@
+"""
+Bring the stored HTML columns of lesson content up to date (questions, parts,
+notes, flashcards and revision sections; see services/rendered_content.py).
+
+Rows are stale when their text was changed without save() (a queryset
+update, bulk_create, an import) or after the renderer changed (a Markdown or
+markdown-katex upgrade, or render_cache.RENDER_VERSION). Pages still show
+them correctly, but render them on every view until this runs, so run it
+after deploying such a change.
+
+Each distinct text is rendered once. Texts the render cache already has cost
+nothing; the rest are spread over --workers processes, their maths sent to
+KaTeX a batch at a time.
+
+    python manage.py rerender_content --dry-run
+    python manage.py rerender_content
+    python manage.py rerender_content --model interactive_lessons.questionpart --all
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from core.katex_server import start_worker
+from interactive_lessons.services.render_cache import render_markdown_many, rendered_markdown
+from interactive_lessons.services.rendered_content import RenderedContent
+
+CHUNK_SIZE = 500
+# Texts per KaTeX round trip (see core/katex_server.py).
+RENDER_BATCH = 50
+
+
+def rendered_models():
+    return [model for model in apps.get_models() if issubclass(model, RenderedContent)]
+
+
+class Command(BaseCommand):
+    help = "Re-render stale HTML columns of questions, parts, notes, flashcards and revision sections."
+
+    def add_arguments(self, parser):
+        labels = ", ".join(model._meta.label_lower for model in rendered_models())
+        parser.add_argument("--model", action="append", default=[],
+                            help=f"Only this model (repeatable): {labels}")
+        parser.add_argument("--all", action="store_true",
+                            help="Re-render every row, not just stale ones")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Render processes (default: one per CPU; 0 renders in this process)")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report stale rows, render and write nothing")
+
+    def handle(self, *args, **options):
+        models = rendered_models()
+        if options["model"]:
+            by_label = {model._meta.label_lower: model for model in models}
+            unknown = [label for label in options["model"] if label.lower() not in by_label]
+            if unknown:
+                raise CommandError(f"Not a model with rendered content: {', '.join(unknown)}")
+            models = [by_label[label.lower()] for label in options["model"]]
+
+        stale = {}
+        for model in models:
+            fields = [model._meta.pk.name, "rendered_hash", *model.rendered_fields, *model.rendered_fields.values()]
+            rows = model.objects.only(*fields).iterator(chunk_size=2000)
+            stale[model] = [row for row in rows if options["all"] or not row.html_is_current()]
+            self.stdout.write(f"{model._meta.label_lower:<34}{len(stale[model]):>7} to render")
+
+        texts = {
+            getattr(row, source)
+            for model, rows in stale.items() if model.renderer == "markdown"
+            for row in rows for source in model.rendered_fields if getattr(row, source)
+        }
+        if options["dry_run"] or not any(stale.values()):
+            self.stdout.write(self.style.WARNING(f"\n{len(texts)} distinct texts; nothing written"))
+            return
+
+        html = self._render(texts, options["workers"])
+
+        def render(text):
+            return html[text] if text else ""
+
+        written = 0
+        for model, rows in stale.items():
+            changed = []
+            for row in rows:
+                row.render_html(render if model.renderer == "markdown" else None)
+                changed.append(row)
+            model.objects.bulk_update(
+                changed, ["rendered_hash", *model.rendered_fields.values()], batch_size=options["chunk_size"],
+            )
+            written += len(changed)
+        self.stdout.write(self.style.SUCCESS(f"\n✅ Re-rendered {written} rows from {len(texts)} distinct texts"))
+
+    def _render(self, texts, workers):
+        """{text: html}, from the render cache where possible and rendering the rest."""
+        html = rendered_markdown.get_many(texts)
+        missing = sorted(texts - html.keys())
+        self.stdout.write(f"\n{len(html)} texts already rendered, {len(missing)} to render")
+        if not missing:
+            return html
+
+        batches = [missing[start:start + RENDER_BATCH] for start in range(0, len(missing), RENDER_BATCH)]
+        if workers:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(workers, mp_context=context, initializer=start_worker) as pool:
+                self._collect(html, pool.map(render_markdown_many, batches), len(missing))
+        else:
+            self._collect(html, map(render_markdown_many, batches), len(missing))
+        return html
+
+    def _collect(self, html, rendered_batches, total):
+        done = 0
+        for rendered in rendered_batches:
+            for text, rendered_html in rendered.items():
+                html[text] = rendered_html
+                rendered_markdown.put(text, rendered_html)
+            done += len(rendered)
+            self.stdout.write(f"  {done}/{total}")
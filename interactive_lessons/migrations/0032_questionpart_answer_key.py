@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interactive_lessons", "0031_assign_topic_papers"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="questionpart",
+            name="answer_key",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interactive_lessons", "0032_questionpart_answer_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GradedAnswer",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("key", models.CharField(help_text="sha256 of the part, normalised answer and hint/solution flags", max_length=64, unique=True)),
+                ("marked_against", models.CharField(help_text="sha1 of the answer key and question text this was marked against", max_length=40)),
+                ("student_answer", models.TextField(help_text="Normalised student answer")),
+                ("hint_used", models.BooleanField(default=False)),
+                ("solution_used", models.BooleanField(default=False)),
+                ("score", models.IntegerField()),
+                ("is_correct", models.BooleanField(default=False)),
+                ("feedback", models.TextField(blank=True)),
+                ("hint", models.TextField(blank=True)),
+                ("hit_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_used_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("question_part", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="graded_answers", to="interactive_lessons.questionpart")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["created_at"], name="interactive_created_6a3d8b_idx")],
+            },
+        ),
+    ]
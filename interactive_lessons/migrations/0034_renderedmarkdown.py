@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 13:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interactive_lessons", "0033_gradedanswer"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RenderedMarkdown",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("key", models.CharField(help_text="sha256 of the renderer version and configuration and the source text", max_length=64, unique=True)),
+                ("html", models.TextField()),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_used_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "verbose_name": "Rendered Markdown",
+                "verbose_name_plural": "Rendered Markdown",
+                "indexes": [models.Index(fields=["last_used_at"], name="interactive_last_us_18bd3a_idx")],
+            },
+        ),
+    ]
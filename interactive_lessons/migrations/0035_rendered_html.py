@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interactive_lessons", "0034_renderedmarkdown"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="rendered_hash",
+            field=models.CharField(blank=True, editable=False, help_text="sha1 of the renderer and source text the HTML columns were rendered from", max_length=40),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="hint_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="solution_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="questionpart",
+            name="rendered_hash",
+            field=models.CharField(blank=True, editable=False, help_text="sha1 of the renderer and source text the HTML columns were rendered from", max_length=40),
+        ),
+        migrations.AddField(
+            model_name="questionpart",
+            name="prompt_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="questionpart",
+            name="expected_format_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="questionpart",
+            name="solution_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
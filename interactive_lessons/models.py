@@ -1,8 +1,10 @@
 # interactive_lessons/models.py
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 from django.contrib.auth.models import User
 from interactive_lessons.utils.katex_sanitizer import sanitize_katex
+from interactive_lessons.services.rendered_content import RenderedContent
 
 
 class Topic(models.Model):
@@ -75,7 +77,7 @@ class Section(models.Model):
         unique_together = ("topic", "name")
 
 
-class Question(models.Model):
+class Question(RenderedContent):
     """
     Acts as a container or stem for one or more QuestionParts.
     All actual content, answers, and marking live in QuestionPart.
@@ -149,6 +151,11 @@ class Question(models.Model):
         help_text="Mark this question as suitable for QuickFlicks videos (shows in dropdown when adding test questions)"
     )
 
+    # Rendered by save(); see services/rendered_content.py.
+    rendered_fields = {"hint": "hint_html", "solution": "solution_html"}
+    hint_html = models.TextField(blank=True, editable=False)
+    solution_html = models.TextField(blank=True, editable=False)
+
     def __str__(self):
         return f"{self.topic.name} - Q{self.order}"
 
@@ -183,7 +190,7 @@ class Question(models.Model):
         return prev_obj.id if prev_obj else None
 
 
-class QuestionPart(models.Model):
+class QuestionPart(RenderedContent):
     """
     Each QuestionPart is an actual sub-question, such as (a), (b), etc.
     All answers, hints, and marking logic belong here.
@@ -243,12 +250,32 @@ class QuestionPart(models.Model):
     scale = models.CharField(max_length=10, blank=True, null=True)
     max_marks = models.PositiveIntegerField(default=0)
 
+    # The answer parsed once for marking; kept in step with it by save().
+    # See services/answer_keys.py and `manage.py compile_answer_keys`.
+    answer_key = models.JSONField(blank=True, null=True, editable=False)
+
+    # Rendered by save(); see services/rendered_content.py.
+    rendered_fields = {"prompt": "prompt_html", "expected_format": "expected_format_html", "solution": "solution_html"}
+    prompt_html = models.TextField(blank=True, editable=False)
+    expected_format_html = models.TextField(blank=True, editable=False)
+    solution_html = models.TextField(blank=True, editable=False)
+
     class Meta:
         ordering = ("order",)
 
     def __str__(self):
         return f"{self.question} {self.label or self.order}"
 
+    def save(self, *args, **kwargs):
+        from .services.answer_keys import compile_answer_key, is_current, key_text
+
+        text = key_text(self)
+        if not is_current(self.answer_key, text):
+            self.answer_key = compile_answer_key(text)
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "answer_key"}
+        super().save(*args, **kwargs)
+
     def get_expected_format_display(self):
         """
         Returns the format instruction to show to students.
@@ -256,6 +283,69 @@ class QuestionPart(models.Model):
         return self.expected_format or ""
 
 
+class GradedAnswer(models.Model):
+    """A marked answer, reused when the same answer to the same part comes in again.
+
+    See services/grade_cache.py. Rows marked against an older version of the
+    part's answer or prompt are ignored, and deleted when the part is saved.
+    """
+    key = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="sha256 of the part, normalised answer and hint/solution flags"
+    )
+    question_part = models.ForeignKey(
+        QuestionPart,
+        on_delete=models.CASCADE,
+        related_name="graded_answers"
+    )
+    marked_against = models.CharField(
+        max_length=40,
+        help_text="sha1 of the answer key and question text this was marked against"
+    )
+    student_answer = models.TextField(help_text="Normalised student answer")
+    hint_used = models.BooleanField(default=False)
+    solution_used = models.BooleanField(default=False)
+    score = models.IntegerField()
+    is_correct = models.BooleanField(default=False)
+    feedback = models.TextField(blank=True)
+    hint = models.TextField(blank=True)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["created_at"])]
+
+    def __str__(self):
+        return f"{self.question_part}: {self.student_answer[:60]} ({self.score})"
+
+
+class RenderedMarkdown(models.Model):
+    """The HTML render_math_markdown produced for one piece of text.
+
+    See services/render_cache.py. Rows are addressed by a hash of the text
+    and the renderer, so they never go stale; text nobody views any more is
+    left behind, and ``manage.py purge_rendered_markdown`` deletes it.
+    """
+    key = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="sha256 of the renderer version and configuration and the source text"
+    )
+    html = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Rendered Markdown'
+        verbose_name_plural = 'Rendered Markdown'
+        indexes = [models.Index(fields=["last_used_at"])]
+
+    def __str__(self):
+        return f"{self.key[:12]} ({len(self.html)} chars)"
+
+
 class StudentInquiry(models.Model):
     """
     Stores student inquiries/messages sent to teachers, along with teacher replies.
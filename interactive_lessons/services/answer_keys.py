@@ -0,0 +1,88 @@
+"""Compiled answer keys, stored on QuestionPart.answer_key.
+
+Marking used to work out what kind of answer a part expects on every
+submission. It tried the interval parser, then the numeric normaliser, then
+SymPy (often through the LaTeX fallback) on the answer key, and only then
+looked at what the student wrote. The key never changes between
+submissions, so that work is done once, when the part is saved, and stored
+as JSON:
+
+* ``kind``: "interval", "numeric", "expression" or "text" (nothing parses,
+  so only GPT can mark it);
+* ``interval``: the key's bounds from parse_interval, or None;
+* ``values``: the key's numbers from normalise_numeric_answer;
+* ``srepr``: the key's SymPy form, rebuilt far more cheaply than re-parsing;
+* ``source``: a hash of the text it was compiled from. ``current_key``
+  ignores a key whose text has since changed (a queryset ``update()`` skips
+  the save hook), so marking falls back to working everything out as before.
+
+``manage.py compile_answer_keys`` fills in existing parts.
+"""
+import hashlib
+
+from interactive_lessons.stats_tutor import normalise_numeric_answer, parse_interval
+
+# Bump when the compiled format changes; older keys are then treated as stale.
+KEY_VERSION = 1
+
+
+def key_text(part):
+    """The text a part is marked against (grade_submission uses the same rule)."""
+    return part.answer or part.solution or ""
+
+
+def question_text(part):
+    """The question a part is marked against: its prompt, else its question's text.
+
+    Question.text was moved into QuestionPart.prompt (migration 0003) and the
+    field dropped, so the fallback is read only where the model still has it.
+    """
+    return part.prompt or getattr(part.question, "text", None) or ""
+
+
+def source_hash(text):
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def compile_answer_key(text):
+    """Compile an answer key's text into the dict stored on QuestionPart.answer_key."""
+    # Imported here so loading the models (and so every worker) doesn't import SymPy.
+    from sympy import Basic, srepr
+
+    from interactive_lessons.services.utils_math import _parse_any
+
+    interval = parse_interval(text)
+    values = normalise_numeric_answer(text)
+    try:
+        expr = _parse_any(text)
+    except Exception:
+        expr = None
+    if not isinstance(expr, Basic):
+        expr = None
+
+    if interval:
+        kind = "interval"
+    elif values:
+        kind = "numeric"
+    elif expr is not None:
+        kind = "expression"
+    else:
+        kind = "text"
+
+    return {
+        "version": KEY_VERSION,
+        "source": source_hash(text),
+        "kind": kind,
+        "interval": list(interval) if interval else None,
+        "values": values,
+        "srepr": srepr(expr) if expr is not None else None,
+    }
+
+
+def is_current(key, text):
+    return bool(key) and key.get("version") == KEY_VERSION and key.get("source") == source_hash(text)
+
+
+def current_key(part):
+    """The part's compiled key, or None if it is missing or out of date."""
+    return part.answer_key if is_current(part.answer_key, key_text(part)) else None
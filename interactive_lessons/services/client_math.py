@@ -0,0 +1,45 @@
+"""Markdown with the maths left for the browser to render.
+
+The same markdown-katex syntax as the server renderer ($`...`$ inline,
+```math fences for display), but instead of KaTeX HTML each formula becomes
+its escaped TeX between \\( \\) or \\[ \\] -- delimiters _base.html's KaTeX
+auto-render pass (Feedback.renderMaths) already renders. Formulas are still
+taken out before Markdown runs, so underscores and asterisks in the TeX are
+left alone.
+
+Used by render_cache.render_math_markdown when the math rendering mode is
+"client".
+"""
+from django.utils.html import escape
+from markdown_katex.extension import (
+    KatexExtension, KatexPostprocessor, KatexPreprocessor, _clean_block_text, _clean_inline_text, make_marker_id,
+)
+
+
+class ClientMathPreprocessor(KatexPreprocessor):
+    def _make_tag_for_block(self, block_lines):
+        indent_len = len(block_lines[0]) - len(block_lines[0].lstrip())
+        block_text = "\n".join(line[indent_len:] for line in block_lines).rstrip()
+        marker_tag = f"tmp_block_md_katex_{make_marker_id('block' + block_text)}"
+        tex = _clean_block_text(block_text)
+        header, _, rest = tex.partition("\n")
+        if "{" in header and "}" in header:
+            tex = rest   # KaTeX options for the block; the browser uses its own
+        self.ext.math_html[marker_tag] = f'<p class="math-display">\\[{escape(tex.strip())}\\]</p>'
+        return block_lines[0][:indent_len] + marker_tag
+
+    def _make_tag_for_inline(self, inline_text):
+        marker_tag = f"tmp_inline_md_katex_{make_marker_id('inline' + inline_text)}"
+        self.ext.math_html[marker_tag] = f'<span class="math-inline">\\({escape(_clean_inline_text(inline_text))}\\)</span>'
+        return marker_tag
+
+
+class ClientMathExtension(KatexExtension):
+    def __init__(self, **kwargs):
+        # The page loads KaTeX's stylesheet itself.
+        super().__init__(insert_fonts_css=False, **kwargs)
+
+    def extendMarkdown(self, md):
+        md.preprocessors.register(ClientMathPreprocessor(md, self), name="katex_fenced_code_block", priority=50)
+        md.postprocessors.register(KatexPostprocessor(md, self), name="katex_fenced_code_block", priority=0)
+        md.registerExtension(self)
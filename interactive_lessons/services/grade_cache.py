@@ -0,0 +1,116 @@
+"""Cache of marked answers, so a repeated submission costs a lookup.
+
+A class working through the same part makes the same mistakes -- the sign
+error in (b), the unsimplified surd in (c) -- and each wrong answer used to
+go all the way to gpt_grade. grade_submission now looks for an earlier mark
+first, in the GradedAnswer table (shared by every worker), keyed by:
+
+* the part,
+* the student's answer with surrounding whitespace stripped and inner runs
+  collapsed to one space (case and symbols are kept: they can change the
+  maths),
+* whether a hint or the solution was used, since those change the score.
+
+Each row records a hash of the answer key and question text it was marked
+against (``marked_against``). After a teacher edits either, the old rows are
+misses, and saving the part deletes them. Rows older than
+GRADE_CACHE_TTL_DAYS are misses too and are overwritten on the next mark;
+``manage.py purge_graded_answers`` deletes them.
+
+A mark is only stored if it is final: unverified results (grading timed out)
+and GPT failures are marked again next time.
+"""
+import hashlib
+import logging
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from interactive_lessons.services.answer_keys import key_text, question_text
+from interactive_lessons.stats_tutor import GPT_FAILED_FEEDBACK
+
+logger = logging.getLogger(__name__)
+
+
+def _enabled():
+    return getattr(settings, "GRADE_CACHE_ENABLED", True)
+
+
+def normalise_answer(text):
+    return re.sub(r"\s+", " ", (text or "").strip())
+
+
+def cache_key(part_id, answer, hint_used, solution_used):
+    raw = f"{part_id}\n{int(bool(hint_used))}{int(bool(solution_used))}\n{normalise_answer(answer)}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def marked_against(part):
+    """Hash of everything about the part that goes into a mark."""
+    return hashlib.sha1(f"{key_text(part)}\n{question_text(part)}".encode()).hexdigest()
+
+
+def _cutoff():
+    return timezone.now() - timedelta(days=getattr(settings, "GRADE_CACHE_TTL_DAYS", 30))
+
+
+def lookup(part, answer, hint_used=False, solution_used=False):
+    """Return the earlier result for this answer as grade_submission's dict, or None."""
+    from interactive_lessons.models import GradedAnswer
+
+    if not _enabled():
+        return None
+    key = cache_key(part.pk, answer, hint_used, solution_used)
+    try:
+        row = GradedAnswer.objects.filter(
+            key=key, marked_against=marked_against(part), created_at__gte=_cutoff(),
+        ).first()
+        if row is None:
+            return None
+        GradedAnswer.objects.filter(pk=row.pk).update(
+            hit_count=F("hit_count") + 1, last_used_at=timezone.now(),
+        )
+    except Exception:
+        # The cache must never be the reason an answer goes unmarked.
+        logger.warning("Graded-answer cache lookup failed", exc_info=True)
+        return None
+    return {"score": row.score, "is_correct": row.is_correct, "feedback": row.feedback, "hint": row.hint}
+
+
+def store(part, answer, hint_used, solution_used, result):
+    """Remember ``result`` for this answer, unless it isn't a final mark."""
+    from interactive_lessons.models import GradedAnswer
+
+    if not _enabled() or result.get("unverified") or result.get("feedback") == GPT_FAILED_FEEDBACK:
+        return
+    now = timezone.now()
+    try:
+        GradedAnswer.objects.update_or_create(
+            key=cache_key(part.pk, answer, hint_used, solution_used),
+            defaults={
+                "question_part": part,
+                "marked_against": marked_against(part),
+                "student_answer": normalise_answer(answer),
+                "hint_used": bool(hint_used),
+                "solution_used": bool(solution_used),
+                "score": round(result.get("score", 0)),
+                "is_correct": result.get("is_correct", False),
+                "feedback": result.get("feedback") or "",
+                "hint": result.get("hint") or "",
+                "hit_count": 0,
+                "created_at": now,
+                "last_used_at": now,
+            },
+        )
+    except Exception:
+        logger.warning("Could not store graded answer", exc_info=True)
+
+
+def invalidate(part):
+    """Delete marks made against an earlier version of ``part``."""
+    from interactive_lessons.models import GradedAnswer
+
+    GradedAnswer.objects.filter(question_part_id=part.pk).exclude(marked_against=marked_against(part)).delete()
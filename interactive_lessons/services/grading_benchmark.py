@@ -0,0 +1,86 @@
+"""Replay harness for the answer-marking hot path.
+
+``manage.py export_grading_corpus`` writes real submissions to a JSON
+corpus. It takes every distinct (part, answer) pair from QuestionAttempt and
+ExamQuestionAttempt, with the part's answer key and question text and the
+verdict stored at the time. Nothing identifies the student: no user, no
+timestamps, and repeats are folded into a count.
+
+``manage.py benchmark_grading`` replays a corpus through
+``parse_interval``, ``normalise_numeric_answer``, ``compare_algebraic`` and
+``mark_student_answer``, timing each one separately. A stub grader stands in
+for gpt_grade, so no model is called and the runs are repeatable. Exam parts
+have no text answer key (they are marked by vision against the scheme), so
+exam cases only exercise the two student-side parsers.
+
+A case's verdict is what every path decided. Saving the verdicts from one
+version and passing them as the baseline to the next shows exactly which
+answers a change to the marker would mark differently.
+"""
+import hashlib
+import time
+
+from interactive_lessons import stats_tutor
+from interactive_lessons.services.answer_keys import compile_answer_key
+from interactive_lessons.services.utils_math import compare_algebraic
+
+CORPUS_VERSION = 1
+PATHS = ("parse_interval", "normalise_numeric_answer", "compare_algebraic", "mark_student_answer")
+
+
+def case_id(source, part_id, answer):
+    """Stable across exports, so verdicts can be matched between runs."""
+    return f"{source}:{part_id}:{hashlib.sha1(answer.encode()).hexdigest()[:12]}"
+
+
+def _stub_gpt(question_text, student_answer, correct_answer):
+    return 0, "(model stubbed)", ""
+
+
+def _rounded(values):
+    return [round(v, 9) for v in values]
+
+
+def replay_case(case):
+    """Run one corpus case through each marking path.
+
+    Returns {"timings": {path: seconds}, "verdict": {...}}. Module-level so
+    a grading worker can run it under a time limit.
+    """
+    answer = case["answer"]
+    timings, verdict = {}, {}
+
+    start = time.perf_counter()
+    interval = stats_tutor.parse_interval(answer)
+    timings["parse_interval"] = time.perf_counter() - start
+    verdict["interval"] = list(interval) if interval else None
+
+    start = time.perf_counter()
+    values = stats_tutor.normalise_numeric_answer(answer)
+    timings["normalise_numeric_answer"] = time.perf_counter() - start
+    verdict["numeric"] = _rounded(values)
+
+    key_text = case.get("key")
+    if not key_text:
+        return {"timings": timings, "verdict": verdict}
+
+    start = time.perf_counter()
+    verdict["algebraic"] = compare_algebraic(answer, key_text, part_id=case["part"])
+    timings["compare_algebraic"] = time.perf_counter() - start
+
+    # Parts are compiled when saved, so this is not part of the timed path.
+    key = compile_answer_key(key_text)
+    start = time.perf_counter()
+    marked = stats_tutor.mark_student_answer(
+        case.get("question", ""), answer, key_text, part_id=case["part"], key=key, grader=_stub_gpt,
+    )
+    timings["mark_student_answer"] = time.perf_counter() - start
+    verdict["score"] = marked["score"]
+    # Whether the score itself came from the (stubbed) model, not just the feedback.
+    verdict["model"] = stats_tutor.auto_mark(answer, key_text, part_id=case["part"], key=key)[0] is None
+    return {"timings": timings, "verdict": verdict}
+
+
+def verdict_drift(verdicts, baseline):
+    """Case ids present in both runs whose verdicts differ, sorted."""
+    return sorted(cid for cid, verdict in verdicts.items() if cid in baseline and baseline[cid] != verdict)
@@ -0,0 +1,177 @@
+"""Warm worker processes for the SymPy half of answer marking.
+
+Parsing and simplifying a student's answer used to run inside the web worker,
+and SymPy has no timeout: an answer like ``9^9^9^9`` or a deep nest of
+radicals could hold a request -- and the worker serving it -- for minutes.
+
+GradingPool keeps GRADING_POOL_SIZE processes with Django set up and SymPy
+already imported. ``run`` hands one of them a function call and waits at most
+GRADING_TIMEOUT seconds for the answer. When the time runs out, the worker is
+killed and a fresh one is started to replace it. The caller gets
+GradingTimeout and can tell the student the answer could not be checked,
+instead of tying up the request.
+
+Workers are started with "spawn" rather than forked, because forking a
+threaded web process is unsafe. Each worker keeps its own
+utils_math.parsed_answers cache. That cache is keyed by the answer key's
+text, so an edited key never returns a stale parse, even though the
+invalidation signal only reaches the web process.
+
+With GRADING_POOL_SIZE = 0, ``run`` calls the function in-process with no
+time limit. That is what tests and scripts that patch the marking code want.
+"""
+import logging
+import multiprocessing
+import queue
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+READY = "ready"
+# A new worker imports Django and SymPy before it is ready: allow for that.
+BOOT_TIMEOUT = 60
+# How long a submission waits for a free worker before giving up.
+ACQUIRE_TIMEOUT = 10
+
+_context = multiprocessing.get_context("spawn")
+
+
+class GradingTimeout(Exception):
+    """The answer could not be checked in time (or its worker died)."""
+
+
+def _serve(conn):
+    """Worker main loop: run (func, args) calls until the pipe closes."""
+    import django
+
+    django.setup()
+    from interactive_lessons.services.utils_math import compare_algebraic
+
+    # Pay for SymPy's first-use costs (caches, lambdify, numpy) before any student does.
+    compare_algebraic("(x+1)^2", "x^2 + 2x + 1")
+    conn.send(READY)
+    while True:
+        try:
+            func, args = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        try:
+            conn.send((True, func(*args)))
+        except Exception as e:
+            conn.send((False, e))
+
+
+class _Worker:
+    def __init__(self):
+        self.conn, child = _context.Pipe()
+        self.process = _context.Process(target=_serve, args=(child,), name="grading-worker", daemon=True)
+        self.process.start()
+        child.close()
+
+    def stop(self):
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class GradingPool:
+    """A fixed-size set of grading workers, shared by every thread in the process."""
+
+    def __init__(self, size=None):
+        self._size = size       # None: follow GRADING_POOL_SIZE
+        self._lock = threading.Lock()
+        self._idle = queue.SimpleQueue()
+        self._workers = set()   # booting, idle and busy
+
+    def size(self):
+        size = getattr(settings, "GRADING_POOL_SIZE", 2) if self._size is None else self._size
+        return max(0, size)
+
+    def start(self):
+        """Top the pool up to GRADING_POOL_SIZE; new workers boot in the background."""
+        with self._lock:
+            new = [_Worker() for _ in range(self.size() - len(self._workers))]
+            self._workers.update(new)
+        for worker in new:
+            threading.Thread(target=self._boot, args=(worker,), name="grading-worker-boot", daemon=True).start()
+
+    def _boot(self, worker):
+        try:
+            ready = worker.conn.poll(BOOT_TIMEOUT) and worker.conn.recv() == READY
+        except (EOFError, OSError):
+            ready = False
+        if ready:
+            self._idle.put(worker)
+        elif worker in self._workers:   # not stopped by shutdown() while booting
+            # Not replaced straight away, so a broken environment can't spawn in a loop;
+            # the next run() tops the pool up again.
+            logger.error("Grading worker %s failed to start", worker.process.pid)
+            self._retire(worker)
+
+    def _retire(self, worker):
+        worker.stop()
+        with self._lock:
+            self._workers.discard(worker)
+
+    def _acquire(self):
+        while True:
+            try:
+                worker = self._idle.get(timeout=ACQUIRE_TIMEOUT)
+            except queue.Empty:
+                raise GradingTimeout("no grading worker became free") from None
+            if worker.process.is_alive():
+                return worker
+            logger.warning("Grading worker %s died while idle", worker.process.pid)
+            self._retire(worker)
+            self.start()
+
+    def run(self, func, *args, timeout=None):
+        """Return ``func(*args)`` computed in a worker, or raise GradingTimeout.
+
+        ``func`` must be importable by module path (pickled by reference).
+        Exceptions it raises are re-raised here.
+        """
+        if not self.size():
+            return func(*args)
+        if timeout is None:
+            timeout = getattr(settings, "GRADING_TIMEOUT", 5.0)
+
+        self.start()
+        worker = self._acquire()
+        try:
+            worker.conn.send((func, args))
+            if not worker.conn.poll(timeout):
+                raise GradingTimeout(f"gave up after {timeout}s")
+            ok, value = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            self._replace(worker)
+            raise GradingTimeout("grading worker died") from e
+        except BaseException:
+            self._replace(worker)
+            raise
+        self._idle.put(worker)
+        if not ok:
+            raise value
+        return value
+
+    def _replace(self, worker):
+        logger.warning("Killing grading worker %s", worker.process.pid)
+        self._retire(worker)
+        self.start()
+
+    def shutdown(self):
+        """Stop every worker; ``start`` or the next ``run`` boots new ones."""
+        with self._lock:
+            workers, self._workers = self._workers, set()
+        for worker in workers:
+            worker.stop()
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                return
+
+
+grading_pool = GradingPool()
@@ -1,12 +1,29 @@
+import logging
+
 from interactive_lessons.models import QuestionPart
-from sympy import simplify
-from sympy.parsing.sympy_parser import (
-    parse_expr, standard_transformations,
-    implicit_multiplication_application, convert_xor
-)
-from sympy.core.sympify import SympifyError
-from interactive_lessons.services.utils_math import compare_algebraic
-from interactive_lessons.stats_tutor import mark_student_answer
+from interactive_lessons.services import grade_cache
+from interactive_lessons.services.answer_keys import current_key, key_text, question_text
+from interactive_lessons.services.grading_pool import GradingTimeout, grading_pool
+from interactive_lessons.stats_tutor import auto_mark, mark_student_answer
+
+logger = logging.getLogger(__name__)
+
+
+def check_locally(student_answer, correct_answer, part_id, key=None):
+    """
+    Everything in grading that runs SymPy on the student's input; it runs in
+    a grading worker. ``key`` is the part's compiled answer key, if current.
+    Returns (algebraic_match, auto_mark result or None).
+    """
+    # Imported here: with a grading pool running, the web process never needs SymPy.
+    from interactive_lessons.services.utils_math import compare_algebraic
+
+    parseable = key is None or key["kind"] != "text"
+    correct_srepr = key["srepr"] if key is not None else None
+    if parseable and compare_algebraic(student_answer, correct_answer, part_id=part_id, correct_srepr=correct_srepr):
+        return True, None
+    # The algebraic check already failed, so auto_mark needn't repeat it.
+    return False, auto_mark(student_answer, correct_answer, part_id=part_id, check_algebraic=False, key=key)
 
 
 # ----------------------------------------------------------------------
@@ -16,33 +33,59 @@ def grade_submission(question_part_id, student_answer, hint_used=False, solution
     """
     Retrieve the correct answer & question text from the DB,
     perform algebraic check first, then call the local/GPT-based marker.
+
+    If the answer can't be checked within GRADING_TIMEOUT the result has
+    ``unverified`` set and should not be recorded as an attempt. An answer
+    this part has already marked is answered from grade_cache.
     """
     try:
         part = QuestionPart.objects.select_related("question").get(id=question_part_id)
     except QuestionPart.DoesNotExist:
         return {"score": 0, "feedback": "Question part not found.", "hint": ""}
 
-    question_text = part.prompt or part.question.text or ""
-    correct_answer = part.answer or part.solution or ""
+    correct_answer = key_text(part)
 
-    # --- 1️⃣ Local algebraic equivalence check first ---
-    if compare_algebraic(student_answer, correct_answer):
+    # --- 0️⃣ The same answer to this part may already have been marked ---
+    cached = grade_cache.lookup(part, student_answer, hint_used, solution_used)
+    if cached is not None:
+        return cached
+
+    try:
+        algebraic_match, auto = grading_pool.run(
+            check_locally, student_answer, correct_answer, part.id, current_key(part)
+        )
+    except GradingTimeout as e:
+        logger.warning("Could not verify answer %r to part %s: %s", student_answer[:200], part.id, e)
         return {
+            "score": 0,
+            "is_correct": False,
+            "unverified": True,
+            "feedback": "Sorry — we couldn't check that answer automatically. "
+                        "Try writing it in a simpler form and submit it again.",
+            "hint": "",
+        }
+
+    # --- 1️⃣ Local algebraic equivalence check first ---
+    if algebraic_match:
+        result = {
             "score": 100,
             "is_correct": True,
             "feedback": "Excellent — your algebraic simplification is fully correct.",
             "hint": "Perfect use of like terms and signs.",
         }
+    else:
+        # --- 2️⃣ Otherwise fall back to GPT/local numeric marking ---
+        result = mark_student_answer(
+            question_text=question_text(part),
+            student_answer=student_answer,
+            correct_answer=correct_answer,
+            hint_used=hint_used,
+            solution_used=solution_used,
+            part_id=part.id,
+            auto=auto,
+        )
+        # ensure consistent keys
+        result.setdefault("is_correct", result.get("score", 0) >= 90)
 
-    # --- 2️⃣ Otherwise fall back to GPT/local numeric marking ---
-    result = mark_student_answer(
-        question_text=question_text,
-        student_answer=student_answer,
-        correct_answer=correct_answer,
-        hint_used=hint_used,
-        solution_used=solution_used,
-    )
-
-    # ensure consistent keys
-    result.setdefault("is_correct", result.get("score", 0) >= 90)
+    grade_cache.store(part, student_answer, hint_used, solution_used, result)
     return result
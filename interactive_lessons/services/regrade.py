@@ -0,0 +1,187 @@
+"""Re-mark stored QuestionAttempts, e.g. after a wrong answer key is fixed.
+
+An attempt stores the score it was given at the time, so correcting a part's
+answer used to leave every earlier attempt marked against the old one. This
+re-runs the local checks (services/marking.check_locally) over every attempt
+on the chosen parts:
+
+* Attempts are grouped by part and normalised answer first. A class that
+  typed the same thing is marked once, not thirty times.
+* Groups are spread over grading worker processes (grading_pool), so each
+  answer keeps its time limit and a stuck one doesn't stall the run.
+* Answers only the model can score are left alone unless ``use_llm`` is set.
+  Those model calls go through grade_cache, so an answer already marked
+  against the corrected key costs nothing.
+* Changed attempts are written with ``bulk_update`` in chunks. Each affected
+  student's total_score is then recomputed, and their section homework tasks
+  re-checked for auto-completion.
+
+Scores use grade_submission's rules without hint or solution deductions;
+attempts never record those.
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from django.db.models import Sum
+
+from interactive_lessons.services import grade_cache
+from interactive_lessons.services.answer_keys import current_key, key_text, question_text
+from interactive_lessons.services.grading_pool import GradingPool, GradingTimeout, grading_pool
+from interactive_lessons.services.marking import check_locally
+from interactive_lessons.stats_tutor import GPT_FAILED_FEEDBACK, mark_student_answer
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+
+@dataclass
+class RegradeResult:
+    attempts: int = 0       # attempts with an answer on the chosen parts
+    answers: int = 0        # distinct (part, answer) pairs marked
+    changed: int = 0        # attempts whose score or correctness changed
+    needs_model: int = 0    # left alone: only the model can score them
+    unverified: int = 0     # left alone: grading timed out or failed
+    students: set = field(default_factory=set)
+
+
+def _local_mark(algebraic_match, auto):
+    """(score, is_correct) from check_locally alone, or None if the model must score it."""
+    if algebraic_match:
+        return 100, True
+    base_score = auto[0]
+    if base_score is None:
+        return None
+    return base_score, base_score >= 90
+
+
+def refresh_students(profile_ids, chunk_size=CHUNK_SIZE):
+    """Recompute total_score and re-check section homework for these students."""
+    from homework.models import StudentHomeworkProgress
+    from students.models import QuestionAttempt, StudentProfile
+
+    totals = dict(
+        QuestionAttempt.objects.filter(student_id__in=profile_ids)
+        .values_list("student_id").annotate(total=Sum("score_awarded"))
+    )
+    profiles = list(StudentProfile.objects.filter(pk__in=profile_ids).only("id", "total_score"))
+    for profile in profiles:
+        profile.total_score = totals.get(profile.pk) or 0
+    StudentProfile.objects.bulk_update(profiles, ["total_score"], batch_size=chunk_size)
+
+    # Auto-completion only asks whether the section was attempted, so a
+    # regrade can complete a task that was missed but never un-complete one.
+    progress = StudentHomeworkProgress.objects.filter(
+        student__studentprofile__in=profile_ids, is_completed=False, task__task_type="section",
+    ).select_related("task__section", "student")
+    for row in progress:
+        row.check_auto_completion()
+
+
+def regrade_attempts(parts, workers=None, use_llm=False, chunk_size=CHUNK_SIZE, dry_run=False, progress=None):
+    """Re-mark every QuestionAttempt on ``parts`` (a QuestionPart queryset).
+
+    ``workers`` is how many grading processes to start for the run. None
+    uses the shared grading_pool, and 0 marks in this process with no time
+    limit. ``progress(done, total)`` is called as each distinct answer is
+    marked. With ``dry_run`` nothing is written. Returns a RegradeResult.
+    """
+    from students.models import QuestionAttempt
+
+    parts = {part.pk: part for part in parts.select_related("question")}
+    keys = {pk: current_key(part) for pk, part in parts.items()}
+    result = RegradeResult()
+
+    groups = defaultdict(list)   # (part id, normalised answer) -> attempts
+    attempts = QuestionAttempt.objects.filter(question_part_id__in=parts).only(
+        "id", "student_id", "question_part_id", "student_answer",
+        "score_awarded", "is_correct", "marks_awarded",
+    )
+    for attempt in attempts.iterator(chunk_size=2000):
+        answer = grade_cache.normalise_answer(attempt.student_answer)
+        if answer:
+            groups[(attempt.question_part_id, answer)].append(attempt)
+    result.attempts = sum(len(group) for group in groups.values())
+    result.answers = len(groups)
+
+    changed = []
+
+    def flush():
+        if changed and not dry_run:
+            QuestionAttempt.objects.bulk_update(
+                changed, ["score_awarded", "is_correct", "marks_awarded"], batch_size=chunk_size,
+            )
+        changed.clear()
+
+    def apply(group_key, score, is_correct):
+        part = parts[group_key[0]]
+        # Same rule as QuestionAttempt.save(), which bulk_update bypasses.
+        marks = round((score / 100.0) * float(part.max_marks or 1), 2)
+        for attempt in groups[group_key]:
+            if attempt.score_awarded == score and attempt.is_correct == is_correct:
+                continue
+            attempt.score_awarded, attempt.is_correct, attempt.marks_awarded = score, is_correct, marks
+            changed.append(attempt)
+            result.changed += 1
+            result.students.add(attempt.student_id)
+        if len(changed) >= chunk_size:
+            flush()
+
+    def mark(group_key):
+        part_id, answer = group_key
+        return pool.run(check_locally, answer, key_text(parts[part_id]), part_id, keys[part_id])
+
+    pool = grading_pool if workers is None else GradingPool(size=workers)
+    for_model = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, pool.size())) as threads:
+            futures = {threads.submit(mark, group_key): group_key for group_key in groups}
+            for done, future in enumerate(as_completed(futures), 1):
+                group_key = futures[future]
+                try:
+                    algebraic_match, auto = future.result()
+                except Exception as e:
+                    if not isinstance(e, GradingTimeout):
+                        logger.exception("Could not regrade %r on part %s", group_key[1], group_key[0])
+                    result.unverified += len(groups[group_key])
+                else:
+                    local = _local_mark(algebraic_match, auto)
+                    if local is None:
+                        for_model.append((group_key, auto))
+                    else:
+                        apply(group_key, *local)
+                if progress:
+                    progress(done, len(groups))
+    finally:
+        if pool is not grading_pool:
+            pool.shutdown()
+
+    # Model calls stay on this thread: grade_cache reads and writes the database.
+    for group_key, auto in for_model:
+        if not use_llm:
+            result.needs_model += len(groups[group_key])
+            continue
+        part_id, answer = group_key
+        part = parts[part_id]
+        marked = grade_cache.lookup(part, answer)
+        if marked is None:
+            marked = mark_student_answer(
+                question_text=question_text(part),
+                student_answer=answer,
+                correct_answer=key_text(part),
+                part_id=part_id,
+                auto=auto,
+            )
+            marked.setdefault("is_correct", marked.get("score", 0) >= 90)
+            grade_cache.store(part, answer, False, False, marked)
+        if marked.get("feedback") == GPT_FAILED_FEEDBACK:
+            result.unverified += len(groups[group_key])
+            continue
+        apply(group_key, marked["score"], marked["is_correct"])
+
+    flush()
+    if result.students and not dry_run:
+        refresh_students(result.students, chunk_size)
+    return result
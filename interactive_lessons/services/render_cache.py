@@ -0,0 +1,261 @@
+"""Cache of render_math_markdown output, so each piece of maths is rendered once.
+
+Every question page renders the question's hint and solution and each part's
+prompt, expected format and solution through Markdown and markdown-katex, and
+so does every AJAX grading response. KaTeX runs in a node process, so one
+render with maths costs ~100 ms, and a page with a few parts costs a second
+before the template starts. The text only changes when a teacher edits it.
+
+Renders are addressed by a sha256 of the text, the Markdown extensions and
+their config, the installed Markdown and markdown-katex versions, and
+RENDER_VERSION. Two tiers sit in front of the renderer:
+
+1. A per-process LRU of RENDER_CACHE_SIZE entries -- no I/O at all.
+2. The RenderedMarkdown table, shared by every worker and surviving deploys.
+
+Since the key covers everything that goes into the HTML, an entry is never
+stale: edited text is simply a different key, and upgrading either library
+or bumping RENDER_VERSION (do that whenever render_math_markdown's output
+changes) moves every render to new keys. Rows for text nobody views any more
+are deleted by ``manage.py purge_rendered_markdown``.
+
+A render that raises is not cached; the exception reaches the caller as before.
+
+With MATH_RENDERING = "client" (site-wide, or per view with
+``math_rendering("client")``) the maths is left as TeX for the browser's
+KaTeX (services/client_math.py) and only Markdown runs here; those renders are
+cached under their own keys. Print, PDF and email output has no browser to do
+that, so code producing them wraps itself in ``math_rendering("server")``.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from importlib.metadata import PackageNotFoundError, version
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+logger = logging.getLogger(__name__)
+
+# Bump when render_math_markdown's output changes for the same text.
+RENDER_VERSION = 1
+
+# Passed to markdown.markdown by render_markdown (KatexExtension is added there).
+EXTENSIONS = ("extra", "fenced_code", "tables")
+DB_BATCH = 500
+MATH_MODES = ("server", "client")
+
+_math_mode = ContextVar("math_mode", default=None)
+
+
+def _enabled():
+    return getattr(settings, "RENDER_CACHE_ENABLED", True)
+
+
+def _package_version(name):
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return "?"
+
+
+_signature = None
+
+
+def renderer_signature():
+    """Everything about the renderer that can change the HTML for the same text."""
+    global _signature
+    if _signature is None:
+        from markdown_katex import KatexExtension
+
+        katex_config = sorted(KatexExtension().getConfigs().items())
+        _signature = (
+            f"v{RENDER_VERSION}|{','.join(EXTENSIONS)}|katex:{katex_config}"
+            f"|Markdown=={_package_version('Markdown')}|markdown-katex=={_package_version('markdown-katex')}"
+        )
+    return _signature
+
+
+def cache_key(text, variant=""):
+    signature = f"{renderer_signature()}|{variant}" if variant else renderer_signature()
+    return hashlib.sha256(f"{signature}\n{text}".encode()).hexdigest()
+
+
+def math_mode():
+    """Where render_math_markdown renders maths: "server" or "client"."""
+    return _math_mode.get() or getattr(settings, "MATH_RENDERING", "server")
+
+
+@contextmanager
+def math_rendering(mode):
+    """Render maths on the server or in the browser for the block (or the decorated view)."""
+    if mode not in MATH_MODES:
+        raise ValueError(f"math rendering mode must be one of {MATH_MODES}, not {mode!r}")
+    token = _math_mode.set(mode)
+    try:
+        yield
+    finally:
+        _math_mode.reset(token)
+
+
+class RenderCache:
+    """Process LRU backed by the RenderedMarkdown table."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> html
+
+    def clear(self):
+        """Empty the process tier (the table is left alone)."""
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, html):
+        max_size = getattr(settings, "RENDER_CACHE_SIZE", 2048)
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def _local_hit(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+        return html
+
+    def _stored(self, key):
+        from interactive_lessons.models import RenderedMarkdown
+
+        try:
+            html = RenderedMarkdown.objects.filter(key=key).values_list("html", flat=True).first()
+            if html is not None:
+                # Once per process per entry, so purge can tell what is still viewed.
+                RenderedMarkdown.objects.filter(key=key).update(last_used_at=timezone.now())
+        except Exception:
+            # The cache must never be the reason a page fails to render.
+            logger.warning("Rendered-markdown cache lookup failed", exc_info=True)
+            return None
+        return html
+
+    def get_many(self, texts):
+        """{text: html} for every text either tier already has; misses are left out."""
+        if not _enabled():
+            return {}
+        from interactive_lessons.models import RenderedMarkdown
+
+        found, missing = {}, {}
+        for text in set(texts):
+            key = cache_key(text)
+            html = self._local_hit(key)
+            if html is None:
+                missing[key] = text
+            else:
+                found[text] = html
+        keys = list(missing)
+        try:
+            for start in range(0, len(keys), DB_BATCH):
+                batch = keys[start:start + DB_BATCH]
+                rows = RenderedMarkdown.objects.filter(key__in=batch).values_list("key", "html")
+                hits = {key: html for key, html in rows}
+                if hits:
+                    RenderedMarkdown.objects.filter(key__in=hits).update(last_used_at=timezone.now())
+                for key, html in hits.items():
+                    self._remember(key, html)
+                    found[missing[key]] = html
+        except Exception:
+            logger.warning("Rendered-markdown cache lookup failed", exc_info=True)
+        return found
+
+    def put(self, text, html):
+        """Record a render made outside get_or_render (e.g. in a worker process)."""
+        if _enabled():
+            key = cache_key(text)
+            self._store(key, html)
+            self._remember(key, html)
+
+    def _store(self, key, html):
+        from interactive_lessons.models import RenderedMarkdown
+
+        now = timezone.now()
+        try:
+            RenderedMarkdown.objects.update_or_create(
+                key=key, defaults={"html": html, "created_at": now, "last_used_at": now},
+            )
+        except Exception:
+            logger.warning("Could not store rendered markdown", exc_info=True)
+
+    def get_or_render(self, text, render, variant=""):
+        """Return the HTML for ``text``, calling ``render(text)`` only on a miss in both tiers."""
+        if not _enabled():
+            return render(text)
+        key = cache_key(text, variant)
+
+        html = self._local_hit(key)
+        if html is not None:
+            return html
+
+        html = self._stored(key)
+        if html is None:
+            html = render(text)
+            self._store(key, html)
+        self._remember(key, html)
+        return html
+
+
+rendered_markdown = RenderCache()
+
+
+def render_markdown(text):
+    """Render ``text`` without the cache. Module-level so worker processes can run it."""
+    import markdown
+    from markdown_katex import KatexExtension
+
+    return markdown.markdown(text, extensions=[*EXTENSIONS, KatexExtension()])
+
+
+def render_markdown_client(text):
+    """Render ``text`` without the cache, leaving its maths to the browser."""
+    import markdown
+
+    from interactive_lessons.services.client_math import ClientMathExtension
+
+    return markdown.markdown(text, extensions=[*EXTENSIONS, ClientMathExtension()])
+
+
+def render_markdown_many(texts):
+    """{text: html} for ``texts``, uncached, with all their maths sent to KaTeX in one round trip."""
+    from core.katex_server import batched
+
+    texts = list(dict.fromkeys(texts))
+    return dict(zip(texts, batched(render_markdown, texts)))
+
+
+def render_math_markdown_many(texts):
+    """{text: html} for ``texts``, like render_math_markdown for each but rendering the misses together.
+
+    Every formula in the texts the cache does not have goes to KaTeX in one
+    batch, each distinct formula once.
+    """
+    texts = {text for text in texts if text}
+    html = rendered_markdown.get_many(texts)
+    missing = texts - html.keys()
+    if missing:
+        for text, rendered in render_markdown_many(missing).items():
+            rendered_markdown.put(text, rendered)
+            html[text] = rendered
+    return {text: mark_safe(rendered) for text, rendered in html.items()}
+
+
+def render_math_markdown(text):
+    """HTML for ``text``; each distinct text is rendered once."""
+    if not text:
+        return ""
+    if math_mode() == "client":
+        return mark_safe(rendered_markdown.get_or_render(text, render_markdown_client, variant="client"))
+    return mark_safe(rendered_markdown.get_or_render(text, render_markdown))
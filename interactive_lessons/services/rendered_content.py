@@ -0,0 +1,147 @@
+"""Pre-rendered HTML columns for lesson content.
+
+Questions, parts, notes, flashcards and revision sections are written once
+and then shown thousands of times. Rendering them on the request path (each
+text through Markdown and KaTeX) cost more than the rest of the page, so the
+models that show them inherit RenderedContent. It stores an HTML column for
+each source field, rendered on save, and views serve it as is.
+
+A model lists its ``rendered_fields`` (source field -> HTML column, which the
+model declares) and its ``renderer``:
+
+* "markdown": render_math_markdown, which goes through services/render_cache;
+* "linebreaks": Django's linebreaks filter, for text shown without Markdown.
+
+``rendered_hash`` is a sha1 of the renderer and every source text as of the
+last render. ``rendered_html`` only serves the stored columns when the hash
+still matches. A queryset ``update()`` or ``bulk_create`` skips save(), and
+a Markdown or markdown-katex upgrade changes the renderer; in those cases
+``rendered_html`` renders the text now instead (cheap through the render
+cache), so a page never shows stale HTML. ``manage.py rerender_content``
+brings every stale row up to date in bulk.
+
+A page showing several rows calls ``prerender(rows)`` first, so whatever
+has to be rendered for the page is rendered in one batch rather than text by
+text.
+
+The columns always hold server-rendered maths. In client maths mode (see
+render_cache.math_rendering) ``rendered_html`` leaves them alone and serves
+the Markdown-only rendering, with the TeX for the browser.
+"""
+import hashlib
+import logging
+
+from django.db import models
+from django.utils.functional import cached_property
+from django.utils.html import linebreaks
+from django.utils.safestring import mark_safe
+
+from interactive_lessons.services import render_cache
+
+logger = logging.getLogger(__name__)
+
+
+class RenderedContent(models.Model):
+    rendered_fields = {}
+    renderer = "markdown"
+
+    rendered_hash = models.CharField(
+        max_length=40, blank=True, editable=False,
+        help_text="sha1 of the renderer and source text the HTML columns were rendered from",
+    )
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def renderer_signature(cls):
+        if cls.renderer == "linebreaks":
+            return "linebreaks"
+        return render_cache.renderer_signature()
+
+    @classmethod
+    def render_text(cls, text):
+        """HTML for one source text, as stored in the model's HTML columns."""
+        if not text:
+            return ""
+        if cls.renderer == "linebreaks":
+            return linebreaks(text, autoescape=True)
+        with render_cache.math_rendering("server"):
+            return str(render_cache.render_math_markdown(text))
+
+    def sources_hash(self):
+        digest = hashlib.sha1(self.renderer_signature().encode())
+        for source in self.rendered_fields:
+            digest.update(b"\0" + (getattr(self, source) or "").encode())
+        return digest.hexdigest()
+
+    def html_is_current(self):
+        return self.rendered_hash == self.sources_hash()
+
+    def render_html(self, render=None):
+        """Fill every HTML column from its source field. ``render`` replaces render_text."""
+        render = render or self.render_text
+        for source, column in self.rendered_fields.items():
+            setattr(self, column, render(getattr(self, source) or ""))
+        self.rendered_hash = self.sources_hash()
+        self.__dict__.pop("rendered_html", None)
+
+    @cached_property
+    def rendered_html(self):
+        """{source field: safe HTML} -- the stored columns, or rendered now if they are stale."""
+        if self.renderer == "markdown" and render_cache.math_mode() == "client":
+            return {
+                source: render_cache.render_math_markdown(getattr(self, source) or "")
+                for source in self.rendered_fields
+            }
+        if self.html_is_current():
+            return {source: mark_safe(getattr(self, column)) for source, column in self.rendered_fields.items()}
+        return {
+            source: mark_safe(self.render_text(getattr(self, source) or ""))
+            for source in self.rendered_fields
+        }
+
+    def save(self, *args, **kwargs):
+        if not self.html_is_current():
+            try:
+                self.render_html()
+            except Exception:
+                # Saving the content matters more than its HTML: leave the
+                # columns stale and rendered_html renders on demand.
+                logger.warning("Could not render %s %s", type(self).__name__, self.pk, exc_info=True)
+            else:
+                if kwargs.get("update_fields") is not None:
+                    kwargs["update_fields"] = {
+                        *kwargs["update_fields"], *self.rendered_fields.values(), "rendered_hash",
+                    }
+        super().save(*args, **kwargs)
+
+
+def prerender(objects):
+    """Fill ``rendered_html`` for every object on a page at once.
+
+    Objects with current HTML columns need nothing. For the stale ones, each
+    distinct text is looked up in the render cache and the rest rendered
+    together, their formulas collected across every snippet, de-duplicated
+    and sent to KaTeX in one round trip.
+    """
+    if render_cache.math_mode() == "client":
+        return objects   # Markdown only: nothing worth batching
+    stale = [obj for obj in objects if not obj.html_is_current()]
+    texts = {
+        getattr(obj, source) for obj in stale if obj.renderer == "markdown"
+        for source in obj.rendered_fields if getattr(obj, source)
+    }
+    html = {}
+    if texts:
+        try:
+            html = render_cache.render_math_markdown_many(texts)
+        except Exception:
+            # One bad snippet spoils the batch: render them one by one as before.
+            logger.warning("Could not render the page's content in one batch", exc_info=True)
+    for obj in stale:
+        obj.__dict__["rendered_html"] = {
+            source: html.get(getattr(obj, source) or "") or mark_safe(obj.render_text(getattr(obj, source) or ""))
+            for source in obj.rendered_fields
+        }
+    return objects
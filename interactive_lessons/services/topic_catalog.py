@@ -0,0 +1,105 @@
+"""The topic list behind select_topic, with each topic's content counts.
+
+select_topic used to count notes, questions, cheat sheets, quick kicks,
+flashcard sets and exam questions, and fetch the revision module, topic by
+topic: seven queries per topic on every visit to the landing page. Here each
+count is one grouped query over all of a subject's topics, so a catalog costs
+eight queries however many topics there are, and is then kept in Django's
+cache (per process with the default LocMemCache, shared with Redis or
+memcached in CACHES) for TOPIC_CATALOG_TTL seconds.
+
+Saving or deleting any of the counted models (or a topic, or an exam paper,
+whose publishing decides which exam questions count) bumps a generation
+number every catalog key includes, so the next visit builds a fresh one.
+With a per-process cache only the worker that made the change sees the bump
+straight away, and queryset update()/bulk_create send no signals; the TTL
+bounds how stale either can get.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+GENERATION_KEY = "topic_catalog:generation"
+
+# (label, model, filter) for each per-topic count: label_count in the catalog.
+COUNTS = (
+    ("note", "notes.Note", {}),
+    ("question", "interactive_lessons.Question", {}),
+    ("cheatsheet", "cheatsheets.CheatSheet", {}),
+    ("quickkick", "quickkicks.QuickKick", {}),
+    ("flashcard", "flashcards.FlashcardSet", {"is_published": True}),
+    ("exam_question", "exam_papers.ExamQuestion", {"exam_paper__is_published": True}),
+)
+# Changes to these can change a catalog.
+CATALOG_MODELS = (
+    "interactive_lessons.Topic", "exam_papers.ExamPaper", "revision.RevisionModule",
+    *(model for _, model, _ in COUNTS),
+)
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 0, timeout=None)
+        generation = cache.get(GENERATION_KEY, 0)
+    return generation
+
+
+def invalidate():
+    """Make every cached catalog stale (each worker's, with a per-process cache)."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+
+
+def build_catalog(subject=None):
+    """[{"topic": topic, "note_count": n, "has_notes": bool, ...}] in display order."""
+    Topic = apps.get_model("interactive_lessons", "Topic")
+    RevisionModule = apps.get_model("revision", "RevisionModule")
+
+    topics = Topic.objects.all() if subject is None else Topic.objects.filter(subject=subject)
+    # Model Meta orders by (order, name), so an unset order falls back to
+    # alphabetical. Ordering here explicitly would discard the manual order.
+    topics = list(topics.order_by("order", "name"))
+    topic_ids = [topic.pk for topic in topics]
+
+    counts = {}
+    for label, model, filters in COUNTS:
+        rows = (
+            apps.get_model(model).objects.filter(topic__in=topic_ids, **filters)
+            .order_by().values("topic").annotate(n=Count("pk")).values_list("topic", "n")
+        )
+        counts[label] = dict(rows)
+    revision_modules = {
+        module.topic_id: module
+        for module in RevisionModule.objects.filter(topic__in=topic_ids, is_published=True)
+    }
+
+    catalog = []
+    for topic in topics:
+        item = {"topic": topic}
+        for label, _, _ in COUNTS:
+            item[f"{label}_count"] = counts[label].get(topic.pk, 0)
+        item.update(
+            has_notes=item["note_count"] > 0,
+            has_cheatsheets=item["cheatsheet_count"] > 0,
+            has_quickkicks=item["quickkick_count"] > 0,
+            has_flashcards=item["flashcard_count"] > 0,
+            has_exam_questions=item["exam_question_count"] > 0,
+            has_revision=topic.pk in revision_modules,
+            revision_module=revision_modules.get(topic.pk),
+        )
+        catalog.append(item)
+    return catalog
+
+
+def topic_catalog(subject=None):
+    """The catalog for ``subject`` (every topic if None), from the cache when it is current."""
+    key = f"topic_catalog:{_generation()}:{subject.pk if subject is not None else 'all'}"
+    catalog = cache.get(key)
+    if catalog is None:
+        catalog = build_catalog(subject)
+        cache.set(key, catalog, timeout=getattr(settings, "TOPIC_CATALOG_TTL", 300))
+    return catalog
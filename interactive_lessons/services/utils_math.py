@@ -1,5 +1,11 @@
+import hashlib
 import re
-from sympy import simplify
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from sympy import Expr, lambdify, simplify, sympify
 from sympy.parsing.sympy_parser import (
     parse_expr, standard_transformations,
     implicit_multiplication_application, convert_xor
@@ -155,13 +161,144 @@ def _parse_any(expr: str):
         # last attempt: try plain again (after LaTeX normalization may have helped)
         return parse_expr(plain, transformations=_TRANSFORMS)
 
-def compare_algebraic(student_ans: str, correct_ans: str) -> bool:
-    """Return True if two algebraic expressions are equivalent."""
+class ParsedAnswerCache:
+    """Bounded per-process LRU of parsed correct answers.
+
+    The correct answer of a part is the same text on every submission, yet
+    it used to be re-parsed (often via the slow LaTeX fallback) each time a
+    student pressed Submit. Entries are keyed by part id plus a hash of the
+    answer text, so an edited answer can never be served from a stale entry
+    even in a worker that missed the invalidation; ``invalidate`` (wired to
+    QuestionPart post_save) just frees the space early. Unparseable keys are
+    cached too, so a broken answer is not re-tried on every submission.
+    """
+
+    _UNPARSEABLE = object()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(part_id, text):
+        return part_id, hashlib.sha1(text.encode()).hexdigest()
+
+    def get(self, part_id, text, srepr=None):
+        """Parsed ``text`` for this part; raises like _parse_any if it can't be parsed.
+
+        ``srepr`` is the key's compiled form (QuestionPart.answer_key); on a
+        miss it is rebuilt instead of parsing ``text``.
+        """
+        key = self._key(part_id, text)
+        with self._lock:
+            expr = self._entries.get(key)
+            if expr is not None:
+                self._entries.move_to_end(key)
+        if expr is None:
+            try:
+                expr = sympify(srepr) if srepr else _parse_any(text)
+            except Exception:
+                expr = self._UNPARSEABLE
+            self._store(key, expr)
+        if expr is self._UNPARSEABLE:
+            raise SympifyError(text)
+        return expr
+
+    def _store(self, key, expr):
+        max_size = getattr(settings, "PARSED_ANSWER_CACHE_SIZE", 4096)
+        with self._lock:
+            self._entries[key] = expr
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, part_id):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == part_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+parsed_answers = ParsedAnswerCache()
+
+
+# Numeric pre-check for compare_algebraic. Points are complex because SymPy
+# symbols are: sqrt(x**2) and x differ for negative x, and simplify agrees.
+SAMPLE_POINTS = 16
+MATCH_TOLERANCE = 1e-11     # every point agrees this closely: equivalent
+MISMATCH_TOLERANCE = 1e-4   # any point differs by more than this: not equivalent
+_rng = np.random.default_rng(20251017)
+_SAMPLES = _rng.uniform(-2, 2, (SAMPLE_POINTS, 8)) + 1j * _rng.uniform(-2, 2, (SAMPLE_POINTS, 8))
+
+
+def numeric_verdict(s, c):
+    """Compare two parsed expressions at random points.
+
+    Returns True (same value everywhere sampled), False (clearly different
+    somewhere) or None when sampling can't settle it: relations and tuples,
+    unknown functions, too many variables, or too few points where both
+    sides evaluate to a finite value.
+    """
+    if not isinstance(s, Expr) or not isinstance(c, Expr):
+        return None
+    if s == c:
+        return True
+    symbols = sorted(s.free_symbols | c.free_symbols, key=str)
+    if len(symbols) > _SAMPLES.shape[1]:
+        return None
+    try:
+        # Rendering lambdify's docstring costs more than the evaluation itself.
+        f = lambdify(symbols, [s, c], modules="numpy", docstring_limit=0)
+        with np.errstate(all="ignore"):
+            sv, cv = (np.broadcast_to(np.asarray(v, dtype=complex), (SAMPLE_POINTS,))
+                      for v in f(*_SAMPLES[:, :len(symbols)].T))
+    except Exception:
+        return None
+
+    # Points where either side overflows or is undefined say nothing either
+    # way: exp(x)**1000/exp(x)**999 overflows where exp(x) doesn't.
+    finite = np.isfinite(sv) & np.isfinite(cv)
+    if finite.sum() < SAMPLE_POINTS // 2:
+        return None
+    sv, cv = sv[finite], cv[finite]
+    relative = np.abs(sv - cv) / (1 + np.maximum(np.abs(sv), np.abs(cv)))
+    if np.all(relative < MATCH_TOLERANCE):
+        return True
+    if np.any(relative > MISMATCH_TOLERANCE):
+        return False
+    return None
+
+
+def compare_algebraic(student_ans: str, correct_ans: str, part_id=None, correct_srepr=None) -> bool:
+    """Return True if two algebraic expressions are equivalent.
+
+    Pass the QuestionPart id whenever ``correct_ans`` is a stored answer key,
+    so its parsed form comes from ``parsed_answers`` instead of being parsed
+    again; only the student's side is parsed per call. ``correct_srepr`` is
+    the key's compiled SymPy form, if it has one (answer_keys.py).
+
+    Both sides are first evaluated at random points (numeric_verdict), which
+    settles nearly every answer in well under a millisecond; sympy.simplify,
+    which can take seconds on trig and rational expressions, only sees the
+    cases sampling leaves open.
+    """
     if not student_ans or not correct_ans:
         return False
     try:
         s = _parse_any(student_ans)
-        c = _parse_any(correct_ans)
+        if part_id is not None:
+            c = parsed_answers.get(part_id, correct_ans, srepr=correct_srepr)
+        else:
+            c = sympify(correct_srepr) if correct_srepr else _parse_any(correct_ans)
+        verdict = numeric_verdict(s, c) if getattr(settings, "ALGEBRAIC_NUMERIC_CHECK", True) else None
+        if verdict is not None:
+            return verdict
         return simplify(s - c) == 0
     except (SympifyError, SyntaxError, TypeError, ValueError, TokenError):
         return False
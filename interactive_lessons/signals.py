@@ -0,0 +1,33 @@
+import sys
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import QuestionPart
+from .services import grade_cache, topic_catalog
+
+
+@receiver(post_save, sender=QuestionPart)
+@receiver(post_delete, sender=QuestionPart)
+def forget_parsed_answer(sender, instance, **kwargs):
+    """Drop this part's cached answer key; the next submission parses it afresh."""
+    # If this process never imported utils_math (and SymPy), it has nothing cached.
+    utils_math = sys.modules.get("interactive_lessons.services.utils_math")
+    if utils_math is not None:
+        utils_math.parsed_answers.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=QuestionPart)
+def forget_stale_marks(sender, instance, **kwargs):
+    """Delete cached marks made before the part's answer or prompt changed."""
+    grade_cache.invalidate(instance)
+
+
+def forget_topic_catalog(sender, **kwargs):
+    """A topic or its content changed: select_topic builds a fresh catalog."""
+    topic_catalog.invalidate()
+
+
+for model in topic_catalog.CATALOG_MODELS:
+    post_save.connect(forget_topic_catalog, sender=model, dispatch_uid=f"topic_catalog_save_{model}")
+    post_delete.connect(forget_topic_catalog, sender=model, dispatch_uid=f"topic_catalog_delete_{model}")
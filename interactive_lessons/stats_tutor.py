@@ -1,10 +1,12 @@
-from openai import OpenAI
 from fractions import Fraction
 import json, re, math
 from django.conf import settings
-from interactive_lessons.services.utils_math import compare_algebraic
+from core.lazy import lazy_openai_client
 
-client = OpenAI()
+client = lazy_openai_client()
+
+# gpt_grade's feedback when the model call fails; such a mark is never cached.
+GPT_FAILED_FEEDBACK = "Unable to grade this answer automatically. Please review your work and try again."
 
 
 def grading_model():
@@ -137,11 +139,25 @@ def compare_answers(student_ans, correct_ans, tol=0.02):
     return matched / len(correct_ans)
 
 
-def mark_student_answer(question_text, student_answer, correct_answer,
-                        hint_used=False, solution_used=False):
+def auto_mark(student_answer, correct_answer, part_id=None, check_algebraic=True, key=None):
+    """The network-free half of mark_student_answer: interval, numeric and algebraic checks.
+
+    Returns (base_score, feedback, hint). ``feedback`` is None when GPT should
+    write it, and ``base_score`` is None when GPT should award the score too.
+    This is the part that runs SymPy on student input, so grading_pool runs
+    it in a worker process with a time limit.
+
+    ``key`` is the answer's compiled form (services/answer_keys.py). With it
+    nothing is parsed on the correct side, and checks that can't match the
+    key's kind are skipped; without it every check parses both sides.
+    """
     # --- 1️⃣ Check for interval notation first ---
-    student_interval = parse_interval(student_answer)
-    correct_interval = parse_interval(correct_answer)
+    if key is not None:
+        correct_interval = key["interval"]
+        student_interval = parse_interval(student_answer) if correct_interval else None
+    else:
+        student_interval = parse_interval(student_answer)
+        correct_interval = parse_interval(correct_answer)
 
     if student_interval and correct_interval:
         # Compare intervals
@@ -149,56 +165,73 @@ def mark_student_answer(question_text, student_answer, correct_answer,
         upper_match = math.isclose(student_interval[1], correct_interval[1], abs_tol=0.02)
 
         if lower_match and upper_match:
-            base_score = 100
-            feedback = "Excellent — confidence interval is correct!"
-            hint = "Well done! Both bounds are accurate."
-            auto_score = 1.0
+            return (100, "Excellent — confidence interval is correct!",
+                    "Well done! Both bounds are accurate.")
         elif lower_match or upper_match:
-            base_score = 50
             if lower_match:
                 feedback = f"Partially correct. Your lower bound ({student_interval[0]:.2f}) is correct, but the upper bound is incorrect. The correct upper bound is {correct_interval[1]:.2f}."
                 hint = "Double-check your calculation for the upper bound. Remember: upper bound = mean + (critical value × standard error)."
             else:
                 feedback = f"Partially correct. Your upper bound ({student_interval[1]:.2f}) is correct, but the lower bound is incorrect. The correct lower bound is {correct_interval[0]:.2f}."
                 hint = "Double-check your calculation for the lower bound. Remember: lower bound = mean - (critical value × standard error)."
-            auto_score = 0.5
+            return 50, feedback, hint
         else:
-            base_score = 20
             feedback = f"Both interval bounds are incorrect. You calculated ({student_interval[0]:.2f}, {student_interval[1]:.2f}), but the correct interval is ({correct_interval[0]:.2f}, {correct_interval[1]:.2f})."
             hint = "Review the confidence interval formula: CI = x̄ ± (critical value × SE). Check that you're using the correct critical value and standard error calculation."
-            auto_score = 0.0
-    else:
-        # --- 2️⃣ Local numeric or algebraic check ---
-        student_vals = normalise_numeric_answer(student_answer)
-        correct_vals = normalise_numeric_answer(correct_answer)
-
-        auto_score = compare_answers(student_vals, correct_vals)
-
-        # ✅ Algebraic check fallback if numeric failed
-        algebraic_match = False
-        if auto_score == 0 and student_answer and correct_answer:
-            algebraic_match = compare_algebraic(student_answer, correct_answer)
-            if algebraic_match:
-                auto_score = 1.0
-
-        # --- 3️⃣ Quick results if clear match ---
-        if auto_score == 1.0:
-            base_score = 100
-            feedback = "Excellent — fully correct!"
-            hint = "Well done!"
-        elif auto_score >= 0.5:
-            base_score = 70
-            # Use GPT for educational feedback on partial answers
-            _, feedback, hint = gpt_grade(question_text, student_answer, correct_answer)
-        elif student_vals:
-            base_score = 50
-            # Use GPT for educational feedback on wrong numeric answers
-            _, feedback, hint = gpt_grade(question_text, student_answer, correct_answer)
-        else:
-            # fallback to GPT if neither numeric nor algebraic match
-            base_score, feedback, hint = gpt_grade(question_text, student_answer, correct_answer)
+            return 20, feedback, hint
 
-    # --- 3️⃣ Apply deductions for hint/solution use ---
+    # --- 2️⃣ Local numeric or algebraic check ---
+    student_vals = normalise_numeric_answer(student_answer)
+    correct_vals = key["values"] if key is not None else normalise_numeric_answer(correct_answer)
+
+    auto_score = compare_answers(student_vals, correct_vals)
+
+    # ✅ Algebraic check fallback if numeric failed (pointless if the key never parsed)
+    if key is not None and key["kind"] == "text":
+        check_algebraic = False
+    if auto_score == 0 and student_answer and correct_answer and check_algebraic:
+        # SymPy takes ~0.4s to import, so it is loaded on the first algebraic check, not at boot.
+        from interactive_lessons.services.utils_math import compare_algebraic
+
+        correct_srepr = key["srepr"] if key is not None else None
+        if compare_algebraic(student_answer, correct_answer, part_id=part_id, correct_srepr=correct_srepr):
+            auto_score = 1.0
+
+    # --- 3️⃣ Quick results if clear match ---
+    if auto_score == 1.0:
+        return 100, "Excellent — fully correct!", "Well done!"
+    elif auto_score >= 0.5:
+        # Use GPT for educational feedback on partial answers
+        return 70, None, None
+    elif student_vals:
+        # Use GPT for educational feedback on wrong numeric answers
+        return 50, None, None
+    # fallback to GPT if neither numeric nor algebraic match
+    return None, None, None
+
+
+def mark_student_answer(question_text, student_answer, correct_answer,
+                        hint_used=False, solution_used=False, part_id=None, auto=None, key=None,
+                        grader=None):
+    """Score a student's answer against ``correct_answer``.
+
+    ``part_id`` identifies the QuestionPart the answer key belongs to; with it
+    the key's parsed form is reused across submissions (see
+    utils_math.parsed_answers), and ``key`` is its compiled form
+    (QuestionPart.answer_key, see auto_mark). ``auto`` is auto_mark's result
+    when the caller has already computed it (grade_submission does, in a
+    grading worker). ``grader`` stands in for gpt_grade when an answer needs
+    the model (the grading benchmark passes a stub).
+    """
+    if auto is None:
+        auto = auto_mark(student_answer, correct_answer, part_id=part_id, key=key)
+    base_score, feedback, hint = auto
+    if feedback is None:
+        gpt_score, feedback, hint = (grader or gpt_grade)(question_text, student_answer, correct_answer)
+        if base_score is None:
+            base_score = gpt_score
+
+    # --- 4️⃣ Apply deductions for hint/solution use ---
     deduction = 0
     if hint_used:
         deduction += 20
@@ -316,4 +349,4 @@ def gpt_grade(question_text, student_answer, correct_answer):
         import logging
         logger = logging.getLogger(__name__)
         logger.error(f"GPT grading error: {e}. Question: {question_text}, Student: {student_answer}, Correct: {correct_answer}")
-        return 0, f"Unable to grade this answer automatically. Please review your work and try again.", "Check your calculation step-by-step."
+        return 0, GPT_FAILED_FEEDBACK, "Check your calculation step-by-step."
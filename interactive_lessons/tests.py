@@ -1,13 +1,41 @@
+import io
+import json
+import os
+import tempfile
+import time
 from fractions import Fraction
+from unittest.mock import patch
+
+import markdown
+import numpy as np
+from sympy import sympify
 
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 
+from core import katex_server
 from core.models import Subject
-from interactive_lessons.models import Topic, Section, Question
-from interactive_lessons.services.utils_math import _preclean_plain, compare_algebraic
-from interactive_lessons.stats_tutor import normalise_numeric_answer
+from interactive_lessons.models import GradedAnswer, RenderedMarkdown, Topic, Section, Question, QuestionPart
+from interactive_lessons.services import grade_cache, marking, render_cache, utils_math
+from interactive_lessons.services.answer_keys import current_key
+from interactive_lessons.services.regrade import regrade_attempts
+from interactive_lessons.services.render_cache import render_math_markdown, rendered_markdown
+from interactive_lessons.services.rendered_content import prerender
+from interactive_lessons.services.topic_catalog import topic_catalog
+from interactive_lessons.services.grading_pool import GradingPool, GradingTimeout
+from interactive_lessons.services.marking import grade_submission
+from interactive_lessons.services.utils_math import _preclean_plain, compare_algebraic, parsed_answers
+from interactive_lessons.stats_tutor import GPT_FAILED_FEEDBACK, auto_mark, normalise_numeric_answer
+from notes.helpers.numskull import SESSION_KEY, append_turn, stream_answer
+from notes.models import InfoBotQuery
+from revision.models import RevisionModule, RevisionSection
+from students.models import QuestionAttempt
 
 
 class FractionAnswerTests(TestCase):
@@ -60,6 +88,536 @@ class FractionAnswerTests(TestCase):
         self.assertEqual(normalise_numeric_answer("3²/9"), [1.0])
 
 
+@override_settings(GRADING_POOL_SIZE=0)   # _parse_any is patched in this process
+class ParsedAnswerCacheTests(TestCase):
+    """A part's answer key is parsed once, not on every submission."""
+
+    @classmethod
+    def setUpTestData(cls):
+        subject, _ = Subject.objects.get_or_create(name="Maths", defaults={"slug": "maths"})
+        topic = Topic.objects.create(subject=subject, name="Algebra")
+        question = Question.objects.create(topic=topic)
+        cls.part = QuestionPart.objects.create(question=question, prompt="Expand", answer="2(x+1)")
+
+    def setUp(self):
+        parsed_answers.clear()
+        self.addCleanup(parsed_answers.clear)
+        self.parsed = []
+        real_parse = utils_math._parse_any
+
+        def counting_parse(text):
+            self.parsed.append(text)
+            return real_parse(text)
+
+        patcher = patch.object(utils_math, "_parse_any", side_effect=counting_parse)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_only_the_student_side_is_parsed(self):
+        # The key was compiled when the part was saved, so marking never parses it.
+        for attempt in ["2x+2", "2*x + 2", "x*2 + 2"]:
+            self.assertEqual(grade_submission(self.part.id, attempt)["score"], 100)
+        self.assertNotIn("2(x+1)", self.parsed)
+        self.assertEqual(len(self.parsed), 3)
+
+    def test_a_part_without_a_compiled_key_is_parsed_once(self):
+        QuestionPart.objects.filter(pk=self.part.pk).update(answer_key=None)
+        for attempt in ["2x+2", "2*x + 2", "x*2 + 2"]:
+            self.assertEqual(grade_submission(self.part.id, attempt)["score"], 100)
+        self.assertEqual(self.parsed.count("2(x+1)"), 1)
+        self.assertEqual(len(self.parsed), 4)
+
+    def test_saving_the_part_drops_its_entry(self):
+        self.assertTrue(compare_algebraic("2x+2", self.part.answer, part_id=self.part.id))
+        self.part.answer = "3(x+1)"
+        self.part.save()
+        self.assertEqual(len(parsed_answers), 0)
+        self.assertFalse(compare_algebraic("2x+2", self.part.answer, part_id=self.part.id))
+        self.assertTrue(compare_algebraic("3x+3", self.part.answer, part_id=self.part.id))
+
+    def test_unparseable_keys_are_remembered(self):
+        for _ in range(3):
+            self.assertFalse(compare_algebraic("x", "((", part_id=self.part.id))
+        self.assertEqual(self.parsed.count("(("), 1)
+
+    @override_settings(PARSED_ANSWER_CACHE_SIZE=2)
+    def test_cache_is_bounded(self):
+        for part_id, key in enumerate(["x", "2x", "3x"]):
+            compare_algebraic("x", key, part_id=part_id)
+        self.assertEqual(len(parsed_answers), 2)
+
+
+@override_settings(GRADING_POOL_SIZE=0)
+class AnswerKeyTests(TestCase):
+    """Answer keys are compiled on save and marking dispatches on them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        subject, _ = Subject.objects.get_or_create(name="Maths", defaults={"slug": "maths"})
+        cls.question = Question.objects.create(topic=Topic.objects.create(subject=subject, name="Statistics"))
+
+    def part(self, answer):
+        return QuestionPart.objects.create(question=self.question, prompt="?", answer=answer)
+
+    def test_kinds(self):
+        self.assertEqual(self.part("(58.98, 63.03)").answer_key["interval"], [58.98, 63.03])
+        self.assertEqual(self.part("12.5").answer_key["kind"], "numeric")
+        self.assertEqual(self.part("((").answer_key["kind"], "text")
+        key = self.part("2(x+1)").answer_key
+        self.assertEqual(key["kind"], "expression")
+        self.assertEqual(sympify(key["srepr"]), utils_math._parse_any("2x+2"))
+
+    def test_key_follows_the_answer(self):
+        part = self.part("12.5")
+        part.answer = "3(x+1)"
+        part.save(update_fields=["answer"])
+        part.refresh_from_db()
+        self.assertEqual(part.answer_key["kind"], "expression")
+
+        QuestionPart.objects.filter(pk=part.pk).update(answer="7")
+        part.refresh_from_db()
+        self.assertIsNone(current_key(part))
+
+    def test_same_marks_with_and_without_a_key(self):
+        cases = [
+            ("(58.98, 63.03)", "(58.99, 61)"),
+            ("12.5", "25/2"),
+            ("2, 3", "3, 2"),
+            ("2(x+1)", "2x+2"),
+            ("2(x+1)", "2x+1"),
+        ]
+        for correct, student in cases:
+            key = self.part(correct).answer_key
+            with self.subTest(correct=correct, student=student):
+                self.assertEqual(
+                    auto_mark(student, correct, key=key)[0], auto_mark(student, correct)[0]
+                )
+
+    def test_command_compiles_stale_keys(self):
+        part = self.part("12.5")
+        QuestionPart.objects.filter(pk=part.pk).update(answer_key=None)
+        call_command("compile_answer_keys", stdout=io.StringIO())
+        part.refresh_from_db()
+        self.assertEqual(part.answer_key["values"], [12.5])
+
+
+@override_settings(GRADING_POOL_SIZE=0)
+class GradeCacheTests(TestCase):
+    """A repeated answer to the same part is marked once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        subject, _ = Subject.objects.get_or_create(name="Maths", defaults={"slug": "maths"})
+        question = Question.objects.create(topic=Topic.objects.create(subject=subject, name="Algebra"))
+        cls.part = QuestionPart.objects.create(question=question, prompt="Expand", answer="2(x+1)")
+
+    def setUp(self):
+        patcher = patch("interactive_lessons.stats_tutor.gpt_grade",
+                        return_value=(40, "[Sign error] Check the sign.", "Expand the bracket."))
+        self.gpt_grade = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeated_answer_is_not_marked_again(self):
+        first = grade_submission(self.part.id, "2x - 2")
+        second = grade_submission(self.part.id, "  2x  - 2 ")
+        self.assertEqual(self.gpt_grade.call_count, 1)
+        self.assertEqual(second, first)
+        self.assertEqual(GradedAnswer.objects.get().hit_count, 1)
+
+    def test_hint_use_is_part_of_the_key(self):
+        plain = grade_submission(self.part.id, "2x - 2")
+        hinted = grade_submission(self.part.id, "2x - 2", hint_used=True)
+        self.assertEqual(self.gpt_grade.call_count, 2)
+        self.assertEqual(hinted["score"], plain["score"] - 20)
+
+    def test_editing_the_answer_drops_old_marks(self):
+        grade_submission(self.part.id, "2x - 2")
+        self.part.answer = "2(x-1)"
+        self.part.save()
+        self.assertFalse(GradedAnswer.objects.exists())
+        self.assertEqual(grade_submission(self.part.id, "2x - 2")["score"], 100)
+
+    def test_parts_without_a_prompt(self):
+        grade_submission(self.part.id, "2x - 2")
+        self.part.prompt = ""
+        self.part.save()
+        self.assertFalse(GradedAnswer.objects.exists())
+        grade_submission(self.part.id, "2x - 2")
+        self.assertEqual(GradedAnswer.objects.get().hit_count, 0)
+
+    def test_a_blank_prompt_falls_back_to_the_question_text(self):
+        QuestionPart.objects.filter(pk=self.part.pk).update(prompt="")
+        part = QuestionPart.objects.select_related("question").get(pk=self.part.pk)
+        with patch.object(Question, "text", "Expand 2(x+1).", create=True):
+            grade_submission(part.id, "2x - 2")
+            self.assertEqual(self.gpt_grade.call_args[0][0], "Expand 2(x+1).")
+            marked = grade_cache.marked_against(part)
+        self.assertNotEqual(grade_cache.marked_against(part), marked)
+
+    def test_failed_gpt_marks_are_not_kept(self):
+        self.gpt_grade.return_value = (0, GPT_FAILED_FEEDBACK, "")
+        grade_submission(self.part.id, "2x - 2")
+        grade_submission(self.part.id, "2x - 2")
+        self.assertEqual(self.gpt_grade.call_count, 2)
+        self.assertFalse(GradedAnswer.objects.exists())
+
+
+class RenderCacheTests(TestCase):
+    """render_math_markdown renders each distinct text once, across workers."""
+
+    TEXT = "Find the **mean** of the data."
+
+    def setUp(self):
+        rendered_markdown.clear()
+        self.addCleanup(rendered_markdown.clear)
+        patcher = patch("markdown.markdown", wraps=markdown.markdown)
+        self.markdown = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeated_text_is_rendered_once(self):
+        first = render_math_markdown(self.TEXT)
+        second = render_math_markdown(self.TEXT)
+        self.assertEqual(self.markdown.call_count, 1)
+        self.assertEqual(second, first)
+        self.assertIn("<strong>mean</strong>", second)
+
+    def test_renders_are_shared_through_the_table(self):
+        render_math_markdown(self.TEXT)
+        rendered_markdown.clear()   # as if another worker
+        render_math_markdown(self.TEXT)
+        self.assertEqual(self.markdown.call_count, 1)
+        self.assertEqual(RenderedMarkdown.objects.count(), 1)
+
+    def test_a_different_renderer_renders_again(self):
+        render_math_markdown(self.TEXT)
+        rendered_markdown.clear()
+        with patch.object(render_cache, "_signature", "a newer markdown-katex"):
+            render_math_markdown(self.TEXT)
+        self.assertEqual(self.markdown.call_count, 2)
+        self.assertEqual(RenderedMarkdown.objects.count(), 2)
+
+    def test_a_failed_render_is_not_kept(self):
+        self.markdown.side_effect = RuntimeError("node crashed")
+        with self.assertRaises(RuntimeError):
+            render_math_markdown(self.TEXT)
+        self.assertFalse(RenderedMarkdown.objects.exists())
+
+    @override_settings(RENDER_CACHE_ENABLED=False)
+    def test_disabled_cache_always_renders(self):
+        render_math_markdown(self.TEXT)
+        render_math_markdown(self.TEXT)
+        self.assertEqual(self.markdown.call_count, 2)
+        self.assertFalse(RenderedMarkdown.objects.exists())
+
+
+class ClientMathTests(TestCase):
+    """MATH_RENDERING = "client" leaves the maths as TeX for the browser's KaTeX."""
+
+    TEXT = "Find $`x_1 < y^2`$\n\n```math\n\\bar{x}\n```"
+
+    def setUp(self):
+        rendered_markdown.clear()
+        self.addCleanup(rendered_markdown.clear)
+
+    @override_settings(MATH_RENDERING="client")
+    def test_maths_is_left_for_the_browser(self):
+        html = render_math_markdown(self.TEXT)
+        self.assertIn('<span class="math-inline">\\(x_1 &lt; y^2\\)</span>', html)
+        self.assertIn('<p class="math-display">\\[\\bar{x}\\]</p>', html)
+        self.assertNotIn("katex", html)
+
+        with render_cache.math_rendering("server"):
+            self.assertIn('class="katex"', render_math_markdown(self.TEXT))
+        # Both renders are cached, under different keys.
+        self.assertEqual(RenderedMarkdown.objects.count(), 2)
+
+    def test_stored_columns_always_hold_server_maths(self):
+        subject, _ = Subject.objects.get_or_create(name="Maths", defaults={"slug": "maths"})
+        question = Question.objects.create(topic=Topic.objects.create(subject=subject, name="Stats"))
+        with render_cache.math_rendering("client"):
+            part = QuestionPart.objects.create(question=question, prompt=self.TEXT, answer="1")
+            self.assertIn('class="katex"', part.prompt_html)
+            self.assertIn("math-inline", part.rendered_html["prompt"])
+        self.assertEqual(QuestionPart.objects.get(pk=part.pk).rendered_html["prompt"], part.prompt_html)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            with render_cache.math_rendering("browser"):
+                pass
+
+
+class RenderedContentTests(TestCase):
+    """Lesson content carries its HTML, rendered on save, and pages serve it as is."""
+
+    @classmethod
+    def setUpTestData(cls):
+        subject, _ = Subject.objects.get_or_create(name="Maths", defaults={"slug": "maths"})
+        cls.topic = Topic.objects.create(subject=subject, name="Statistics")
+        cls.question = Question.objects.create(topic=cls.topic, hint="Add them up, then **divide**.")
+        cls.part = QuestionPart.objects.create(question=cls.question, prompt="Find the **mean**.", answer="4")
+
+    def setUp(self):
+        rendered_markdown.clear()
+        self.addCleanup(rendered_markdown.clear)
+
+    def test_save_stores_the_html(self):
+        part = QuestionPart.objects.get(pk=self.part.pk)
+        self.assertIn("<strong>mean</strong>", part.prompt_html)
+        self.assertEqual(part.expected_format_html, "")
+        with patch("interactive_lessons.services.render_cache.render_markdown", side_effect=AssertionError):
+            self.assertEqual(part.rendered_html["prompt"], part.prompt_html)
+
+    def test_text_changed_without_save_is_rendered_until_rerender_content(self):
+        QuestionPart.objects.filter(pk=self.part.pk).update(prompt="Find the *median*.")
+        part = QuestionPart.objects.get(pk=self.part.pk)
+        self.assertFalse(part.html_is_current())
+        self.assertIn("<em>median</em>", part.rendered_html["prompt"])
+
+        out = io.StringIO()
+        call_command("rerender_content", "--workers", "0", stdout=out)
+        part.refresh_from_db()
+        self.assertTrue(part.html_is_current())
+        self.assertIn("<em>median</em>", part.prompt_html)
+        self.assertIn("Re-rendered 1 rows", out.getvalue())
+
+    def test_rerender_content_in_worker_processes(self):
+        Question.objects.filter(pk=self.question.pk).update(hint="Use the *formula*.")
+        call_command("rerender_content", "--model", "interactive_lessons.question", "--workers", "1",
+                     stdout=io.StringIO())
+        question = Question.objects.get(pk=self.question.pk)
+        self.assertTrue(question.html_is_current())
+        self.assertIn("<em>formula</em>", question.hint_html)
+
+    def test_dry_run_writes_nothing(self):
+        QuestionPart.objects.filter(pk=self.part.pk).update(prompt="Changed")
+        call_command("rerender_content", "--dry-run", stdout=io.StringIO())
+        self.assertFalse(QuestionPart.objects.get(pk=self.part.pk).html_is_current())
+
+    def test_prerender_renders_a_pages_stale_content_in_one_batch(self):
+        second = QuestionPart.objects.create(question=self.question, prompt="Again", answer="1")
+        Question.objects.filter(pk=self.question.pk).update(hint="Use $`\\bar{x}`$", solution="$`\\bar{x} = 4`$")
+        QuestionPart.objects.filter(pk=self.part.pk).update(prompt="Find $`\\bar{x}`$", solution="$`n=3`$")
+        QuestionPart.objects.filter(pk=second.pk).update(prompt="Find $`\\bar{x}`$ again")
+        question = Question.objects.get(pk=self.question.pk)
+        parts = list(question.parts.order_by("order", "pk"))
+
+        server = katex_server.get_server()
+        with patch.object(server, "render", wraps=server.render) as render:
+            prerender([question, *parts])
+            # Three distinct formulas across six snippets, in one round trip.
+            self.assertEqual(render.call_count, 1)
+            self.assertEqual(len(render.call_args.args[0]), 3)
+            self.assertIn("katex", question.rendered_html["hint"])
+            self.assertIn("again", parts[1].rendered_html["prompt"])
+            self.assertEqual(render.call_count, 1)
+
+        for obj in [question, *parts]:
+            for source in obj.rendered_fields:
+                self.assertEqual(obj.rendered_html[source], obj.render_text(getattr(obj, source)))
+
+    def test_prerender_leaves_current_content_alone(self):
+        question = Question.objects.get(pk=self.question.pk)
+        with patch("interactive_lessons.services.render_cache.render_markdown_many") as render_many:
+            prerender([question, *question.parts.all()])
+        render_many.assert_not_called()
+
+    def test_revision_sections_keep_their_linebreaks_rendering(self):
+        module = RevisionModule.objects.create(topic=self.topic, title="Averages")
+        section = RevisionSection.objects.create(module=module, title="Mean", text_content="Sum <x>\n\nthen divide")
+        self.assertEqual(section.text_content_html, "<p>Sum &lt;x&gt;</p>\n\n<p>then divide</p>")
+
+
+class RegradeTests(TestCase):
+    """Fixing an answer key re-marks the attempts made against the old one."""
+
+    @classmethod
+    def setUpTestData(cls):
+        subject, _ = Subject.objects.get_or_create(name="Maths", defaults={"slug": "maths"})
+        question = Question.objects.create(topic=Topic.objects.create(subject=subject, name="Algebra"))
+        cls.part = QuestionPart.objects.create(question=question, prompt="Expand", answer="2(x-1)", max_marks=5)
+        cls.students = [User.objects.create_user(f"student{i}").studentprofile for i in range(3)]
+
+    def attempt(self, student, answer, score):
+        return QuestionAttempt.objects.create(
+            student=student, question=self.part.question, question_part=self.part,
+            student_answer=answer, score_awarded=score, is_correct=score >= 90,
+        )
+
+    def regrade(self, **kwargs):
+        return regrade_attempts(QuestionPart.objects.filter(pk=self.part.pk), workers=0, **kwargs)
+
+    def test_attempts_follow_the_corrected_key(self):
+        right = [self.attempt(s, "2x+2", 0) for s in self.students]
+        wrong = self.attempt(self.students[0], "2x - 2", 100)
+        self.part.answer = "2(x+1)"
+        self.part.save()
+
+        with patch("interactive_lessons.stats_tutor.gpt_grade") as gpt_grade:
+            result = self.regrade()
+        gpt_grade.assert_not_called()
+
+        self.assertEqual((result.attempts, result.answers), (4, 2))
+        for attempt in right:
+            attempt.refresh_from_db()
+            self.assertEqual((attempt.score_awarded, attempt.is_correct, attempt.marks_awarded), (100, True, 5))
+        wrong.refresh_from_db()
+        self.assertEqual((wrong.score_awarded, wrong.is_correct), (50, False))
+
+        self.students[0].refresh_from_db()
+        self.assertEqual(self.students[0].total_score, 150)
+
+    def test_model_only_with_use_llm(self):
+        attempt = self.attempt(self.students[0], "no idea", 0)
+        with patch("interactive_lessons.stats_tutor.gpt_grade", return_value=(30, "Close.", "")) as gpt_grade:
+            self.assertEqual(self.regrade().needs_model, 1)
+            gpt_grade.assert_not_called()
+            self.assertEqual(self.regrade(use_llm=True).changed, 1)
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.score_awarded, 30)
+
+    def test_dry_run_writes_nothing(self):
+        attempt = self.attempt(self.students[0], "2x-2", 0)
+        self.assertEqual(self.regrade(dry_run=True).changed, 1)
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.score_awarded, 0)
+
+    def test_command(self):
+        self.attempt(self.students[1], "2x-2", 0)
+        out = io.StringIO()
+        call_command("regrade_attempts", part=[self.part.pk], workers=0, stdout=out)
+        self.assertIn("Changed 1 of 1 attempts", out.getvalue())
+
+
+class GradingBenchmarkTests(TestCase):
+    """The replay harness exports anonymised cases and catches verdict drift."""
+
+    @classmethod
+    def setUpTestData(cls):
+        subject, _ = Subject.objects.get_or_create(name="Maths", defaults={"slug": "maths"})
+        question = Question.objects.create(topic=Topic.objects.create(subject=subject, name="Algebra"))
+        part = QuestionPart.objects.create(question=question, prompt="Expand", answer="2(x+1)")
+        student = User.objects.create_user("benchmarked").studentprofile
+        for answer, score in [("2x+2", 100), (" 2x+2  ", 100), ("2x-2", 50), ("(1.5, 2)", 0)]:
+            QuestionAttempt.objects.create(student=student, question=question, question_part=part,
+                                           student_answer=answer, score_awarded=score, is_correct=score >= 90)
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.corpus = os.path.join(self.dir.name, "corpus.json")
+        call_command("export_grading_corpus", self.corpus, stdout=io.StringIO())
+
+    def test_export_is_anonymised_and_deduplicated(self):
+        with open(self.corpus) as f:
+            cases = json.load(f)["cases"]
+        self.assertEqual(len(cases), 3)
+        self.assertEqual(max(c["count"] for c in cases), 2)
+        self.assertNotIn("benchmarked", json.dumps(cases))
+
+    def test_replay_reports_latency_and_drift(self):
+        saved = os.path.join(self.dir.name, "before.json")
+        out = io.StringIO()
+        call_command("benchmark_grading", self.corpus, in_process=True, save=saved, stdout=out)
+        self.assertIn("compare_algebraic", out.getvalue())
+        self.assertIn("Agrees with the stored verdict on 2/2", out.getvalue())
+
+        with open(saved) as f:
+            before = json.load(f)
+        changed = next(cid for cid, v in before["verdicts"].items() if v.get("algebraic"))
+        before["verdicts"][changed]["algebraic"] = False
+        with open(saved, "w") as f:
+            json.dump(before, f)
+
+        with self.assertRaisesMessage(CommandError, "1 verdicts drifted"):
+            call_command("benchmark_grading", self.corpus, in_process=True, baseline=saved,
+                         fail_on_drift=True, stdout=io.StringIO())
+
+
+class NumericEquivalenceTests(TestCase):
+    """Random-point sampling settles most answers before sympy.simplify runs."""
+
+    def verdict(self, student, correct):
+        return utils_math.numeric_verdict(utils_math._parse_any(student), utils_math._parse_any(correct))
+
+    def test_equivalent_forms_match(self):
+        self.assertTrue(self.verdict("sin(x)^2 + cos(x)^2", "1"))
+        self.assertTrue(self.verdict("(x^2-1)/(x-1)", "x+1"))
+        self.assertTrue(self.verdict("2(x+1)(y-3)", "2xy - 6x + 2y - 6"))
+
+    def test_wrong_answers_are_rejected(self):
+        self.assertFalse(self.verdict("2x+1", "2(x+1)"))
+        self.assertFalse(self.verdict("sqrt(x^2)", "x"))
+        self.assertFalse(self.verdict("1/x", "x"))
+
+    def test_overflow_on_one_side_is_not_a_mismatch(self):
+        self.assertIsNot(self.verdict("exp(x)^1000/exp(x)^999", "exp(x)"), False)
+        self.assertTrue(compare_algebraic("exp(x)^1000/exp(x)^999", "exp(x)"))
+
+    def test_undecidable_cases_are_left_to_simplify(self):
+        self.assertIsNone(self.verdict("x > 1", "x > 1"))
+        self.assertIsNone(self.verdict("(1, 2)", "(1, 2)"))
+        self.assertIsNone(self.verdict("1/3", "0.3333333333"))
+
+    def test_simplify_only_runs_when_sampling_is_unsure(self):
+        with patch.object(utils_math, "simplify", wraps=utils_math.simplify) as simplify:
+            self.assertTrue(compare_algebraic("x^2 + 2x + 1", "(x+1)^2"))
+            self.assertFalse(compare_algebraic("x^2 + 1", "(x+1)^2"))
+            simplify.assert_not_called()
+            self.assertFalse(compare_algebraic("1/3", "0.3333333333"))
+            simplify.assert_called_once()
+
+    @override_settings(ALGEBRAIC_NUMERIC_CHECK=False)
+    def test_check_can_be_switched_off(self):
+        with patch.object(utils_math, "numeric_verdict") as numeric_verdict:
+            self.assertTrue(compare_algebraic("2x+2", "2(x+1)"))
+            numeric_verdict.assert_not_called()
+
+
+class GradingPoolTests(TestCase):
+    """SymPy grading runs in worker processes that can be killed on a timeout."""
+
+    @override_settings(GRADING_POOL_SIZE=1)
+    def test_overrunning_worker_is_killed_and_replaced(self):
+        pool = GradingPool()
+        self.addCleanup(pool.shutdown)
+        self.assertEqual(pool.run(pow, 2, 10), 1024)
+        first = next(iter(pool._workers))
+
+        with self.assertRaises(GradingTimeout):
+            pool.run(time.sleep, 60, timeout=0.5)
+        self.assertFalse(first.process.is_alive())
+
+        self.assertEqual(pool.run(pow, 3, 3), 27)
+        self.assertNotIn(first, pool._workers)
+
+    @override_settings(GRADING_POOL_SIZE=1)
+    def test_errors_in_the_worker_are_raised_in_the_caller(self):
+        pool = GradingPool()
+        self.addCleanup(pool.shutdown)
+        with self.assertRaises(ZeroDivisionError):
+            pool.run(divmod, 1, 0)
+
+    @override_settings(GRADING_POOL_SIZE=0)
+    def test_size_zero_runs_in_process(self):
+        pool = GradingPool()
+        with patch.object(utils_math, "simplify", wraps=utils_math.simplify) as simplify:
+            pool.run(compare_algebraic, "1/3", "0.3333333333")
+        simplify.assert_called_once()
+        self.assertFalse(pool._workers)
+
+    def test_timeout_gives_an_unverified_result(self):
+        subject, _ = Subject.objects.get_or_create(name="Maths", defaults={"slug": "maths"})
+        question = Question.objects.create(topic=Topic.objects.create(subject=subject, name="Algebra"))
+        part = QuestionPart.objects.create(question=question, prompt="Simplify", answer="x")
+
+        with patch.object(marking.grading_pool, "run", side_effect=GradingTimeout("gave up")), \
+                patch.object(marking, "mark_student_answer") as mark:
+            result = grade_submission(part.id, "9^9^9^9^9")
+        self.assertTrue(result["unverified"])
+        self.assertFalse(result["is_correct"])
+        mark.assert_not_called()
+
+
 class MoveSectionAdminTests(TestCase):
     """Moving a section between topics has to take its questions with it."""
 
@@ -129,3 +687,230 @@ class MoveSectionAdminTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.section.refresh_from_db()
         self.assertEqual(self.section.topic, self.old_topic)
+
+
+class InfoBotAnswerCacheTests(TestCase):
+    """The same opening question on the same part is answered once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = [
+            User.objects.create_user(username=f"student{i}", password="pw") for i in range(3)
+        ]
+
+    def setUp(self):
+        vectors = {
+            "how do i start part b?": [1.0, 0.0, 0.0],
+            "how do i begin part b": [0.99, 0.05, 0.0],
+            "what is a derivative?": [0.0, 1.0, 0.0],
+        }
+        patches = [
+            patch("interactive_lessons.views.match_note", return_value=(None, 0.2, [])),
+            patch("interactive_lessons.views.ask_openai", return_value=("Start with the chain rule.", None)),
+            patch("notes.utils.get_query_embedding",
+                  side_effect=lambda q: np.array(vectors[q.strip().lower()], dtype=np.float32)),
+        ]
+        self.ask = patches[1].start()
+        for p in (patches[0], patches[2]):
+            p.start()
+        for p in patches:
+            self.addCleanup(p.stop)
+
+    def _ask(self, student, query, part_id=7):
+        self.client.force_login(student)
+        response = self.client.get(
+            reverse("info_bot", args=["calculus"]),
+            {"query": query, "question_part_id": part_id},
+        )
+        return response.json()
+
+    def test_second_student_gets_the_stored_answer(self):
+        first = self._ask(self.students[0], "How do I start part b?")
+        second = self._ask(self.students[1], "How do I begin part b")
+
+        self.assertEqual(self.ask.call_count, 1)
+        self.assertEqual(first["answer"], second["answer"])
+        hit = InfoBotQuery.objects.get(pk=second["query_id"])
+        self.assertEqual(hit.cached_from_id, first["query_id"])
+        original = InfoBotQuery.objects.get(pk=first["query_id"])
+        self.assertEqual(
+            (hit.question_part_id, hit.context_key, hit.source_type),
+            (original.question_part_id, original.context_key, original.source_type),
+        )
+
+    def test_reused_answer_comes_from_the_render_cache(self):
+        rendered_markdown.clear()
+        self.addCleanup(rendered_markdown.clear)
+        with patch("markdown.markdown", wraps=markdown.markdown) as render:
+            self._ask(self.students[0], "How do I start part b?")
+            self._ask(self.students[1], "How do I begin part b")
+        self.assertEqual(render.call_count, 1)
+
+    def test_different_part_or_question_is_not_reused(self):
+        self._ask(self.students[0], "How do I start part b?")
+        self._ask(self.students[1], "How do I start part b?", part_id=8)
+        self._ask(self.students[2], "What is a derivative?")
+        self.assertEqual(self.ask.call_count, 3)
+
+    def test_follow_up_questions_always_go_to_the_model(self):
+        self._ask(self.students[0], "What is a derivative?")
+        self._ask(self.students[1], "How do I start part b?")
+        self._ask(self.students[1], "How do I begin part b")   # same session, now a follow-up
+        self.assertEqual(self.ask.call_count, 3)
+
+    def test_thumbs_down_evicts_the_answer(self):
+        first = self._ask(self.students[0], "How do I start part b?")
+        second = self._ask(self.students[1], "How do I begin part b")
+        self.client.post(
+            reverse("infobot_feedback"),
+            json.dumps({"query_id": second["query_id"], "feedback_type": "not_helpful"}),
+            content_type="application/json",
+        )
+        self._ask(self.students[2], "How do I start part b?")
+
+        self.assertEqual(self.ask.call_count, 2)
+        self.assertTrue(InfoBotQuery.objects.get(pk=first["query_id"]).cache_evicted)
+
+
+class InfoBotStreamingTests(TestCase):
+    """?stream=1 forwards tokens as server-sent events and still logs the answer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(username="streamer", password="pw")
+
+    def setUp(self):
+        self.client.force_login(self.student)
+        for p in (
+            patch("interactive_lessons.views.match_note", return_value=(None, 0.2, [])),
+            patch("notes.answer_cache.lookup", return_value=(None, None)),
+        ):
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _events(self, response):
+        body = b"".join(response.streaming_content).decode()
+        events = []
+        for block in body.strip().split("\n\n"):
+            name, data = block.split("\n")
+            events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+        return events
+
+    def _ask(self):
+        return self.client.get(
+            reverse("info_bot", args=["calculus"]),
+            {"query": "What is $x^2$?", "question_part_id": 3, "stream": "1"},
+        )
+
+    def test_tokens_then_done_with_logged_answer(self):
+        with patch("notes.helpers.numskull.stream_openai", return_value=iter(["It is ", "$x^2$", "."])):
+            response = self._ask()
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            events = self._events(response)
+
+        self.assertEqual([name for name, _ in events], ["token", "token", "token", "done"])
+        self.assertEqual("".join(data["text"] for _, data in events[:3]), "It is $x^2$.")
+        done = events[-1][1]
+        logged = InfoBotQuery.objects.get(pk=done["query_id"])
+        self.assertEqual(logged.answer, "It is $x^2$.")
+        self.assertTrue(done["answer"].startswith("<p>It is"))
+        history = self.client.session["numskull_history"]
+        self.assertEqual(history["messages"][-1], {"role": "assistant", "content": "It is $x^2$."})
+
+    def test_provider_failure_sends_an_error_event(self):
+        def broken(messages):
+            yield "It is "
+            raise RuntimeError("connection reset")
+
+        with patch("notes.helpers.numskull.stream_openai", side_effect=broken):
+            events = self._events(self._ask())
+
+        self.assertEqual([name for name, _ in events], ["token", "error", "done"])
+        self.assertIsNone(events[-1][1]["answer"])
+        self.assertFalse(InfoBotQuery.objects.exists())
+
+    def test_failure_in_finish_still_ends_the_stream(self):
+        with patch("notes.helpers.numskull.stream_openai", return_value=iter(["Fine."])), \
+                patch("interactive_lessons.views.InfoBotQuery.objects.create", side_effect=RuntimeError("db down")):
+            events = self._events(self._ask())
+
+        self.assertEqual([name for name, _ in events], ["token", "error", "done"])
+
+    def test_new_session_reaches_the_browser(self):
+        def finish(raw_answer):
+            append_turn(request, "key", "q", raw_answer)
+            return {"answer": raw_answer, "query_id": None}
+
+        request = RequestFactory().get("/")
+        middleware = SessionMiddleware(lambda request: stream_answer(request, [], finish))
+        with patch("notes.helpers.numskull.stream_openai", return_value=iter(["Hi"])):
+            response = middleware(request)
+            b"".join(response.streaming_content)
+
+        session_key = response.cookies[settings.SESSION_COOKIE_NAME].value
+        stored = SessionStore(session_key)[SESSION_KEY]
+        self.assertEqual(stored["messages"][-1]["content"], "Hi")
+
+
+class TopicCatalogTests(TestCase):
+    """select_topic's per-topic counts: a fixed number of queries, cached until content changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        from exam_papers.models import ExamPaper, ExamQuestion
+        from flashcards.models import FlashcardSet
+        from notes.models import Note
+
+        cls.subject, _ = Subject.objects.get_or_create(name="Maths", defaults={"slug": "maths"})
+        cls.stats = Topic.objects.create(subject=cls.subject, name="Statistics", order=2)
+        cls.algebra = Topic.objects.create(subject=cls.subject, name="Algebra", order=1)
+        Topic.objects.create(subject=cls.subject, name="Calculus", order=3)
+
+        Question.objects.create(topic=cls.stats)
+        Question.objects.create(topic=cls.stats)
+        Note.objects.create(topic=cls.algebra, title="Factorising", content="x")
+        FlashcardSet.objects.create(topic=cls.stats, title="Draft", is_published=False)
+        published = ExamPaper.objects.create(year=2024, paper_type="p2", title="2024 P2", total_marks=300, is_published=True)
+        draft = ExamPaper.objects.create(year=2025, paper_type="p2", title="2025 P2", total_marks=300, is_published=False)
+        ExamQuestion.objects.create(exam_paper=published, question_number=1, total_marks=25, topic=cls.stats)
+        ExamQuestion.objects.create(exam_paper=draft, question_number=1, total_marks=25, topic=cls.stats)
+        RevisionModule.objects.create(topic=cls.algebra, title="Algebra", is_published=True)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_counts_in_a_fixed_number_of_queries(self):
+        with self.assertNumQueries(8):
+            catalog = topic_catalog(self.subject)
+        self.assertEqual([item["topic"].name for item in catalog], ["Algebra", "Statistics", "Calculus"])
+        algebra, stats, calculus = catalog
+
+        self.assertEqual((stats["question_count"], stats["exam_question_count"], stats["flashcard_count"]), (2, 1, 0))
+        self.assertFalse(stats["has_flashcards"])
+        self.assertTrue(stats["has_exam_questions"])
+        self.assertEqual(algebra["note_count"], 1)
+        self.assertTrue(algebra["has_revision"])
+        self.assertEqual(algebra["revision_module"].title, "Algebra")
+        self.assertFalse(any(value for key, value in calculus.items() if key != "topic"))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(len(topic_catalog(self.subject)), 3)
+
+    def test_content_changes_expire_the_catalog(self):
+        from cheatsheets.models import CheatSheet
+
+        topic_catalog(self.subject)
+        sheet = CheatSheet.objects.create(topic=self.stats, title="Formulae", pdf_file="cheatsheets/f.pdf")
+        self.assertEqual(topic_catalog(self.subject)[1]["cheatsheet_count"], 1)
+        sheet.delete()
+        self.assertEqual(topic_catalog(self.subject)[1]["cheatsheet_count"], 0)
+        Topic.objects.filter(pk=self.stats.pk).get().delete()
+        self.assertEqual(len(topic_catalog(self.subject)), 2)
+
+    def test_select_topic_page(self):
+        response = self.client.get(reverse("select_topic"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["topic"] for item in response.context["topics_with_notes"]],
+                         [self.algebra, self.stats, Topic.objects.get(name="Calculus")])
+        self.assertContains(response, "Statistics")
@@ -1,20 +1,23 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404, redirect
-from django.utils.safestring import mark_safe
 from django.http import JsonResponse
 from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib import messages
-import markdown
-from markdown_katex import KatexExtension
 
 from .models import Topic, Question, QuestionPart, StudentInquiry
 from students.models import QuestionAttempt
 from students.work_access import work_capture_visible
 from interactive_lessons.services.marking import grade_submission
+from interactive_lessons.services.render_cache import render_math_markdown
+from interactive_lessons.services.rendered_content import prerender
+from interactive_lessons.services.topic_catalog import topic_catalog
+from notes import answer_cache
 from notes.models import InfoBotQuery
 from notes.helpers.match_note import match_note
-from notes.helpers.numskull import append_turn, ask_openai, get_history, relevant_context
+from notes.helpers.numskull import (
+    append_turn, ask_openai, get_history, relevant_context, stream_answer, wants_stream,
+)
 from .forms import QuestionContactForm
 
 
@@ -130,10 +133,7 @@ def info_bot(request, topic_slug):
     note, confidence, scored = match_note(query, topic=topic_slug, question_context=question_context_str)
 
     if note:
-        html_answer = markdown.markdown(
-            note.content,
-            extensions=["extra", "fenced_code", "tables", KatexExtension()],
-        )
+        html_answer = note.rendered_html["content"]
         query_obj = InfoBotQuery.objects.create(
             topic_slug=topic_slug,
             question=query,
@@ -148,6 +148,38 @@ def info_bot(request, topic_slug):
         )
         return JsonResponse({"answer": html_answer, "query_id": query_obj.id})
 
+    # Recent turns let follow-ups like "where did the 0.5 come from?" refer
+    # back to what NumSkull just said.
+    context_key = f"{topic_slug}:{practice_question_id or ''}:{exam_question_id or ''}:{question_part_id or ''}"
+    history = get_history(request, context_key)
+
+    def record(raw_answer, **fields):
+        """Remember the exchange and log it; return the JSON body for the answer."""
+        append_turn(request, context_key, query, raw_answer)
+        query_obj = InfoBotQuery.objects.create(
+            topic_slug=topic_slug,
+            question=query,
+            answer=raw_answer,
+            confidence=confidence,
+            source_type="ai",
+            practice_question_id=int(practice_question_id) if practice_question_id else None,
+            exam_question_id=int(exam_question_id) if exam_question_id else None,
+            question_part_id=int(question_part_id) if question_part_id else None,
+            question_context=question_context_str,
+            context_key=context_key,
+            **fields,
+        )
+        return {"answer": render_math_markdown(raw_answer), "query_id": query_obj.id}
+
+    # An opening question someone already asked about this same part can
+    # reuse that answer. Follow-ups depend on the turns before them, so they
+    # always go to the model.
+    question_vec = None
+    if not history:
+        question_vec, cached = answer_cache.lookup(context_key, query)
+        if cached:
+            return JsonResponse(record(cached.answer, sources=cached.sources, cached_from=cached))
+
     # Build enhanced prompt with question context
     context_text = "\n\n".join(relevant_context(scored))
 
@@ -226,93 +258,36 @@ def info_bot(request, topic_slug):
         # Text-only message
         current_message = {"role": "user", "content": prompt}
 
-    # Prepend recent turns so follow-ups like "where did the 0.5 come from?"
-    # can refer back to what NumSkull just said.
-    context_key = f"{topic_slug}:{practice_question_id or ''}:{exam_question_id or ''}:{question_part_id or ''}"
-    messages = get_history(request, context_key) + [current_message]
+    messages = history + [current_message]
+
+    def finish(raw_answer):
+        """Record the exchange; return the JSON body for the answer."""
+        return record(
+            raw_answer,
+            sources=", ".join([n.title for _, n in scored]),
+            query_embedding=question_vec,
+        )
+
+    # Streaming sends the answer token by token, then the same JSON as "done".
+    if wants_stream(request):
+        return stream_answer(request, messages, finish)
 
     raw_answer, error = ask_openai(messages)
     if error:
         return JsonResponse({"answer": f"<p>{error}</p>", "query_id": None})
 
-    append_turn(request, context_key, query, raw_answer)
-
-    html_answer = markdown.markdown(
-        raw_answer,
-        extensions=["extra", "fenced_code", "tables", KatexExtension()],
-    )
-
-    query_obj = InfoBotQuery.objects.create(
-        topic_slug=topic_slug,
-        question=query,
-        answer=raw_answer,
-        confidence=confidence,
-        sources=", ".join([n.title for _, n in scored]),
-        source_type="ai",
-        practice_question_id=int(practice_question_id) if practice_question_id else None,
-        exam_question_id=int(exam_question_id) if exam_question_id else None,
-        question_part_id=int(question_part_id) if question_part_id else None,
-        question_context=question_context_str,
-    )
-
-    return JsonResponse({"answer": html_answer, "query_id": query_obj.id})
+    return JsonResponse(finish(raw_answer))
 
 
 # ----------------------------------------------------------------------
 # Topic selection / completion
 # ----------------------------------------------------------------------
 def select_topic(request):
-    from notes.models import Note
-    from revision.models import RevisionModule
-    from cheatsheets.models import CheatSheet
-    from exam_papers.models import ExamQuestion
-    from quickkicks.models import QuickKick
-    from flashcards.models import FlashcardSet
-
-    # Filter topics by current subject from middleware
+    # Filter topics by current subject from middleware (all topics if none is
+    # set), each with its content counts (services/topic_catalog.py)
     current_subject = getattr(request, 'current_subject', None)
-    if current_subject:
-        topics = Topic.objects.filter(subject=current_subject)
-    else:
-        # Fallback to all topics if no subject set
-        topics = Topic.objects.all()
-    # Model Meta orders by (order, name), so an unset order falls back to
-    # alphabetical. Ordering here explicitly would discard the manual order.
-    topics = topics.order_by("order", "name")
-    # Annotate topics with note counts, question counts, cheat sheet counts, and revision module info
-    topics_with_notes = []
-    for topic in topics:
-        note_count = Note.objects.filter(topic=topic).count()
-        question_count = Question.objects.filter(topic=topic).count()
-        cheatsheet_count = CheatSheet.objects.filter(topic=topic).count()
-        quickkick_count = QuickKick.objects.filter(topic=topic).count()
-        flashcard_count = FlashcardSet.objects.filter(topic=topic, is_published=True).count()
-        # Count exam questions for this topic (only from published papers)
-        exam_question_count = ExamQuestion.objects.filter(
-            topic=topic,
-            exam_paper__is_published=True
-        ).count()
-        # Check if this topic has a published revision module
-        revision_module = RevisionModule.objects.filter(
-            topic=topic,
-            is_published=True
-        ).first()
-        topics_with_notes.append({
-            'topic': topic,
-            'has_notes': note_count > 0,
-            'note_count': note_count,
-            'question_count': question_count,
-            'cheatsheet_count': cheatsheet_count,
-            'has_cheatsheets': cheatsheet_count > 0,
-            'quickkick_count': quickkick_count,
-            'has_quickkicks': quickkick_count > 0,
-            'flashcard_count': flashcard_count,
-            'has_flashcards': flashcard_count > 0,
-            'exam_question_count': exam_question_count,
-            'has_exam_questions': exam_question_count > 0,
-            'has_revision': revision_module is not None,
-            'revision_module': revision_module
-        })
+    topics_with_notes = topic_catalog(current_subject)
+    topics = [item['topic'] for item in topics_with_notes]
     # Grouped by exam paper, with anything unassigned kept visible at the end
     # rather than dropped -- Physics has no paper split, and a newly added
     # Maths topic would otherwise be invisible to students until someone
@@ -451,22 +426,24 @@ def section_question_view(request, topic_slug, section_slug, number):
                 ) or {}
 
                 results[part.id] = result
-                completed_parts.add(part.id)
 
                 # --- Save attempt for progress tracking ---
                 attempt_id = None
-                try:
-                    attempt = QuestionAttempt.objects.create(
-                        student=request.user.studentprofile,
-                        question=part.question,
-                        question_part=part,
-                        student_answer=answer,
-                        score_awarded=result.get("score", 0),
-                        is_correct=result.get("is_correct", False),
-                    )
-                    attempt_id = attempt.id
-                except Exception as e:
-                    print(f"[Progress Tracking Error] {e}")
+                # An answer that timed out was never marked, so it is not an attempt.
+                if not result.get("unverified"):
+                    completed_parts.add(part.id)
+                    try:
+                        attempt = QuestionAttempt.objects.create(
+                            student=request.user.studentprofile,
+                            question=part.question,
+                            question_part=part,
+                            student_answer=answer,
+                            score_awarded=result.get("score", 0),
+                            is_correct=result.get("is_correct", False),
+                        )
+                        attempt_id = attempt.id
+                    except Exception as e:
+                        print(f"[Progress Tracking Error] {e}")
 
                 # --- AJAX JSON feedback response ---
                 if request.headers.get("x-requested-with") == "XMLHttpRequest":
@@ -491,14 +468,14 @@ def section_question_view(request, topic_slug, section_slug, number):
                     # Use teacher-written hint if available for incorrect answers
                     hint = result.get("hint", "")
                     teacher_hint = part.question.hint
-                    if teacher_hint and not result.get("is_correct", False):
-                        hint = teacher_hint
-
                     # Hints are Markdown - numbered steps and bullet lists. The
                     # static hint on the page already goes through this; sending
                     # raw Markdown over JSON collapsed "1. ... 2. ..." and "- ..."
-                    # into a single run-on paragraph.
-                    hint = render_math_markdown(hint)
+                    # into a single run-on paragraph. The teacher's is stored rendered.
+                    if teacher_hint and not result.get("is_correct", False):
+                        hint = part.question.rendered_html["hint"]
+                    else:
+                        hint = render_math_markdown(hint)
 
                     return JsonResponse({
                         "is_correct": result.get("is_correct", False),
@@ -525,14 +502,15 @@ def section_question_view(request, topic_slug, section_slug, number):
     # ------------------------------------------------------------------
     #  GET or full-page render
     # ------------------------------------------------------------------
-    # Render question and part content (Math/KaTeX compatible)
-    question.hint = render_math_markdown(question.hint)
+    # Render question and part content (Math/KaTeX compatible), all at once
+    prerender([question, *parts])
+    question.hint = question.rendered_html["hint"]
     for part in parts:
-        part.prompt = render_math_markdown(part.prompt)
-        part.expected_format = render_math_markdown(part.expected_format or "")
-        part.solution = render_math_markdown(part.solution or "")
+        part.prompt = part.rendered_html["prompt"]
+        part.expected_format = part.rendered_html["expected_format"]
+        part.solution = part.rendered_html["solution"]
 
-    question.solution = render_math_markdown(question.solution or "")
+    question.solution = question.rendered_html["solution"]
 
     # Optional: check if all parts were completed
     all_parts_answered = all(
@@ -594,19 +572,6 @@ def topic_complete(request, topic_name):
     return render(request, "interactive_lessons/topic_complete.html", {"topic_name": topic_name})
 
 
-# ----------------------------------------------------------------------
-# Utility: render markdown with KaTeX
-# ----------------------------------------------------------------------
-def render_math_markdown(text):
-    if not text:
-        return ""
-    html = markdown.markdown(
-        text,
-        extensions=["extra", "fenced_code", "tables", KatexExtension()],
-    )
-    return mark_safe(html)
-
-
 # ----------------------------------------------------------------------
 # Main question view (AJAX + normal render)
 # ----------------------------------------------------------------------
@@ -647,22 +612,24 @@ def question_view(request, topic_id, number):
                 ) or {}
 
                 results[part.id] = result
-                completed_parts.add(part.id)
 
                 # --- Save attempt for progress tracking ---
                 attempt_id = None
-                try:
-                    attempt = QuestionAttempt.objects.create(
-                        student=request.user.studentprofile,
-                        question=part.question,
-                        question_part=part,
-                        student_answer=answer,
-                        score_awarded=result.get("score", 0),
-                        is_correct=result.get("is_correct", False),
-                    )
-                    attempt_id = attempt.id
-                except Exception as e:
-                    print(f"[Progress Tracking Error] {e}")
+                # An answer that timed out was never marked, so it is not an attempt.
+                if not result.get("unverified"):
+                    completed_parts.add(part.id)
+                    try:
+                        attempt = QuestionAttempt.objects.create(
+                            student=request.user.studentprofile,
+                            question=part.question,
+                            question_part=part,
+                            student_answer=answer,
+                            score_awarded=result.get("score", 0),
+                            is_correct=result.get("is_correct", False),
+                        )
+                        attempt_id = attempt.id
+                    except Exception as e:
+                        print(f"[Progress Tracking Error] {e}")
 
                 # --- AJAX JSON feedback response ---
                 if request.headers.get("x-requested-with") == "XMLHttpRequest":
@@ -687,14 +654,14 @@ def question_view(request, topic_id, number):
                     # Use teacher-written hint if available for incorrect answers
                     hint = result.get("hint", "")
                     teacher_hint = part.question.hint
-                    if teacher_hint and not result.get("is_correct", False):
-                        hint = teacher_hint
-
                     # Hints are Markdown - numbered steps and bullet lists. The
                     # static hint on the page already goes through this; sending
                     # raw Markdown over JSON collapsed "1. ... 2. ..." and "- ..."
-                    # into a single run-on paragraph.
-                    hint = render_math_markdown(hint)
+                    # into a single run-on paragraph. The teacher's is stored rendered.
+                    if teacher_hint and not result.get("is_correct", False):
+                        hint = part.question.rendered_html["hint"]
+                    else:
+                        hint = render_math_markdown(hint)
 
                     return JsonResponse({
                         "is_correct": result.get("is_correct", False),
@@ -716,15 +683,16 @@ def question_view(request, topic_id, number):
     # ------------------------------------------------------------------
     #  GET or full-page render
     # ------------------------------------------------------------------
-    # Render question and part content (Math/KaTeX compatible)
-    question.hint = render_math_markdown(question.hint)
+    # Render question and part content (Math/KaTeX compatible), all at once
+    prerender([question, *parts])
+    question.hint = question.rendered_html["hint"]
     for part in parts:
-        part.prompt = render_math_markdown(part.prompt)
-        part.expected_format = render_math_markdown(part.expected_format or "")
-        part.solution = render_math_markdown(part.solution or "")
+        part.prompt = part.rendered_html["prompt"]
+        part.expected_format = part.rendered_html["expected_format"]
+        part.solution = part.rendered_html["solution"]
 
     # ✅ Render the full-question solution text (if any)
-    question.solution = render_math_markdown(question.solution or "")
+    question.solution = question.rendered_html["solution"]
 
     # Optional: check if all parts were completed
     all_parts_answered = all(
@@ -942,6 +910,9 @@ def infobot_feedback(request):
                 user=request.user,
                 defaults={'feedback_type': feedback_type}
             )
+            # A bad answer must not be handed to the next student who asks.
+            if feedback_type == 'not_helpful':
+                answer_cache.evict(query)
 
             return JsonResponse({
                 "success": True,
@@ -971,7 +942,7 @@ def get_solution(request, part_id):
         solution_html += '<div class="mt-2 leading-relaxed">'
 
         if part.solution:
-            solution_html += render_math_markdown(part.solution or "")
+            solution_html += part.rendered_html["solution"]
 
         if part.solution_image:
             solution_html += f'''
@@ -58,6 +58,114 @@ SITE_HELP_MIN_CONFIDENCE = float(os.getenv("SITE_HELP_MIN_CONFIDENCE", 0.35))
 # "The Mean" at 0.29, say), so passing it to the model adds noise, not grounding.
 RAG_CONTEXT_MIN_SCORE = float(os.getenv("RAG_CONTEXT_MIN_SCORE", 0.45))
 
+# Note retrieval index (notes/index.py). "faiss" keeps the vectors in a file
+# every worker memory-maps, updated per batch by the embedding pipeline;
+# "matrix" holds them in each worker's memory and rebuilds on change. Rebuild
+# and check the FAISS file with: python manage.py rebuild_note_index
+NOTE_INDEX_BACKEND = os.getenv("NOTE_INDEX_BACKEND", "faiss")
+NOTE_FAISS_INDEX_PATH = Path(os.getenv("NOTE_FAISS_INDEX_PATH", BASE_DIR / "var" / "note_index.faiss"))
+# From this many vectors a rebuild switches from exact search to an inverted
+# file index (approximate, but search time stops growing with the note count).
+NOTE_FAISS_IVF_MIN_NOTES = int(os.getenv("NOTE_FAISS_IVF_MIN_NOTES", 10000))
+NOTE_FAISS_NPROBE = int(os.getenv("NOTE_FAISS_NPROBE", 16))
+# Seconds a worker's in-memory "matrix" index may live before it is rebuilt.
+# Saves and deletes invalidate it straight away, but only in the worker that
+# made them; this bounds how stale every other worker can get.
+NOTE_INDEX_MAX_AGE = int(os.getenv("NOTE_INDEX_MAX_AGE", 300))
+# Element type note embeddings are stored as: "float32", or "float16" to halve
+# the column at a precision cost far below what cosine ranking notices.
+NOTE_EMBEDDING_DTYPE = os.getenv("NOTE_EMBEDDING_DTYPE", "float32")
+# Keyword (BM25) retrieval alongside the vectors (notes/lexical.py). A top
+# keyword score of at least NOTE_LEXICAL_CONFIDENCE, and NOTE_LEXICAL_MARGIN
+# times the runner-up's, answers from that note with no embedding call;
+# otherwise NOTE_LEXICAL_WEIGHT of the keyword score is blended into cosine.
+NOTE_LEXICAL_CONFIDENCE = float(os.getenv("NOTE_LEXICAL_CONFIDENCE", 0.8))
+NOTE_LEXICAL_MARGIN = float(os.getenv("NOTE_LEXICAL_MARGIN", 1.25))
+NOTE_LEXICAL_WEIGHT = float(os.getenv("NOTE_LEXICAL_WEIGHT", 0.35))
+# Saving a note queues it for a background thread that embeds in batches
+# (notes/embedding_pipeline.py), waiting NOTE_EMBED_QUEUE_DELAY seconds so a
+# burst of saves shares requests. Set NOTE_EMBED_ASYNC=False to embed inline.
+# Sweep for anything missed with: python manage.py embed_notes
+NOTE_EMBED_ASYNC = os.getenv("NOTE_EMBED_ASYNC", "True") == "True"
+NOTE_EMBED_QUEUE_DELAY = float(os.getenv("NOTE_EMBED_QUEUE_DELAY", 2.0))
+NOTE_EMBED_BATCH_SIZE = int(os.getenv("NOTE_EMBED_BATCH_SIZE", 64))
+NOTE_EMBED_CONCURRENCY = int(os.getenv("NOTE_EMBED_CONCURRENCY", 4))
+NOTE_EMBED_MAX_RETRIES = int(os.getenv("NOTE_EMBED_MAX_RETRIES", 5))
+
+# Embeddings of student questions are cached (notes/embedding_cache.py): this
+# many per worker in memory, and in the QueryEmbedding table for this many
+# days before they are re-embedded. Expired rows: manage.py purge_query_embeddings
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 2048))
+QUERY_EMBEDDING_CACHE_TTL_DAYS = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL_DAYS", 30))
+# Seconds to wait for a question's embedding before retrieving by keyword only.
+QUERY_EMBEDDING_TIMEOUT = float(os.getenv("QUERY_EMBEDDING_TIMEOUT", 5.0))
+
+# InfoBot/NumSkull answer reuse (notes/answer_cache.py): an opening question
+# whose embedding is this similar to one already answered for the same
+# question part (or chat subject) gets that answer instead of a new completion.
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "True") == "True"
+ANSWER_CACHE_MIN_SIMILARITY = float(os.getenv("ANSWER_CACHE_MIN_SIMILARITY", 0.95))
+ANSWER_CACHE_TTL_DAYS = int(os.getenv("ANSWER_CACHE_TTL_DAYS", 14))
+
+# Parsed SymPy forms of QuestionPart answer keys kept per worker, so grading
+# only parses the student's side (interactive_lessons/services/utils_math.py).
+PARSED_ANSWER_CACHE_SIZE = int(os.getenv("PARSED_ANSWER_CACHE_SIZE", 4096))
+# Settle algebraic answers by evaluating both sides at random points before
+# falling back to sympy.simplify. Compare the two with:
+# python manage.py benchmark_algebraic_marking
+ALGEBRAIC_NUMERIC_CHECK = os.getenv("ALGEBRAIC_NUMERIC_CHECK", "True") == "True"
+# SymPy checks on student answers run in this many warm worker processes per
+# web process, each answer limited to GRADING_TIMEOUT seconds; a worker that
+# overruns is killed and replaced (interactive_lessons/services/grading_pool.py).
+# 0 grades in-process with no limit.
+GRADING_POOL_SIZE = int(os.getenv("GRADING_POOL_SIZE", 2))
+GRADING_TIMEOUT = float(os.getenv("GRADING_TIMEOUT", 5.0))
+# Marks are cached per part, answer and hint/solution use, so a repeated
+# answer skips grading (interactive_lessons/services/grade_cache.py). Expired
+# rows: manage.py purge_graded_answers
+GRADE_CACHE_ENABLED = os.getenv("GRADE_CACHE_ENABLED", "True") == "True"
+GRADE_CACHE_TTL_DAYS = int(os.getenv("GRADE_CACHE_TTL_DAYS", 30))
+# render_math_markdown output is cached per text (a process LRU of
+# RENDER_CACHE_SIZE entries in front of a shared table), so each piece of maths
+# goes through KaTeX once (interactive_lessons/services/render_cache.py).
+# Renders nobody has viewed lately: manage.py purge_rendered_markdown
+RENDER_CACHE_ENABLED = os.getenv("RENDER_CACHE_ENABLED", "True") == "True"
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", 2048))
+# Formulas are rendered by one long-lived KaTeX process per worker instead of
+# a node process each, falling back to the CLI if it fails or takes longer
+# than KATEX_SERVER_TIMEOUT seconds (core/katex_server.py).
+KATEX_SERVER_ENABLED = os.getenv("KATEX_SERVER_ENABLED", "True") == "True"
+KATEX_SERVER_TIMEOUT = float(os.getenv("KATEX_SERVER_TIMEOUT", 10))
+# "client" leaves lesson maths as TeX for the browser's KaTeX (already loaded
+# by _base.html), so pages only pay for Markdown; "server" renders it here.
+# Views can override it with render_cache.math_rendering().
+MATH_RENDERING = os.getenv("MATH_RENDERING", "server")
+# Seconds select_topic's topic catalog (content counts per topic) is cached
+# for. Content saves and deletes expire it at once, but only in the worker
+# that made them unless CACHES is shared (interactive_lessons/services/topic_catalog.py).
+TOPIC_CATALOG_TTL = int(os.getenv("TOPIC_CATALOG_TTL", 300))
+# Seconds a student's homework badge count (outstanding assignments) is cached
+# for. Submissions and assignment or class changes clear it (homework/services.py).
+HOMEWORK_BADGE_TTL = int(os.getenv("HOMEWORK_BADGE_TTL", 60))
+# UserSession.last_activity is written at most once per
+# SESSION_ACTIVITY_GRANULARITY seconds per session, in one UPDATE for all
+# sessions every SESSION_ACTIVITY_FLUSH_INTERVAL seconds (students/activity.py).
+# The Active Sessions admin lags by up to the sum of the two while a worker is
+# busy; flushes happen on requests, so an idle worker's last heartbeats wait
+# for its next request or its exit.
+SESSION_ACTIVITY_GRANULARITY = int(os.getenv("SESSION_ACTIVITY_GRANULARITY", 60))
+SESSION_ACTIVITY_FLUSH_INTERVAL = int(os.getenv("SESSION_ACTIVITY_FLUSH_INTERVAL", 30))
+# Seconds a worker may serve its in-memory copy of the Subject table. Saves
+# and deletes reload it straight away, but only in the worker that made them
+# (core/subjects.py).
+SUBJECT_REGISTRY_MAX_AGE = int(os.getenv("SUBJECT_REGISTRY_MAX_AGE", 300))
+# A fresh worker's cost to start (django.setup() plus the URLconf). openai,
+# SymPy, PyMuPDF and friends are imported on first use, not at boot (core's
+# tests check that); manage.py benchmark_startup fails past these budgets
+# (core/startup.py).
+STARTUP_IMPORT_BUDGET_MS = int(os.getenv("STARTUP_IMPORT_BUDGET_MS", 1500))
+STARTUP_RSS_BUDGET_MB = int(os.getenv("STARTUP_RSS_BUDGET_MB", 128))
+
 
 # ------------------------------------------------------------
 # OpenAI Configuration
@@ -203,6 +311,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'lcstats.wsgi.application'
 
+# Keeps test runs from writing the note index into the checkout.
+TEST_RUNNER = 'lcstats.test_runner.TestRunner'
+
 # ------------------------------------------------------------
 # Database
 # ------------------------------------------------------------
@@ -0,0 +1,26 @@
+"""Test runner that keeps the suite from writing into the checkout."""
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Points NOTE_FAISS_INDEX_PATH at a throwaway directory for the run.
+
+    Any test that searches or deletes notes outside IndexedNotesMixin would
+    otherwise create BASE_DIR/var/note_index.faiss.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._index_dir = tempfile.mkdtemp(prefix="note-index-")
+        self._index_path = settings.NOTE_FAISS_INDEX_PATH
+        settings.NOTE_FAISS_INDEX_PATH = Path(self._index_dir) / "note_index.faiss"
+
+    def teardown_test_environment(self, **kwargs):
+        settings.NOTE_FAISS_INDEX_PATH = self._index_path
+        shutil.rmtree(self._index_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lcstats.settings')
 
 application = get_wsgi_application()
+
+# Boot the SymPy grading workers with the web process, not on the first answer.
+from interactive_lessons.services.grading_pool import grading_pool  # noqa: E402
+
+grading_pool.start()
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.shortcuts import render
 from django.urls import path
 from django import forms
-from .models import Note, InfoBotQuery, InfoBotFeedback
+from .models import Note, InfoBotQuery, InfoBotFeedback, QueryEmbedding
 from .utils import search_similar
 
 
@@ -54,10 +54,13 @@ class NoteAdmin(admin.ModelAdmin):
 @admin.register(InfoBotQuery)
 class InfoBotQueryAdmin(admin.ModelAdmin):
     list_display = ("created_at", "topic_slug", "source_type", "confidence", "short_question", "short_answer")
-    list_filter = ("topic_slug", "source_type")
+    list_filter = ("topic_slug", "source_type", ("cached_from", admin.EmptyFieldListFilter), "cache_evicted")
     search_fields = ("question", "answer", "sources")
     ordering = ("-created_at",)
-    readonly_fields = ("created_at", "question", "answer", "confidence", "sources", "source_type", "topic_slug")
+    readonly_fields = (
+        "created_at", "question", "answer", "confidence", "sources", "source_type", "topic_slug",
+        "context_key", "cached_from",
+    )
 
     def has_module_permission(self, request):
         """Only superusers can access InfoBot queries"""
@@ -120,3 +123,26 @@ class InfoBotFeedbackAdmin(admin.ModelAdmin):
         question = obj.query.question
         return (question[:60] + "…") if len(question) > 60 else question
     query_snippet.short_description = "Query"
+
+
+# ---------- QueryEmbedding Admin ----------
+@admin.register(QueryEmbedding)
+class QueryEmbeddingAdmin(admin.ModelAdmin):
+    """The question-embedding cache: which questions repeat, and how often."""
+    list_display = ("query_text", "hit_count", "model", "created_at", "last_used_at")
+    list_filter = ("model",)
+    search_fields = ("query_text",)
+    ordering = ("-hit_count",)
+    exclude = ("embedding",)
+    readonly_fields = ("key", "model", "query_text", "dimensions", "hit_count", "created_at", "last_used_at")
+
+    def has_module_permission(self, request):
+        """Only superusers can see the cache"""
+        return request.user.is_superuser
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Entries are written by the cache, never by hand"""
+        return False
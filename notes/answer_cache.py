@@ -0,0 +1,97 @@
+"""Reuse InfoBot/NumSkull answers for questions that have already been asked.
+
+A class of thirty working through the same exam part ask the same handful
+of questions, and each one used to cost a chat completion. Every exchange is
+already logged in InfoBotQuery, so that table doubles as the cache:
+
+* An answer is reusable when it was the first exchange in its conversation
+  (a follow-up only makes sense after the turns before it), came from the
+  model rather than a note, is younger than ANSWER_CACHE_TTL_DAYS and has not
+  been evicted. Such rows store the question's embedding.
+* A new first question looks only at rows with the same ``context_key`` --
+  topic, practice/exam question and part, or chat subject -- and takes the
+  nearest one by cosine similarity if it reaches ANSWER_CACHE_MIN_SIMILARITY.
+* The hit is logged as its own InfoBotQuery pointing at the original through
+  ``cached_from``. A thumbs-down on either evicts the original for everyone.
+
+Question embeddings come through notes.utils.get_query_embedding, so a
+repeated question costs no API call at all.
+"""
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Most recent candidates compared per lookup; one question part rarely has more.
+MAX_CANDIDATES = 500
+
+
+def _enabled():
+    return getattr(settings, "ANSWER_CACHE_ENABLED", True)
+
+
+def _candidates(context_key):
+    from notes.models import InfoBotQuery
+
+    cutoff = timezone.now() - timedelta(days=getattr(settings, "ANSWER_CACHE_TTL_DAYS", 14))
+    return (
+        InfoBotQuery.objects
+        .filter(
+            context_key=context_key,
+            source_type="ai",
+            cached_from__isnull=True,
+            cache_evicted=False,
+            query_embedding__isnull=False,
+            created_at__gte=cutoff,
+        )
+        .exclude(answer="")
+        .order_by("-created_at")
+        .values_list("id", "query_embedding")[:MAX_CANDIDATES]
+    )
+
+
+def lookup(context_key, question):
+    """Find a reusable answer for ``question`` asked in ``context_key``.
+
+    Returns (question_vector, hit). ``hit`` is the InfoBotQuery whose answer
+    can be served, or None; ``question_vector`` should be stored with the new
+    answer on a miss (None if the question could not be embedded).
+    """
+    from notes.models import InfoBotQuery
+    from notes.utils import get_query_embedding
+
+    if not _enabled() or not context_key:
+        return None, None
+    try:
+        vector = np.asarray(get_query_embedding(question), dtype=np.float32)
+    except Exception:
+        logger.warning("Answer cache: could not embed question", exc_info=True)
+        return None, None
+
+    candidates = [(pk, emb) for pk, emb in _candidates(context_key) if emb is not None and emb.size == vector.size]
+    if not candidates:
+        return vector, None
+
+    matrix = np.vstack([emb for _, emb in candidates]).astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+    scores = np.divide(matrix @ vector, norms, out=np.zeros(len(candidates), dtype=np.float32), where=norms > 0)
+    best = int(np.argmax(scores))
+    if scores[best] < getattr(settings, "ANSWER_CACHE_MIN_SIMILARITY", 0.95):
+        return vector, None
+
+    hit = InfoBotQuery.objects.filter(pk=candidates[best][0]).first()
+    if hit is not None:
+        logger.info("Answer cache hit (%.3f) -> query %s", scores[best], hit.pk)
+    return vector, hit
+
+
+def evict(query):
+    """Stop reusing the answer ``query`` was given (its original, if it was a hit)."""
+    from notes.models import InfoBotQuery
+
+    original_id = query.cached_from_id or query.pk
+    InfoBotQuery.objects.filter(pk=original_id).update(cache_evicted=True)
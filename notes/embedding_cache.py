@@ -0,0 +1,161 @@
+"""Cache in front of the OpenAI embeddings call for student questions.
+
+Every InfoBot and NumSkull question used to pay for an embeddings round trip,
+even though questions like "what is the mean" come in thousands of times. Two
+tiers now sit in front of it, both keyed by a hash of the normalised question
+text plus the embedding model:
+
+1. A per-process LRU of QUERY_EMBEDDING_CACHE_SIZE vectors -- no I/O at all.
+2. The QueryEmbedding table, shared by every worker and surviving restarts.
+
+Entries older than QUERY_EMBEDDING_CACHE_TTL_DAYS count as misses and are
+re-embedded, so a provider-side model refresh eventually flows through;
+``manage.py purge_query_embeddings`` deletes them for good.
+
+Hits in the process tier are counted in memory and added to the row's
+``hit_count`` every HIT_FLUSH_EVERY hits rather than on each one, so the
+counters can trail slightly (and lose a few hits when a worker exits).
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+HIT_FLUSH_EVERY = 25
+
+
+def normalise_query(text):
+    """Collapse case and whitespace so trivially different questions share a key."""
+    return re.sub(r"\s+", " ", (text or "").strip()).lower()
+
+
+def cache_key(normalised_text, model):
+    return hashlib.sha256(f"{model}\n{normalised_text}".encode()).hexdigest()
+
+
+def _ttl_seconds():
+    return getattr(settings, "QUERY_EMBEDDING_CACHE_TTL_DAYS", 30) * 86400
+
+
+class QueryEmbeddingCache:
+    """Process LRU backed by the QueryEmbedding table."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> [vector, stored_at (epoch seconds), unflushed hits]
+        self._entries = OrderedDict()
+
+    def clear(self):
+        """Empty the process tier (the table is left alone)."""
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, vector, stored_at):
+        max_size = getattr(settings, "QUERY_EMBEDDING_CACHE_SIZE", 2048)
+        with self._lock:
+            self._entries[key] = [vector, stored_at, 0]
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def _local_hit(self, key):
+        """Return the vector if this process has a fresh copy, else None."""
+        flush = 0
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, stored_at, hits = entry
+            if time.time() - stored_at > _ttl_seconds():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            entry[2] = hits + 1
+            if entry[2] >= HIT_FLUSH_EVERY:
+                flush, entry[2] = entry[2], 0
+        if flush:
+            self._count_hits(key, flush)
+        return vector
+
+    def _count_hits(self, key, hits):
+        from notes.models import QueryEmbedding
+
+        try:
+            QueryEmbedding.objects.filter(key=key).update(
+                hit_count=F("hit_count") + hits, last_used_at=timezone.now(),
+            )
+        except Exception:
+            logger.warning("Could not record query-embedding cache hits", exc_info=True)
+
+    def _stored(self, key):
+        """Return (vector, stored_at) from the table if fresh, else None."""
+        from notes.models import QueryEmbedding
+
+        cutoff = timezone.now() - timedelta(seconds=_ttl_seconds())
+        try:
+            row = QueryEmbedding.objects.filter(key=key, created_at__gte=cutoff).first()
+        except Exception:
+            # The cache must never be the reason a question goes unanswered.
+            logger.warning("Query-embedding cache lookup failed", exc_info=True)
+            return None
+        if row is None:
+            return None
+        self._count_hits(key, 1)
+        return np.asarray(row.embedding, dtype=np.float32), row.created_at.timestamp()
+
+    def _store(self, key, model, text, vector):
+        from notes.models import QueryEmbedding
+
+        now = timezone.now()
+        try:
+            QueryEmbedding.objects.update_or_create(
+                key=key,
+                defaults={
+                    "model": model,
+                    "query_text": text,
+                    "embedding": vector,
+                    "dimensions": vector.size,
+                    "created_at": now,
+                    "last_used_at": now,
+                    "hit_count": 0,
+                },
+            )
+        except Exception:
+            logger.warning("Could not store query embedding", exc_info=True)
+        return now.timestamp()
+
+    def get_or_compute(self, text, model, compute):
+        """Return the embedding for normalised ``text``, calling ``compute`` on a miss.
+
+        ``compute(text)`` must return a float32 vector. It is only called when
+        neither tier has a fresh entry.
+        """
+        key = cache_key(text, model)
+
+        vector = self._local_hit(key)
+        if vector is not None:
+            return vector
+
+        stored = self._stored(key)
+        if stored is not None:
+            vector, stored_at = stored
+        else:
+            vector = np.asarray(compute(text), dtype=np.float32)
+            stored_at = self._store(key, model, text, vector)
+
+        vector.setflags(write=False)   # shared between callers from now on
+        self._remember(key, vector, stored_at)
+        return vector
+
+
+query_embedding_cache = QueryEmbeddingCache()
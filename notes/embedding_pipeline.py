@@ -0,0 +1,246 @@
+"""Out-of-band embedding for Notes.
+
+Note.save() used to call the OpenAI embeddings API itself, one note per
+request, so an admin save waited on the network and a bulk import paid one
+round trip per section. Saving now only queues the note's id; the work
+happens here:
+
+1. Stale notes are found by comparing ``_content_hash`` with a hash of the
+   note's current embedding text (Note.embedding_text), so the pipeline is
+   idempotent and a note whose text did not change is never re-sent.
+2. Texts go to OpenAI in batches (list input) of up to NOTE_EMBED_BATCH_SIZE,
+   NOTE_EMBED_CONCURRENCY batches in flight at once. Rate limits, timeouts and
+   5xx responses are retried with jittered exponential backoff; a batch OpenAI
+   rejects outright is split in half until the offending note is isolated.
+3. Each finished batch is written with one ``bulk_update`` and the note index
+   is updated once at the end.
+
+A note whose batch fails keeps its old hash, so it stays stale and is picked
+up by the next run. ``manage.py embed_notes`` sweeps the whole table and is
+safe to run from cron to catch anything a worker dropped when it exited.
+
+With NOTE_EMBED_ASYNC off (scripts, tests) ``enqueue`` embeds the note
+straight away instead.
+"""
+import atexit
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from core.lazy import lazy_openai_client
+from notes.index import get_note_index
+from notes.models import Note
+
+logger = logging.getLogger(__name__)
+
+client = lazy_openai_client(api_key=settings.OPENAI_API_KEY)
+
+# OpenAI caps a request at ~300k tokens; stay well clear of it by characters.
+MAX_BATCH_CHARS = 400_000
+
+
+def _retryable():
+    """Errors worth retrying (openai is only imported once there is work to do)."""
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,   # includes APITimeoutError
+        openai.InternalServerError,
+    )
+
+
+@dataclass
+class EmbedResult:
+    embedded: int = 0
+    failed: int = 0
+    unchanged: int = 0
+
+    def __add__(self, other):
+        return EmbedResult(
+            self.embedded + other.embedded,
+            self.failed + other.failed,
+            self.unchanged + other.unchanged,
+        )
+
+
+def _batches(items, batch_size):
+    """Split (note, text, hash) items into batches by count and total size."""
+    batch, chars = [], 0
+    for item in items:
+        if batch and (len(batch) >= batch_size or chars + len(item[1]) > MAX_BATCH_CHARS):
+            yield batch
+            batch, chars = [], 0
+        batch.append(item)
+        chars += len(item[1])
+    if batch:
+        yield batch
+
+
+def _create_embeddings(texts, model):
+    """One embeddings request, retried on transient errors."""
+    max_retries = getattr(settings, "NOTE_EMBED_MAX_RETRIES", 5)
+    for attempt in range(max_retries + 1):
+        try:
+            response = client.embeddings.create(model=model, input=texts)
+        except _retryable() as e:
+            if attempt == max_retries:
+                raise
+            delay = min(60, 2 ** attempt) * random.uniform(0.5, 1.5)
+            logger.warning("Embedding batch of %d failed (%s); retrying in %.1fs", len(texts), e, delay)
+            time.sleep(delay)
+        else:
+            # Results come back tagged with their input position.
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def _embed_batch(batch, model):
+    """Embed a batch; return (embedded items with vectors, failed items)."""
+    import openai
+
+    try:
+        vectors = _create_embeddings([text for _, text, _ in batch], model)
+    except openai.BadRequestError:
+        # Usually one oversized or malformed note: halve until it is alone.
+        if len(batch) == 1:
+            logger.exception("OpenAI rejected note %s for embedding", batch[0][0].pk)
+            return [], batch
+        middle = len(batch) // 2
+        left_done, left_failed = _embed_batch(batch[:middle], model)
+        right_done, right_failed = _embed_batch(batch[middle:], model)
+        return left_done + right_done, left_failed + right_failed
+    except Exception:
+        logger.exception("Embedding batch of %d notes failed", len(batch))
+        return [], batch
+    return [(item, vector) for item, vector in zip(batch, vectors)], []
+
+
+def embed_notes(queryset=None, force=False):
+    """Embed every stale note in ``queryset`` (default: all notes).
+
+    ``force`` re-embeds notes whose text has not changed too, e.g. after
+    switching OPENAI_EMBED_MODEL. Returns an EmbedResult.
+    """
+    model = settings.OPENAI_EMBED_MODEL
+    batch_size = getattr(settings, "NOTE_EMBED_BATCH_SIZE", 64)
+    concurrency = getattr(settings, "NOTE_EMBED_CONCURRENCY", 4)
+
+    queryset = Note.objects.all() if queryset is None else queryset
+    result = EmbedResult()
+    pending = []
+    for note in queryset.select_related("topic").iterator(chunk_size=500):
+        text = note.embedding_text()
+        if not text.strip():
+            continue
+        content_hash = Note.embedding_hash(text)
+        if force or note.embedding is None or content_hash != note._content_hash:
+            pending.append((note, text, content_hash))
+        else:
+            result.unchanged += 1
+
+    if not pending:
+        return result
+
+    saved = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(_embed_batch, batch, model) for batch in _batches(pending, batch_size)]
+        # Database writes stay on this thread; only the HTTP calls fan out.
+        for future in as_completed(futures):
+            done, failed = future.result()
+            result.failed += len(failed)
+            if not done:
+                continue
+            notes = []
+            for (note, _, content_hash), vector in done:
+                note.embedding = vector
+                note._content_hash = content_hash
+                notes.append(note)
+            Note.objects.bulk_update(notes, ["embedding", "_content_hash"])
+            result.embedded += len(notes)
+            saved.extend(notes)
+
+    # bulk_update sends no post_save, so tell the index directly.
+    if saved:
+        try:
+            get_note_index().notes_saved(saved)
+        except Exception:
+            logger.exception("Could not update the note index for %d re-embedded notes", len(saved))
+
+    logger.info(
+        "Note embedding: %d embedded, %d failed, %d unchanged",
+        result.embedded, result.failed, result.unchanged,
+    )
+    return result
+
+
+class EmbeddingQueue:
+    """Note ids waiting to be embedded, drained by one background thread.
+
+    The thread waits NOTE_EMBED_QUEUE_DELAY seconds after the first id
+    arrives so a burst of saves (an import, a bulk admin edit) goes out as
+    one batched run. Whatever is still queued when the process exits is
+    embedded on the way out.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = set()
+        self._thread = None
+        self._run_lock = threading.Lock()
+        atexit.register(self._flush_at_exit)
+
+    def enqueue(self, note_id):
+        if not getattr(settings, "NOTE_EMBED_ASYNC", True):
+            embed_notes(Note.objects.filter(pk=note_id))
+            return
+        # The worker reads the note on its own connection, so wait for the commit.
+        transaction.on_commit(lambda: self._add(note_id))
+
+    def _add(self, note_id):
+        with self._cond:
+            self._pending.add(note_id)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name="note-embedder", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return set(self._pending)
+
+    def flush(self):
+        """Embed everything queued so far on the calling thread; returns an EmbedResult."""
+        with self._run_lock:
+            with self._cond:
+                ids, self._pending = self._pending, set()
+            if not ids:
+                return EmbedResult()
+            return embed_notes(Note.objects.filter(pk__in=ids))
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            time.sleep(getattr(settings, "NOTE_EMBED_QUEUE_DELAY", 2.0))
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Background note embedding failed")
+            finally:
+                connection.close()
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Could not embed queued notes at exit")
+
+
+embedding_queue = EmbeddingQueue()
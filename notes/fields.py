@@ -0,0 +1,81 @@
+"""Packed binary storage for embedding vectors.
+
+Note.embedding used to be a JSONField: ~1536 floats written out as text, so
+every index build parsed megabytes of JSON into Python floats before NumPy
+ever saw them. VectorField stores the raw little-endian array instead -- 6 KB
+per float32 vector, 3 KB at float16 -- and hands back a NumPy view of the
+bytes the database driver returned, with no parsing or copying.
+
+A four-byte header records the element type, so rows written at different
+NOTE_EMBEDDING_DTYPE settings can live side by side. Values read back are
+read-only arrays in the stored dtype; consumers that need float32 convert
+(a no-op for float32 rows).
+"""
+import numpy as np
+from django.conf import settings
+from django.db import models
+
+_HEADERS = {
+    np.dtype("<f4"): b"VF4\x00",
+    np.dtype("<f2"): b"VF2\x00",
+}
+_DTYPES = {header: dtype for dtype, header in _HEADERS.items()}
+HEADER_SIZE = 4
+
+
+def storage_dtype():
+    """The dtype new vectors are packed as (NOTE_EMBEDDING_DTYPE)."""
+    dtype = np.dtype(getattr(settings, "NOTE_EMBEDDING_DTYPE", "float32")).newbyteorder("<")
+    if dtype not in _HEADERS:
+        raise ValueError(f"NOTE_EMBEDDING_DTYPE must be float32 or float16, not {dtype}")
+    return dtype
+
+
+def pack_vector(values, dtype=None):
+    """Serialise a sequence of floats to header + raw array bytes."""
+    dtype = np.dtype(dtype).newbyteorder("<") if dtype else storage_dtype()
+    array = np.asarray(values, dtype=dtype)
+    if array.ndim != 1:
+        raise ValueError("Embedding vectors must be one-dimensional")
+    return _HEADERS[dtype] + array.tobytes()
+
+
+def unpack_vector(data):
+    """Zero-copy NumPy view of bytes written by pack_vector."""
+    data = memoryview(data)
+    header = bytes(data[:HEADER_SIZE])
+    try:
+        dtype = _DTYPES[header]
+    except KeyError:
+        raise ValueError("Not a packed embedding vector") from None
+    return np.frombuffer(data, dtype=dtype, offset=HEADER_SIZE)
+
+
+class VectorField(models.BinaryField):
+    """A 1-D float vector stored as packed bytes, read back as a NumPy array."""
+
+    description = "Packed float vector"
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return unpack_vector(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, np.ndarray):
+            return value
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return unpack_vector(value)
+        return np.asarray(value, dtype=np.float32)
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, (bytes, bytearray, memoryview)):
+            return super().get_prep_value(value)
+        if isinstance(value, np.ndarray) and value.dtype in _HEADERS:
+            return pack_vector(value, value.dtype)
+        return pack_vector(value)
+
+    def value_to_string(self, obj):
+        # Serialise as a plain list so dumpdata/loaddata stay readable.
+        value = self.value_from_object(obj)
+        return None if value is None else np.asarray(value, dtype=float).tolist()
@@ -1,12 +1,13 @@
-import numpy as np
-from notes.utils import search_similar
-from notes.models import Note
+from notes.utils import search_hybrid
 from django.conf import settings
 
 def expand_query(query: str) -> str:
     """
     Expand short queries with context to improve embedding similarity.
     E.g., 'mean' → 'what is the mean average in statistics how to calculate'
+
+    Only the embedded text is expanded; keyword (BM25) matching in
+    search_hybrid uses the question as asked.
     """
     import re
 
@@ -64,18 +65,19 @@ def match_note(query: str, topic: str = None, threshold: float = None, top_n: in
     elif expanded_query != query:
         print(f"🔍 Query expanded: '{query}' → '{expanded_query[:80]}...'")
 
-    # 3️⃣ Use your robust search_similar() util with expanded query
-    scored = search_similar(expanded_query, topic=topic, top_n=top_n)
+    # 3️⃣ Keyword + vector retrieval; a clear keyword winner skips the embedding
+    scored, lexical_only = search_hybrid(query, topic=topic, top_n=top_n, vector_query=expanded_query)
 
     if not scored:
         print("⚠️ No notes retrieved.")
         return None, None, []
 
-    # 3️⃣ Sort again for safety and extract top note
-    scored.sort(reverse=True, key=lambda x: x[0])
     best_confidence, best_note = scored[0]
 
     # 4️⃣ Decide if strong enough for direct answer
+    if lexical_only:
+        print(f"✅ match_note: keyword match ({best_confidence:.3f}) → {best_note.title}")
+        return best_note, best_confidence, scored
     if best_confidence >= threshold:
         print(f"✅ match_note: strong match ({best_confidence:.3f}) → {best_note.title}")
         return best_note, best_confidence, scored
@@ -3,14 +3,17 @@
 Both InfoBot entry points (interactive_lessons.views.info_bot for question
 pages, chat.views.chat_view elsewhere) use these so behaviour stays in step.
 """
+import json
 import logging
 
 from django.conf import settings
-from openai import OpenAI
+from django.http import StreamingHttpResponse
+
+from core.lazy import lazy_openai_client
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI()
+client = lazy_openai_client()
 
 # Keep the last few exchanges only: enough for "where did the 0.5 come from?"
 # to make sense, small enough to stay well inside the session cookie/store.
@@ -90,3 +93,68 @@ def ask_openai(messages, temperature=0.3):
     except Exception as exc:
         logger.exception("NumSkull chat completion failed: %s", exc)
         return None, FRIENDLY_ERROR
+
+
+def wants_stream(request):
+    """True if the caller asked for server-sent events (``?stream=1``)."""
+    return request.GET.get("stream") == "1"
+
+
+def stream_openai(messages, temperature=0.3):
+    """Yield the chat model's answer text piece by piece as it is generated.
+
+    Unlike ask_openai this raises on failure; stream_answer turns that into
+    an error event.
+    """
+    stream = client.chat.completions.create(
+        model=chat_model(),
+        messages=messages,
+        temperature=temperature,
+        stream=True,
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_answer(request, messages, finish):
+    """A text/event-stream response forwarding the answer as it is generated.
+
+    Sends a ``token`` event per piece of text, then calls ``finish(raw_answer)``
+    -- which records the exchange and returns the JSON the non-streaming
+    endpoint would have sent ({"answer": html, "query_id": ...}). If the
+    provider or ``finish`` fails an ``error`` event carries FRIENDLY_ERROR
+    instead. The stream always ends with ``done``: ``finish``'s JSON, or no
+    answer after an error.
+
+    The session cookie goes out with the headers, before ``finish`` runs, so
+    the session is created now; what ``finish`` writes to it is saved once
+    the answer is complete.
+    """
+    if request.session.session_key is None:
+        request.session.save()
+        request.session.modified = True   # so SessionMiddleware sends the cookie
+
+    def events():
+        result = {"answer": None, "query_id": None}
+        pieces = []
+        try:
+            for piece in stream_openai(messages):
+                pieces.append(piece)
+                yield sse_event("token", {"text": piece})
+            result = finish("".join(pieces))
+            if request.session.modified:
+                request.session.save()
+        except Exception as exc:
+            logger.exception("NumSkull streamed answer failed: %s", exc)
+            yield sse_event("error", {"answer": f"<p>{FRIENDLY_ERROR}</p>", "query_id": None})
+        yield sse_event("done", result)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"   # stop nginx holding tokens back
+    return response
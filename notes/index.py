@@ -0,0 +1,463 @@
+"""Embedding indexes behind notes.utils.search_similar.
+
+search_similar used to load every Note row, rebuild a NumPy array from the
+JSON ``embedding`` field and call sklearn's cosine_similarity once per note in
+a Python loop -- on every InfoBot and NumSkull question. Retrieval now goes
+through one of two indexes, chosen by NOTE_INDEX_BACKEND:
+
+``"faiss"`` (FaissNoteIndex, the default)
+    A FAISS index stored at NOTE_FAISS_INDEX_PATH and memory-mapped by each
+    worker. The embedding pipeline adds or replaces each batch of re-embedded
+    notes' vectors in one write (saving a note never touches the file); every
+    worker notices the file changed and re-maps it. Past NOTE_FAISS_IVF_MIN_NOTES
+    vectors a rebuild switches to an inverted-file index, so search time stays
+    flat as exam papers and marking schemes are loaded into Notes.
+
+``"matrix"`` (NoteIndex)
+    Every note vector held in one pre-normalised float32 matrix, so a query is
+    a single mat-vec plus ``argpartition``. Built lazily and dropped when a
+    note changes; NOTE_INDEX_MAX_AGE bounds how stale a worker that did not
+    see the change can get. Also the fallback when faiss is not installed.
+
+Both score by cosine similarity and apply the same content_type / audience /
+topic filters the old queryset did. ``manage.py rebuild_note_index`` rebuilds
+and verifies the on-disk index.
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _unit_vector(values):
+    """Return ``values`` as a unit-length float32 vector, or None if unusable."""
+    if values is None:
+        return None
+    try:
+        vec = np.asarray(values, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None
+    if vec.ndim != 1 or vec.size == 0 or not np.isfinite(vec).all():
+        return None
+    norm = np.linalg.norm(vec)
+    if norm == 0:
+        return None
+    return vec / norm
+
+
+@dataclass
+class _Rows:
+    """Per-note filter columns, aligned with ``ids``."""
+    ids: np.ndarray               # (n,) Note primary keys
+    content_types: np.ndarray     # (n,) str
+    audiences: np.ndarray         # (n,) str
+    topics: list                  # lower-cased topic names ("" if none)
+    titles: list                  # lower-cased titles
+    masks: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_values(cls, values):
+        """Build from (id, title, topic name, content_type, audience) tuples."""
+        values = list(values)
+        return cls(
+            ids=np.array([v[0] for v in values], dtype=np.int64),
+            content_types=np.array([v[3] or "" for v in values]),
+            audiences=np.array([v[4] or "" for v in values]),
+            topics=[(v[2] or "").lower() for v in values],
+            titles=[(v[1] or "").lower() for v in values],
+        )
+
+    def mask(self, content_type=None, audience=None, topic=None):
+        """Boolean row filter matching search_similar's old queryset filters.
+
+        Cached, so repeated questions on the same topic page don't redo the
+        string matching.
+        """
+        key = (content_type, audience, topic)
+        mask = self.masks.get(key)
+        if mask is not None:
+            return mask
+
+        mask = np.ones(len(self.ids), dtype=bool)
+        if content_type:
+            mask &= self.content_types == content_type
+        if audience:
+            mask &= (self.audiences == "all") | (self.audiences == audience)
+        if topic:
+            topic_normalized = topic.replace("-", " ").lower()
+            mask &= np.array([
+                topic_normalized in topic_name
+                or topic_normalized in title
+                or "statistics" in topic_name  # fallback for general stats
+                for topic_name, title in zip(self.topics, self.titles)
+            ], dtype=bool)
+
+        self.masks[key] = mask
+        return mask
+
+
+def _note_values(with_embedding):
+    from notes.models import Note
+
+    fields = ["id", "title", "topic__name", "content_type", "audience"]
+    if with_embedding:
+        return Note.objects.exclude(embedding__isnull=True).values_list(*fields, "embedding")
+    return Note.objects.values_list(*fields)
+
+
+def _load_note_vectors():
+    """Every usable note vector, grouped by dimension.
+
+    Returns {dim: (rows, vectors)} where ``vectors`` is an (n, dim) float32
+    array of unit rows aligned with ``rows``.
+    """
+    grouped = {}
+    skipped = 0
+    for *meta, embedding in _note_values(with_embedding=True):
+        vec = _unit_vector(embedding)
+        if vec is None:
+            skipped += 1
+            continue
+        values, vectors = grouped.setdefault(vec.size, ([], []))
+        values.append(meta)
+        vectors.append(vec)
+
+    if skipped:
+        logger.warning("Note index: skipped %d notes with unusable embeddings", skipped)
+    return {
+        dim: (_Rows.from_values(values), np.vstack(vectors))
+        for dim, (values, vectors) in grouped.items()
+    }
+
+
+def _restrict(rows, mask, note_ids):
+    """``mask`` narrowed to ``note_ids`` (a new array: cached masks stay intact)."""
+    if note_ids is None:
+        return mask
+    return mask & np.isin(rows.ids, np.asarray(list(note_ids), dtype=np.int64))
+
+
+def _top_k(scores, k):
+    """Indices of the k highest scores, best first."""
+    if k < scores.size:
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(scores.size)
+    return best[np.argsort(-scores[best], kind="stable")]
+
+
+class NoteIndex:
+    """Pre-normalised matrix of note embeddings with row metadata.
+
+    Notes embedded with different models can have different dimensions; a
+    query is only compared with the block that matches its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._blocks = None
+        self._built_at = 0.0
+
+    def invalidate(self):
+        """Drop the index; the next search rebuilds it from the database."""
+        with self._lock:
+            self._blocks = None
+
+    def rebuild(self):
+        with self._lock:
+            self._blocks = self._build()
+            self._built_at = time.monotonic()
+
+    # Any change just drops the matrix: rebuilding it is one query.
+    def notes_saved(self, notes):
+        self.invalidate()
+
+    def note_deleted(self, note_id):
+        self.invalidate()
+
+    def _get_blocks(self):
+        with self._lock:
+            max_age = getattr(settings, "NOTE_INDEX_MAX_AGE", 300)
+            stale = max_age and time.monotonic() - self._built_at > max_age
+            if self._blocks is None or stale:
+                self._blocks = self._build()
+                self._built_at = time.monotonic()
+            return self._blocks
+
+    def _build(self):
+        blocks = _load_note_vectors()
+        logger.info(
+            "Note index built: %d notes in %d block(s)",
+            sum(len(rows.ids) for rows, _ in blocks.values()), len(blocks),
+        )
+        return blocks
+
+    def search(self, query_vec, top_n=5, content_type=None, audience=None, topic=None, note_ids=None):
+        """Return up to ``top_n`` (cosine similarity, note id) pairs, best first.
+
+        ``note_ids`` further restricts the search to those notes.
+        """
+        query = _unit_vector(query_vec)
+        if query is None or top_n <= 0:
+            return []
+
+        block = self._get_blocks().get(query.size)
+        if block is None:
+            return []
+        rows, matrix = block
+
+        selected = np.flatnonzero(_restrict(rows, rows.mask(content_type, audience, topic), note_ids))
+        if selected.size == 0:
+            return []
+
+        # Fancy indexing copies, so skip it when nothing was filtered out.
+        if selected.size != len(rows.ids):
+            matrix = matrix[selected]
+        scores = matrix @ query
+        best = _top_k(scores, min(top_n, selected.size))
+
+        return [(float(scores[i]), int(rows.ids[selected[i]])) for i in best]
+
+
+class FaissNoteIndex:
+    """Note embeddings in a FAISS inner-product index on disk.
+
+    Readers memory-map the file read-only, so every worker on a host shares
+    one copy of the vectors in the page cache. Writers take an exclusive lock
+    on a sidecar ``.lock`` file, load a private writable copy, change it and
+    atomically replace the file; readers compare its inode and mtime on each
+    search and re-map it when it has been replaced.
+
+    Only the vectors live in the index. The filter columns come from one
+    cheap query (no embeddings) each time the file is (re)mapped, and at
+    least every NOTE_INDEX_MAX_AGE seconds so edits to a note's type,
+    audience or topic show up without its vector changing.
+
+    A zero-length file marks an index with no vectors yet, so searches and
+    deletes do not rebuild it from the database every time.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._index = None
+        self._rows = None
+        self._version = None
+        self._rows_loaded_at = 0.0
+
+    # -- disk ----------------------------------------------------------
+
+    def _file_version(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _write_lock(self):
+        import fcntl
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.path.with_name(self.path.name + ".lock"), "w")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file   # closing it releases the lock
+
+    def _write(self, index):
+        import faiss
+
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        if index is None:
+            tmp.touch()   # the empty marker
+        else:
+            faiss.write_index(index, str(tmp))
+        os.replace(tmp, self.path)
+
+    def _read(self, flags=0):
+        """The index on disk, or None for the empty marker."""
+        import faiss
+
+        if os.stat(self.path).st_size == 0:
+            return None
+        return faiss.read_index(str(self.path), flags)
+
+    @staticmethod
+    def _new_index(vectors, ids):
+        import faiss
+
+        n, dim = vectors.shape
+        if n >= getattr(settings, "NOTE_FAISS_IVF_MIN_NOTES", 10000):
+            # Roughly sqrt(n) lists keeps each probe small; FAISS wants at
+            # least ~39 training points per list.
+            nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+            index = faiss.IndexIVFFlat(
+                faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT,
+            )
+            index.train(vectors)
+        else:
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        index.add_with_ids(vectors, ids)
+        return index
+
+    def rebuild(self):
+        """Re-create the on-disk index from every note. Returns the vector count."""
+        blocks = _load_note_vectors()
+        with self._write_lock():
+            if not blocks:
+                self._write(None)
+                count = 0
+            else:
+                # One index holds one dimension: keep whichever most notes use.
+                dim = Counter({d: len(rows.ids) for d, (rows, _) in blocks.items()}).most_common(1)[0][0]
+                rows, vectors = blocks[dim]
+                for other in set(blocks) - {dim}:
+                    logger.warning(
+                        "Note index: %d notes have %d-dim embeddings, not %d; left out",
+                        len(blocks[other][0].ids), other, dim,
+                    )
+                self._write(self._new_index(vectors, rows.ids))
+                count = len(rows.ids)
+        logger.info("Note FAISS index rebuilt: %d vectors at %s", count, self.path)
+        return count
+
+    def _update(self, changes):
+        """Apply (note_id, vector) pairs: remove each note, then add back any vector given."""
+        if not changes:
+            return
+        if self._file_version() is None:
+            self.rebuild()
+            return
+
+        with self._write_lock():
+            index = self._read()
+            if index is not None:
+                index.remove_ids(np.array([note_id for note_id, _ in changes], dtype=np.int64))
+            vectors = [(note_id, vector) for note_id, vector in changes if vector is not None]
+            # The first vector decides the dimension of a new index.
+            dim = index.d if index is not None else (vectors[0][1].size if vectors else None)
+            fits = []
+            for note_id, vector in vectors:
+                if vector.size == dim:
+                    fits.append((note_id, vector))
+                else:
+                    logger.warning(
+                        "Note %s: %d-dim embedding does not fit the %d-dim index",
+                        note_id, vector.size, dim,
+                    )
+            if fits:
+                vectors = np.vstack([vector for _, vector in fits])
+                ids = np.array([note_id for note_id, _ in fits], dtype=np.int64)
+                if index is None:
+                    index = self._new_index(vectors, ids)
+                else:
+                    index.add_with_ids(vectors, ids)
+            elif index is None:
+                return   # still empty
+            self._write(index)
+
+    def notes_saved(self, notes):
+        """Upsert several notes' vectors with one read and one write of the file."""
+        self._update([(note.pk, _unit_vector(note.embedding)) for note in notes])
+
+    def note_deleted(self, note_id):
+        self._update([(note_id, None)])
+
+    def invalidate(self):
+        """Forget the mapped copy; the next search maps the file afresh."""
+        with self._lock:
+            self._version = None
+
+    # -- search --------------------------------------------------------
+
+    def _current(self):
+        import faiss
+
+        if self._file_version() is None:
+            self.rebuild()
+
+        with self._lock:
+            version = self._file_version()
+            if version is None:
+                return None, None
+            if version != self._version:
+                self._index = self._read(faiss.IO_FLAG_MMAP_IFC)
+                self._rows = None
+                self._version = version
+            max_age = getattr(settings, "NOTE_INDEX_MAX_AGE", 300)
+            stale = max_age and time.monotonic() - self._rows_loaded_at > max_age
+            if self._index is not None and (self._rows is None or stale):
+                self._rows = _Rows.from_values(_note_values(with_embedding=False))
+                self._rows_loaded_at = time.monotonic()
+            return self._index, self._rows
+
+    def search(self, query_vec, top_n=5, content_type=None, audience=None, topic=None, note_ids=None):
+        """Return up to ``top_n`` (cosine similarity, note id) pairs, best first.
+
+        ``note_ids`` further restricts the search to those notes.
+        """
+        import faiss
+
+        query = _unit_vector(query_vec)
+        if query is None or top_n <= 0:
+            return []
+
+        index, rows = self._current()
+        if index is None or index.ntotal == 0 or query.size != index.d:
+            return []
+
+        mask = _restrict(rows, rows.mask(content_type, audience, topic), note_ids)
+        selector = None
+        if not mask.all():
+            allowed = rows.ids[mask]
+            if allowed.size == 0:
+                return []
+            selector = faiss.IDSelectorBatch(allowed)
+
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            params = faiss.SearchParametersIVF(
+                sel=selector, nprobe=getattr(settings, "NOTE_FAISS_NPROBE", 16),
+            )
+        else:
+            params = faiss.SearchParameters(sel=selector)
+
+        scores, ids = index.search(query[None, :], min(top_n, index.ntotal), params=params)
+        return [
+            (float(score), int(note_id))
+            for score, note_id in zip(scores[0], ids[0])
+            if note_id != -1
+        ]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_note_index():
+    """The index this process should search, per NOTE_INDEX_BACKEND."""
+    backend = getattr(settings, "NOTE_INDEX_BACKEND", "faiss")
+    if backend == "faiss":
+        try:
+            import faiss  # noqa: F401
+        except ImportError:
+            logger.warning("faiss is not installed; using the in-memory note index")
+            backend = "matrix"
+
+    if backend == "faiss":
+        key = ("faiss", str(settings.NOTE_FAISS_INDEX_PATH))
+    else:
+        key = ("matrix",)
+
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = FaissNoteIndex(key[1]) if backend == "faiss" else NoteIndex()
+            _indexes[key] = index
+        return index
@@ -0,0 +1,161 @@
+"""BM25 keyword index over note titles, metadata and content.
+
+match_note used to need a remote embedding before it could decide anything,
+and leaned on a hand-written synonym table (expand_query) to make one-word
+questions like "median?" land. This index needs neither: it is built in
+process from one query, scores with BM25, and lets notes.utils.search_hybrid
+
+* answer a question straight from the notes, with no network call at all,
+  when one note is a clear lexical winner (NOTE_LEXICAL_CONFIDENCE and
+  NOTE_LEXICAL_MARGIN), and
+* otherwise fuse its scores with cosine similarity, or stand in on its own
+  when the embeddings provider is slow or down.
+
+Fields are weighted by repeating their terms (a cheap BM25F): a word in the
+title counts three times, in ``metadata`` (the sample prompts written for
+each note) twice, in the body once. Scores are divided by the best score the
+query could possibly reach, so they fall in [0, 1) whatever the query length.
+
+Like the matrix NoteIndex, it is dropped when a note is saved or deleted and
+rebuilt at most NOTE_INDEX_MAX_AGE seconds after another worker's change.
+"""
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.conf import settings
+
+from notes.index import _Rows, _top_k
+
+logger = logging.getLogger(__name__)
+
+K1 = 1.2
+B = 0.75
+FIELD_WEIGHTS = (("title", 3), ("metadata", 2), ("content", 1))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+    a an and are as at be by can could do does for from how i if in is it its
+    me my of on or please should so that the their then there these this to
+    was we what when where which who why will with would you your
+""".split())
+
+
+def tokenize(text):
+    """Lower-case word tokens without stopwords; a plural "s" is dropped."""
+    tokens = []
+    for token in _TOKEN.findall((text or "").lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class LexicalIndex:
+    """In-memory inverted index with BM25 scoring."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = None
+        self._built_at = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._built = None
+
+    def _get(self):
+        with self._lock:
+            max_age = getattr(settings, "NOTE_INDEX_MAX_AGE", 300)
+            stale = max_age and time.monotonic() - self._built_at > max_age
+            if self._built is None or stale:
+                self._built = self._build()
+                self._built_at = time.monotonic()
+            return self._built
+
+    @staticmethod
+    def _build():
+        from notes.models import Note
+
+        values = list(Note.objects.values_list(
+            "id", "title", "topic__name", "content_type", "audience", "metadata", "content",
+        ))
+        rows = _Rows.from_values(v[:5] for v in values)
+
+        postings = defaultdict(lambda: ([], []))
+        lengths = np.zeros(len(values), dtype=np.float32)
+        for doc, (_, title, _, _, _, metadata, content) in enumerate(values):
+            counts = Counter()
+            for text, (_, weight) in zip((title, metadata, content), FIELD_WEIGHTS):
+                for token in tokenize(text):
+                    counts[token] += weight
+            lengths[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                docs, tfs = postings[term]
+                docs.append(doc)
+                tfs.append(tf)
+
+        postings = {
+            term: (np.array(docs, dtype=np.int64), np.array(tfs, dtype=np.float32))
+            for term, (docs, tfs) in postings.items()
+        }
+        average = float(lengths.mean()) if values else 0.0
+        average = average or 1.0
+        # BM25's length normalisation, once per document rather than per query
+        norms = K1 * (1 - B + B * lengths / average)
+        logger.info("Lexical note index built: %d notes, %d terms", len(values), len(postings))
+        return rows, postings, norms
+
+    @staticmethod
+    def _idf(n, df):
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query, top_n=5, content_type=None, audience=None, topic=None):
+        """Return up to ``top_n`` (normalised BM25 score, note id) pairs, best first."""
+        rows, postings, norms = self._get()
+        n = len(rows.ids)
+        terms = set(tokenize(query))
+        if not n or not terms or top_n <= 0:
+            return []
+
+        scores = np.zeros(n, dtype=np.float32)
+        ceiling = 0.0
+        for term in terms:
+            docs, tfs = postings.get(term, (None, None))
+            # A word no note uses still counts against the ceiling: the
+            # question asks about something the notes don't mention.
+            idf = self._idf(n, 0 if docs is None else docs.size)
+            ceiling += idf * (K1 + 1)
+            if docs is not None:
+                scores[docs] += idf * tfs * (K1 + 1) / (tfs + norms[docs])
+        scores /= ceiling
+
+        mask = rows.mask(content_type, audience, topic) & (scores > 0)
+        selected = np.flatnonzero(mask)
+        if selected.size == 0:
+            return []
+        best = _top_k(scores[selected], min(top_n, selected.size))
+        return [(float(scores[selected[i]]), int(rows.ids[selected[i]])) for i in best]
+
+
+def is_confident(hits):
+    """True if the top lexical hit is strong and well clear of the runner-up."""
+    if not hits:
+        return False
+    best = hits[0][0]
+    if best < getattr(settings, "NOTE_LEXICAL_CONFIDENCE", 0.8):
+        return False
+    runner_up = hits[1][0] if len(hits) > 1 else 0.0
+    return best >= getattr(settings, "NOTE_LEXICAL_MARGIN", 1.25) * runner_up
+
+
+_lexical_index = LexicalIndex()
+
+
+def get_lexical_index():
+    return _lexical_index
@@ -0,0 +1,106 @@
+"""
+Compare how long note embeddings take to load, and how much memory they use,
+stored as JSON text versus packed float32/float16 (notes/fields.py).
+
+Runs on synthetic vectors, so it needs no API calls and leaves the database
+alone. Pass --from-db to also time loading the real notes table.
+
+    python manage.py benchmark_note_embeddings
+    python manage.py benchmark_note_embeddings --notes 10000 --dims 3072
+    python manage.py benchmark_note_embeddings --from-db
+"""
+import json
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from notes.fields import pack_vector, unpack_vector
+
+
+def _measure(fn, repeat):
+    """Best wall time over ``repeat`` runs, plus peak traced memory of one run."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+class Command(BaseCommand):
+    help = "Benchmark JSON versus packed binary storage for note embeddings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--notes", type=int, default=2000,
+                            help="How many synthetic notes to load (default 2000).")
+        parser.add_argument("--dims", type=int, default=1536,
+                            help="Embedding dimensions (default 1536, text-embedding-3-small).")
+        parser.add_argument("--repeat", type=int, default=5,
+                            help="Timing runs per format; the best is reported (default 5).")
+        parser.add_argument("--from-db", action="store_true",
+                            help="Also time loading every embedding from the notes table.")
+
+    def handle(self, *args, **options):
+        n, dims, repeat = options["notes"], options["dims"], options["repeat"]
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((n, dims)).astype(np.float32)
+
+        # What the database driver hands back for each storage format.
+        stored = {
+            "JSON": [json.dumps(v.tolist()) for v in vectors],
+            "float32": [pack_vector(v, "float32") for v in vectors],
+            "float16": [pack_vector(v, "float16") for v in vectors],
+        }
+        # Each loader ends where the index build starts: one float32 matrix.
+        loaders = {
+            "JSON": lambda rows: np.array([json.loads(r) for r in rows], dtype=np.float32),
+            "float32": lambda rows: np.vstack([unpack_vector(r) for r in rows]),
+            "float16": lambda rows: np.vstack([unpack_vector(r) for r in rows]).astype(np.float32),
+        }
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n📦 {n} notes × {dims} dimensions, best of {repeat}\n"
+        ))
+        self.stdout.write(f"{'format':<10}{'stored':>12}{'load':>12}{'peak memory':>14}")
+
+        baseline = None
+        for name, rows in stored.items():
+            size = sum(len(r) for r in rows)
+            seconds, peak = _measure(lambda: loaders[name](rows), repeat)
+            baseline = baseline or seconds
+            self.stdout.write(
+                f"{name:<10}{size / 2**20:>10.1f}MB{seconds * 1000:>10.1f}ms{peak / 2**20:>12.1f}MB"
+                f"   ({baseline / seconds:.0f}× JSON speed)"
+            )
+
+        # float16 costs precision; show that ranking does not notice.
+        query = vectors[0] / np.linalg.norm(vectors[0])
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        half = loaders["float16"](stored["float16"])
+        half /= np.linalg.norm(half, axis=1, keepdims=True)
+        drift = np.abs(unit @ query - half @ query).max()
+        self.stdout.write(f"\nfloat16 max cosine drift: {drift:.2e}")
+
+        if options["from_db"]:
+            self._benchmark_db(repeat)
+
+    def _benchmark_db(self, repeat):
+        from notes.models import Note
+
+        def load():
+            rows = Note.objects.exclude(embedding__isnull=True).values_list("embedding", flat=True)
+            return [np.asarray(r, dtype=np.float32) for r in rows]
+
+        count = len(load())
+        seconds, peak = _measure(load, repeat)
+        self.stdout.write(
+            f"\nnotes table: {count} embeddings in {seconds * 1000:.1f}ms, "
+            f"peak {peak / 2**20:.1f}MB"
+        )
@@ -0,0 +1,40 @@
+"""Embed every note whose embedding is missing or out of date.
+
+Saving a note queues it for the background embedder (notes/embedding_pipeline.py);
+this sweeps the whole table for anything that queue missed -- a worker that
+exited mid-batch, rows written with .update() or raw SQL, a failed OpenAI
+call. Safe to run from a scheduled task: notes whose text is unchanged are
+skipped without an API call.
+
+    python manage.py embed_notes --dry-run
+    python manage.py embed_notes
+    python manage.py embed_notes --all      # after changing OPENAI_EMBED_MODEL
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.embedding_pipeline import embed_notes
+from notes.models import Note
+
+
+class Command(BaseCommand):
+    help = "Embed notes whose embedding is missing or stale, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true",
+                            help="Re-embed every note, not just stale ones")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Count stale notes, call no API")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            notes = Note.objects.select_related("topic")
+            stale = sum(1 for note in notes.iterator() if options["all"] or note.embedding_is_stale())
+            self.stdout.write(self.style.WARNING(f"Would embed {stale} of {notes.count()} notes"))
+            return
+
+        result = embed_notes(force=options["all"])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Embedded {result.embedded} notes ({result.unchanged} already up to date)"
+        ))
+        if result.failed:
+            raise CommandError(f"{result.failed} notes could not be embedded; they stay queued for the next run")
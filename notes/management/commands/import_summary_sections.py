@@ -2,11 +2,9 @@
 import re
 import fitz  # PyMuPDF
 from django.core.management.base import BaseCommand
-from openai import OpenAI
+from notes.embedding_pipeline import embedding_queue
 from notes.models import Note
 
-client = OpenAI()
-
 class Command(BaseCommand):
     help = "Import Stats Summary into Notes by section (instead of page)"
 
@@ -65,15 +63,15 @@ class Command(BaseCommand):
             if len(body) < 50:
                 continue
 
-            embedding = client.embeddings.create(
-                model="text-embedding-3-large",
-                input=body
-            ).data[0].embedding
-
+            # Saving queues the note; the embeddings go out in batches below.
             Note.objects.update_or_create(
                 title=f"{topic} - {title}",
                 topic=topic,
-                defaults={"content": body, "embedding": embedding},
+                defaults={"content": body},
             )
 
         self.stdout.write(self.style.SUCCESS(f"✅ Imported {len(sections)} sections of {topic}"))
+
+        # ✅ 6. Embed the new/changed sections now rather than on exit
+        result = embedding_queue.flush()
+        self.stdout.write(f"Embedded {result.embedded} sections ({result.failed} failed)")
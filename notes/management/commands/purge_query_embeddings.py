@@ -0,0 +1,37 @@
+"""Delete cached question embeddings past QUERY_EMBEDDING_CACHE_TTL_DAYS.
+
+Expired rows are already ignored by lookups; this just stops the table
+growing without bound. Wire it to a daily scheduled task in production.
+
+    python manage.py purge_query_embeddings --dry-run
+    python manage.py purge_query_embeddings
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notes.models import QueryEmbedding
+
+
+class Command(BaseCommand):
+    help = "Delete cached query embeddings older than QUERY_EMBEDDING_CACHE_TTL_DAYS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report what would be deleted, delete nothing")
+
+    def handle(self, *args, **options):
+        ttl_days = getattr(settings, "QUERY_EMBEDDING_CACHE_TTL_DAYS", 30)
+        expired = QueryEmbedding.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=ttl_days)
+        )
+        count = expired.count()
+        if not count:
+            self.stdout.write("Nothing to delete")
+        elif options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"Would delete {count} expired query embeddings"))
+        else:
+            expired.delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {count} expired query embeddings"))
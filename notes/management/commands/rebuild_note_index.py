@@ -0,0 +1,87 @@
+"""
+Rebuild the note retrieval index from the database and check it.
+
+The embedding pipeline updates vectors as it re-embeds notes, so this is for
+deploys, restores from backup, bulk imports that bypassed Note.save(), and a
+change of embedding model:
+
+    python manage.py rebuild_note_index
+    python manage.py rebuild_note_index --verify-only
+
+Verification checks that every note with a usable embedding is in the index
+exactly once, that nothing else is, and that searching with each note's own
+vector finds that note first.
+"""
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.index import FaissNoteIndex, _load_note_vectors, get_note_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the note embedding index and verify it against the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify-only",
+            action="store_true",
+            help="Check the existing index without rebuilding it.",
+        )
+
+    def handle(self, *args, **options):
+        index = get_note_index()
+
+        if not options["verify_only"]:
+            if isinstance(index, FaissNoteIndex):
+                count = index.rebuild()
+                self.stdout.write(self.style.SUCCESS(f"✅ Wrote {count} vectors to {index.path}"))
+            else:
+                index.rebuild()
+                self.stdout.write(self.style.SUCCESS("✅ Rebuilt the in-memory note index"))
+
+        problems = self._verify(index)
+        if problems:
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(f"❌ {problem}"))
+            raise CommandError(f"Note index failed verification ({len(problems)} problem(s))")
+        self.stdout.write(self.style.SUCCESS("✅ Note index verified"))
+
+    def _verify(self, index):
+        blocks = _load_note_vectors()
+        if not blocks:
+            self.stdout.write("No notes have embeddings yet.")
+            return []
+
+        problems = []
+        if isinstance(index, FaissNoteIndex):
+            # Searching would quietly build a missing file, so check first.
+            if not index.path.exists():
+                return [f"No index file at {index.path}"]
+            faiss_index, _ = index._current()
+            if faiss_index is None:
+                return [f"Index is empty but {sum(len(r.ids) for r, _ in blocks.values())} notes have embeddings"]
+            if faiss_index.d not in blocks:
+                return [f"Index is {faiss_index.d}-dim but no note embedding is"]
+            rows, vectors = blocks[faiss_index.d]
+            if faiss_index.ntotal != len(rows.ids):
+                problems.append(
+                    f"Index holds {faiss_index.ntotal} vectors, database has {len(rows.ids)} notes"
+                )
+        else:
+            dim = max(blocks, key=lambda d: len(blocks[d][0].ids))
+            rows, vectors = blocks[dim]
+
+        missed = []
+        for note_id, vector in zip(rows.ids, vectors):
+            hits = index.search(vector, top_n=1)
+            # A duplicate note can legitimately win the tie at similarity 1.
+            if not hits or (hits[0][1] != note_id and not np.isclose(hits[0][0], 1.0, atol=1e-4)):
+                missed.append(int(note_id))
+
+        self.stdout.write(
+            f"Self-retrieval: {len(rows.ids) - len(missed)}/{len(rows.ids)} notes found themselves first"
+        )
+        if missed:
+            shown = ", ".join(map(str, missed[:20]))
+            problems.append(f"{len(missed)} notes not retrievable by their own vector (ids: {shown})")
+        return problems
@@ -1,15 +1,17 @@
 """
 Seed starter "how do I use NumScoil" notes for NumSkull's site-help mode.
 
-This is a management command, not a data migration, because Note.save()
-calls the OpenAI embeddings API live — coupling that to `migrate` would make
-deploys depend on network/API-key availability and cost tokens on every
-fresh install. Run once after deploying:
+This is a management command, not a data migration, because every new note
+has to be embedded through the OpenAI API — coupling that to `migrate` would
+make deploys depend on network/API-key availability and cost tokens on every
+fresh install. The notes are embedded together in batched requests once they
+are all saved. Run once after deploying:
 
     python manage.py seed_site_help_notes
 """
 from django.core.management.base import BaseCommand
 
+from notes.embedding_pipeline import embedding_queue
 from notes.models import Note
 
 STUDENT_NOTES = [
@@ -121,6 +123,12 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.SUCCESS(f"Created [{audience}]: {title}"))
                 created_count += 1
 
+        result = embedding_queue.flush()
+        if result.failed:
+            self.stdout.write(self.style.WARNING(
+                f"{result.failed} notes could not be embedded; run `manage.py embed_notes` to retry."
+            ))
+
         self.stdout.write(
             self.style.SUCCESS(f"\nDone. Created {created_count}, skipped {skipped_count}.")
         )
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-17 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0007_note_audience_alter_note_content_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='sha256 of the embedding model and normalised question text', max_length=64, unique=True)),
+                ('model', models.CharField(max_length=100)),
+                ('query_text', models.TextField(help_text='Normalised question text that was embedded')),
+                ('embedding', models.BinaryField(help_text='Packed float32 vector')),
+                ('dimensions', models.PositiveIntegerField()),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Query Embedding',
+                'verbose_name_plural': 'Query Embeddings',
+                'indexes': [models.Index(fields=['created_at'], name='notes_query_created_c62e2e_idx')],
+            },
+        ),
+    ]
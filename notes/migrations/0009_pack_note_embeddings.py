@@ -0,0 +1,85 @@
+# Generated by Django 5.2.7 on 2026-10-17 10:05
+#
+# Moves Note.embedding from a JSON list of floats to packed binary (see
+# notes/fields.py). The data step runs in batches so a large notes table is
+# never held in memory at once, and it is reversible. The question-embedding
+# cache moves to the same format; it is only a cache, so it is simply emptied.
+
+import json
+
+from django.db import migrations, models
+
+import notes.fields
+
+BATCH_SIZE = 200
+
+
+def pack_embeddings(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    batch = []
+    for note in Note.objects.exclude(embedding__isnull=True).only('id', 'embedding').iterator(chunk_size=BATCH_SIZE):
+        values = note.embedding
+        if isinstance(values, str):
+            values = json.loads(values)
+        if not values:
+            continue
+        note.embedding_packed = values
+        batch.append(note)
+        if len(batch) >= BATCH_SIZE:
+            Note.objects.bulk_update(batch, ['embedding_packed'])
+            batch = []
+    if batch:
+        Note.objects.bulk_update(batch, ['embedding_packed'])
+
+
+def clear_query_embeddings(apps, schema_editor):
+    apps.get_model('notes', 'QueryEmbedding').objects.all().delete()
+
+
+def unpack_embeddings(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    batch = []
+    for note in Note.objects.exclude(embedding_packed__isnull=True).only('id', 'embedding_packed').iterator(chunk_size=BATCH_SIZE):
+        note.embedding = [float(x) for x in note.embedding_packed]
+        batch.append(note)
+        if len(batch) >= BATCH_SIZE:
+            Note.objects.bulk_update(batch, ['embedding'])
+            batch = []
+    if batch:
+        Note.objects.bulk_update(batch, ['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0008_queryembedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='embedding_packed',
+            field=notes.fields.VectorField(blank=True, null=True),
+        ),
+        migrations.RunPython(pack_embeddings, unpack_embeddings),
+        migrations.RemoveField(
+            model_name='note',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='note',
+            old_name='embedding_packed',
+            new_name='embedding',
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='embedding',
+            field=notes.fields.VectorField(blank=True, help_text='Packed embedding vector (see notes/fields.py)', null=True),
+        ),
+        migrations.RunPython(clear_query_embeddings, clear_query_embeddings),
+        migrations.AlterField(
+            model_name='queryembedding',
+            name='embedding',
+            field=notes.fields.VectorField(),
+        ),
+    ]
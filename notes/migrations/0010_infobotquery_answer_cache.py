@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-17 13:05
+
+import django.db.models.deletion
+import notes.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0009_pack_note_embeddings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='infobotquery',
+            name='cache_evicted',
+            field=models.BooleanField(default=False, help_text='Never reuse this answer (set by a thumbs-down)'),
+        ),
+        migrations.AddField(
+            model_name='infobotquery',
+            name='cached_from',
+            field=models.ForeignKey(blank=True, help_text='The earlier query whose answer was reused for this one', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cache_hits', to='notes.infobotquery'),
+        ),
+        migrations.AddField(
+            model_name='infobotquery',
+            name='context_key',
+            field=models.CharField(blank=True, default='', help_text='Conversation scope: topic, question and part ids (or chat subject)', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='infobotquery',
+            name='query_embedding',
+            field=notes.fields.VectorField(blank=True, editable=False, help_text='Embedding of the question, set only on answers that may be reused', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='infobotquery',
+            index=models.Index(fields=['context_key', 'created_at'], name='notes_infob_context_a4d072_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0010_infobotquery_answer_cache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="note",
+            name="rendered_hash",
+            field=models.CharField(blank=True, editable=False, help_text="sha1 of the renderer and source text the HTML columns were rendered from", max_length=40),
+        ),
+        migrations.AddField(
+            model_name="note",
+            name="content_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
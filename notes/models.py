@@ -2,14 +2,13 @@
 from django.db import models
 from django.utils import timezone
 from django.conf import settings
-from openai import OpenAI
 import hashlib
 from interactive_lessons.models import Topic  # ✅ import Topic model
+from interactive_lessons.services.rendered_content import RenderedContent
+from .fields import VectorField
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
 
-
-class Note(models.Model):
+class Note(RenderedContent):
     CONTENT_TYPE_CHOICES = [
         ('general', 'General Note'),
         ('exam_paper', 'Exam Paper'),
@@ -40,9 +39,13 @@ class Note(models.Model):
     content = models.TextField()
     metadata = models.TextField(blank=True, null=True, help_text="Sample prompts or summary for embedding")
     image = models.FileField(upload_to="notes/", blank=True, null=True, help_text="Upload PDF or image file")
-    embedding = models.JSONField(null=True, blank=True)
+    embedding = VectorField(null=True, blank=True, help_text="Packed embedding vector (see notes/fields.py)")
     _content_hash = models.CharField(max_length=64, blank=True, null=True, editable=False)
 
+    # Rendered by save(); see interactive_lessons/services/rendered_content.py.
+    rendered_fields = {"content": "content_html"}
+    content_html = models.TextField(blank=True, editable=False)
+
     # Exam paper specific fields
     content_type = models.CharField(
         max_length=20,
@@ -109,8 +112,8 @@ class Note(models.Model):
 
         return content.strip()
 
-    def save(self, *args, **kwargs):
-        """Re-embed whenever title, topic, or metadata changes."""
+    def embedding_text(self):
+        """The text this note's embedding is computed from."""
         # Strategy: Combine title, topic, metadata AND cleaned content for richer embeddings
         topic_name = self.topic.name if self.topic else ""
 
@@ -126,23 +129,40 @@ class Note(models.Model):
         if cleaned_content:
             parts.append(f"Content: {cleaned_content}")
 
-        text_to_embed = "\n".join(parts)
+        return "\n".join(parts)
+
+    @staticmethod
+    def embedding_hash(text):
+        return hashlib.md5(text.encode()).hexdigest()
 
-        if text_to_embed.strip():
-            content_hash = hashlib.md5(text_to_embed.encode()).hexdigest()
+    def embedding_is_stale(self):
+        """True if the embedding is missing or was made from different text.
 
-            # Only regenerate embedding if text changed
-            if content_hash != self._content_hash:
-                print(f"🔄 Re-embedding note: {self.title}")
-                response = client.embeddings.create(
-                    model=settings.OPENAI_EMBED_MODEL,
-                    input=text_to_embed,
-                )
-                self.embedding = response.data[0].embedding
-                self._content_hash = content_hash
+        ``_content_hash`` is only written together with the embedding, so it
+        always describes the text the stored vector came from. A note with no
+        embedding text is never stale: there is nothing to embed.
+        """
+        text = self.embedding_text()
+        if not text.strip():
+            return False
+        if self.embedding is None:
+            return True
+        return self.embedding_hash(text) != self._content_hash
 
+    def save(self, *args, **kwargs):
+        """Queue a re-embed whenever title, topic, metadata or content changes.
+
+        The embeddings call happens out of band (notes/embedding_pipeline.py),
+        so saving never waits on OpenAI. Until the new vector is written the
+        note keeps its old one, or is not retrievable yet if it is new.
+        """
         super().save(*args, **kwargs)
 
+        if self.embedding_is_stale():
+            from .embedding_pipeline import embedding_queue
+            print(f"🔄 Re-embedding note: {self.title}")
+            embedding_queue.enqueue(self.pk)
+
     def __str__(self):
         return self.title
 
@@ -187,6 +207,35 @@ class InfoBotQuery(models.Model):
         help_text="Stored question text for context (in case question is later modified/deleted)"
     )
 
+    # Semantic answer cache (see notes/answer_cache.py)
+    context_key = models.CharField(
+        max_length=200,
+        blank=True,
+        default="",
+        help_text="Conversation scope: topic, question and part ids (or chat subject)"
+    )
+    query_embedding = VectorField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Embedding of the question, set only on answers that may be reused"
+    )
+    cached_from = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="cache_hits",
+        help_text="The earlier query whose answer was reused for this one"
+    )
+    cache_evicted = models.BooleanField(
+        default=False,
+        help_text="Never reuse this answer (set by a thumbs-down)"
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=['context_key', 'created_at'])]
+
     def __str__(self):
         return f"{self.topic_slug}: {self.question[:60]}"
 
@@ -224,3 +273,27 @@ class InfoBotFeedback(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.get_feedback_type_display()} - Query {self.query.id}"
+
+
+class QueryEmbedding(models.Model):
+    """A cached embedding of a normalised student question (see notes/embedding_cache.py)."""
+    key = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="sha256 of the embedding model and normalised question text"
+    )
+    model = models.CharField(max_length=100)
+    query_text = models.TextField(help_text="Normalised question text that was embedded")
+    embedding = VectorField()
+    dimensions = models.PositiveIntegerField()
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Query Embedding'
+        verbose_name_plural = 'Query Embeddings'
+        indexes = [models.Index(fields=['created_at'])]
+
+    def __str__(self):
+        return f"{self.query_text[:60]} ({self.hit_count} hits)"
@@ -0,0 +1,31 @@
+import logging
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .index import get_note_index
+from .lexical import get_lexical_index
+from .models import Note
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Note)
+def index_saved_note(sender, instance, **kwargs):
+    """Drop this worker's copy of the filter columns and keyword index.
+
+    The vector itself reaches the index once the embedding pipeline has
+    re-embedded the note (notes/embedding_pipeline.py), batched with any other
+    saves, so a save never rewrites the index file in the request.
+    """
+    get_lexical_index().invalidate()
+    get_note_index().invalidate()
+
+
+@receiver(post_delete, sender=Note)
+def unindex_deleted_note(sender, instance, **kwargs):
+    get_lexical_index().invalidate()
+    try:
+        get_note_index().note_deleted(instance.pk)
+    except Exception:
+        logger.exception("Could not remove note %s from the note index", instance.pk)
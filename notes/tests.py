@@ -1,18 +1,58 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import patch
 
+import httpx
 import numpy as np
-from django.test import TestCase
+import openai
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
-from notes.models import Note
-from notes.utils import search_similar
+from notes.embedding_cache import query_embedding_cache
+from notes.embedding_pipeline import EmbeddingQueue, embed_notes
+from notes.fields import HEADER_SIZE, pack_vector, unpack_vector
+from notes.helpers.match_note import match_note
+from notes.index import FaissNoteIndex, get_note_index
+from notes.lexical import get_lexical_index, tokenize
+from notes.models import Note, QueryEmbedding
+from notes.utils import get_query_embedding, search_hybrid, search_similar
 
 FAKE_VEC = [1.0, 0.0, 0.0]
 
 
-class SearchSimilarScopingTests(TestCase):
+class IndexedNotesMixin:
+    """Point the note index at a throwaway file and rebuild it on demand.
+
+    bulk_create sends no post_save, and test rollbacks send nothing at all,
+    so tests that create notes that way rebuild the index by hand.
+    """
+    backend = "faiss"
+
+    def setUp(self):
+        super().setUp()
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir, ignore_errors=True)
+        overrides = override_settings(
+            NOTE_INDEX_BACKEND=self.backend,
+            NOTE_FAISS_INDEX_PATH=Path(index_dir) / "notes.faiss",
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.reindex()
+
+    def reindex(self):
+        get_note_index().rebuild()
+
+
+class SearchSimilarScopingTests(IndexedNotesMixin, TestCase):
     """
-    Note.save() calls the OpenAI embeddings API live, so these tests create
-    notes via bulk_create (bypassing save()) with a hand-set embedding, and
+    Note.save() queues the note to be embedded through the OpenAI API, so these
+    tests create notes via bulk_create (bypassing save()) with a hand-set embedding, and
     patch get_query_embedding so no real API call happens either.
     """
 
@@ -60,3 +100,413 @@ class SearchSimilarScopingTests(TestCase):
         with patch("notes.utils.get_query_embedding", return_value=np.array(FAKE_VEC, dtype=np.float32)):
             results = search_similar("anything", content_type="site_help", audience="student")
         self.assertEqual(results, [])
+
+
+class NoteIndexTests(IndexedNotesMixin, TestCase):
+    """The index has to rank exactly as per-note cosine similarity did."""
+
+    def _note(self, title, embedding, **kwargs):
+        return Note(title=title, content="c", embedding=embedding, **kwargs)
+
+    def test_ranks_by_cosine_similarity_best_first(self):
+        Note.objects.bulk_create([
+            self._note("Exact", [2.0, 0.0, 0.0]),        # same direction, longer
+            self._note("Close", [1.0, 1.0, 0.0]),
+            self._note("Orthogonal", [0.0, 0.0, 5.0]),
+            self._note("Opposite", [-1.0, 0.0, 0.0]),
+        ])
+        self.reindex()
+        with patch("notes.utils.get_query_embedding", return_value=np.array(FAKE_VEC, dtype=np.float32)):
+            results = search_similar("q", top_n=3)
+
+        self.assertEqual([n.title for _, n in results], ["Exact", "Close", "Orthogonal"])
+        self.assertAlmostEqual(results[0][0], 1.0, places=5)
+        self.assertAlmostEqual(results[1][0], 2 ** -0.5, places=5)
+        self.assertAlmostEqual(results[2][0], 0.0, places=5)
+
+    def test_skips_unusable_and_mismatched_embeddings(self):
+        Note.objects.bulk_create([
+            self._note("Good", [1.0, 0.0, 0.0]),
+            self._note("Empty", []),
+            self._note("Zero", [0.0, 0.0, 0.0]),
+            self._note("Wrong dimension", [1.0, 0.0]),
+        ])
+        self.reindex()
+        with patch("notes.utils.get_query_embedding", return_value=np.array(FAKE_VEC, dtype=np.float32)):
+            results = search_similar("q")
+        self.assertEqual([n.title for _, n in results], ["Good"])
+
+    def test_topic_filter_matches_title_or_topic_name(self):
+        Note.objects.bulk_create([
+            self._note("Probability rules", [1.0, 0.0, 0.0]),
+            self._note("Calculus basics", [1.0, 0.0, 0.0]),
+        ])
+        self.reindex()
+        with patch("notes.utils.get_query_embedding", return_value=np.array(FAKE_VEC, dtype=np.float32)):
+            results = search_similar("q", topic="probability")
+        self.assertEqual([n.title for _, n in results], ["Probability rules"])
+
+    def test_delete_invalidates_the_index(self):
+        Note.objects.bulk_create([self._note("Doomed", [1.0, 0.0, 0.0])])
+        self.reindex()
+        with patch("notes.utils.get_query_embedding", return_value=np.array(FAKE_VEC, dtype=np.float32)):
+            self.assertEqual(len(search_similar("q")), 1)
+            Note.objects.get(title="Doomed").delete()
+            self.assertEqual(search_similar("q"), [])
+
+    @override_settings(NOTE_EMBED_ASYNC=False)
+    def test_save_adds_and_replaces_the_notes_vector(self):
+        embeddings = SimpleNamespace(create=lambda **kw: SimpleNamespace(
+            data=[SimpleNamespace(index=0, embedding=self.next_embedding)]
+        ))
+        query = np.array(FAKE_VEC, dtype=np.float32)
+        with patch("notes.embedding_pipeline.client", SimpleNamespace(embeddings=embeddings)), \
+                patch("notes.utils.get_query_embedding", return_value=query):
+            self.next_embedding = [1.0, 0.0, 0.0]
+            note = Note.objects.create(title="Live", content="first draft")
+            self.assertEqual([n.title for _, n in search_similar("q")], ["Live"])
+
+            self.next_embedding = [0.0, 1.0, 0.0]
+            note.content = "rewritten"
+            note.save()
+            results = search_similar("q")
+
+        self.assertEqual(len(results), 1)
+        self.assertAlmostEqual(results[0][0], 0.0, places=5)
+
+
+class MatrixNoteIndexTests(NoteIndexTests):
+    """The same behaviour from the in-memory fallback index."""
+    backend = "matrix"
+
+
+class FaissNoteFileTests(IndexedNotesMixin, TestCase):
+    """When the index file is written, and when it is left alone."""
+
+    def search(self):
+        with patch("notes.utils.get_query_embedding", return_value=np.array(FAKE_VEC, dtype=np.float32)):
+            return search_similar("q")
+
+    def test_an_empty_index_is_not_rebuilt_on_every_search(self):
+        index = get_note_index()
+        self.assertEqual(index.path.stat().st_size, 0)
+        with patch("notes.index._load_note_vectors") as load:
+            self.assertEqual(self.search(), [])
+            self.assertEqual(self.search(), [])
+            Note(pk=999, title="Never indexed").delete()
+        load.assert_not_called()
+
+        note = Note.objects.bulk_create([Note(title="First", content="c", embedding=FAKE_VEC)])[0]
+        index.notes_saved([note])
+        self.assertEqual([n.title for _, n in self.search()], ["First"])
+
+    def test_saving_a_note_does_not_write_the_file(self):
+        note = Note.objects.bulk_create([Note(title="Draft", content="c", embedding=FAKE_VEC)])[0]
+        self.reindex()
+        self.assertEqual([n.content_type for _, n in self.search()], ["general"])
+        version = get_note_index()._file_version()
+
+        with self.captureOnCommitCallbacks():   # the embedding queue never runs
+            note.content_type = "site_help"
+            note.save()
+        self.assertEqual(get_note_index()._file_version(), version)
+        # The filter columns still follow the edit.
+        with patch("notes.utils.get_query_embedding", return_value=np.array(FAKE_VEC, dtype=np.float32)):
+            self.assertEqual(search_similar("q", content_type="general"), [])
+
+
+class LexicalRetrievalTests(IndexedNotesMixin, TestCase):
+    """Keyword matches answer without an embedding; weaker ones are fused."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Note.objects.bulk_create([
+            Note(title="Median", metadata="What is the median? How do I find the middle value?",
+                 content="The median is the middle value of an ordered data set. For an even "
+                         "count, average the two middle values.",
+                 embedding=[0.0, 1.0, 0.0]),
+            Note(title="Mean", metadata="What is the mean? How do I calculate the average?",
+                 content="The mean is the sum of the values divided by how many there are.",
+                 embedding=[1.0, 0.0, 0.0]),
+            Note(title="Box plots", content="A box plot shows the minimum, lower quartile, "
+                                            "median, upper quartile and maximum.",
+                 embedding=[0.0, 0.0, 1.0]),
+        ])
+
+    def setUp(self):
+        super().setUp()
+        get_lexical_index().invalidate()
+
+    def test_tokenize_drops_stopwords_and_plurals(self):
+        self.assertEqual(tokenize("What are the Quartiles of x?"), ["quartile", "x"])
+
+    def test_definitional_question_needs_no_embedding(self):
+        with patch("notes.utils.get_query_embedding", side_effect=AssertionError("no network")):
+            note, confidence, scored = match_note("What is the median?")
+        self.assertEqual(note.title, "Median")
+        self.assertGreaterEqual(confidence, 0.8)
+
+    def test_weak_keyword_match_is_fused_with_vector_scores(self):
+        query_vec = np.array([1.0, 0.0, 0.0], dtype=np.float32)   # points at "Mean"
+        with patch("notes.utils.get_query_embedding", return_value=query_vec) as embed:
+            scored, lexical_only = search_hybrid("median versus mean for skewed data", top_n=3)
+
+        embed.assert_called_once()
+        self.assertFalse(lexical_only)
+        scores = {n.title: score for score, n in scored}
+        self.assertEqual(scored[0][1].title, "Mean")
+        self.assertAlmostEqual(scores["Mean"], 1.0, places=5)
+        # Orthogonal to the query, but it shares keywords: it still ranks.
+        self.assertGreater(scores["Median"], scores.get("Box plots", 0.0))
+        self.assertLess(scores["Median"], 0.35)
+
+    def test_falls_back_to_keywords_when_embedding_fails(self):
+        with patch("notes.utils.get_query_embedding", side_effect=TimeoutError):
+            scored, lexical_only = search_hybrid("quartile box plot whiskers")
+        self.assertFalse(lexical_only)
+        self.assertEqual(scored[0][1].title, "Box plots")
+
+    def test_saving_a_note_refreshes_the_keyword_index(self):
+        get_lexical_index().search("histogram")   # build it
+        with override_settings(NOTE_EMBED_ASYNC=True), self.captureOnCommitCallbacks():
+            Note.objects.create(title="Histograms", content="A histogram groups data into classes.")
+        hits = get_lexical_index().search("histogram")
+        self.assertEqual(len(hits), 1)
+
+
+class RebuildNoteIndexCommandTests(IndexedNotesMixin, TestCase):
+
+    def test_rebuild_writes_and_verifies_every_note(self):
+        Note.objects.bulk_create([
+            Note(title=f"Note {i}", content="c", embedding=list(np.eye(4)[i % 4] + i))
+            for i in range(8)
+        ])
+        out = StringIO()
+        call_command("rebuild_note_index", stdout=out)
+
+        index = get_note_index()
+        self.assertIsInstance(index, FaissNoteIndex)
+        self.assertTrue(index.path.exists())
+        self.assertIn("8/8 notes found themselves first", out.getvalue())
+
+    def test_verify_only_reports_notes_missing_from_the_index(self):
+        Note.objects.bulk_create([Note(title="Indexed", content="c", embedding=FAKE_VEC)])
+        self.reindex()
+        # bulk_create skips the signal, so this one never reaches the index
+        Note.objects.bulk_create([Note(title="Unindexed", content="c", embedding=[0.0, 1.0, 0.0])])
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("rebuild_note_index", "--verify-only", stdout=out)
+        self.assertIn("Index holds 1 vectors, database has 2 notes", out.getvalue())
+
+
+def _api_error(cls, status):
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    return cls("error", response=httpx.Response(status, request=request), body=None)
+
+
+class EmbeddingPipelineTests(IndexedNotesMixin, TestCase):
+    """Notes are embedded in batches, out of band, and only when stale."""
+
+    def setUp(self):
+        super().setUp()
+        self.requests = []
+        self.failures = []   # exceptions to raise, one per upcoming request
+
+        def create(model, input):
+            self.requests.append(list(input))
+            if self.failures:
+                raise self.failures.pop(0)
+            if any("poison" in text for text in input):
+                raise _api_error(openai.BadRequestError, 400)
+            # Reply out of order: results must be matched up by index.
+            return SimpleNamespace(data=[
+                SimpleNamespace(index=i, embedding=[1.0, float(i), 0.0])
+                for i in reversed(range(len(input)))
+            ])
+
+        patcher = patch("notes.embedding_pipeline.client",
+                        SimpleNamespace(embeddings=SimpleNamespace(create=create)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _notes(self, count, **kwargs):
+        return Note.objects.bulk_create([
+            Note(title=f"Note {i}", content=f"content {i}", **kwargs) for i in range(count)
+        ])
+
+    @override_settings(NOTE_EMBED_BATCH_SIZE=3, NOTE_EMBED_CONCURRENCY=2)
+    def test_stale_notes_are_embedded_in_batches(self):
+        self._notes(7)
+
+        result = embed_notes()
+
+        self.assertEqual(result.embedded, 7)
+        self.assertEqual(sorted(len(batch) for batch in self.requests), [1, 3, 3])
+        for note in Note.objects.all():
+            self.assertFalse(note.embedding_is_stale())
+            # Each note got the vector for its own position in the request.
+            batch = next(b for b in self.requests if note.embedding_text() in b)
+            self.assertEqual(note.embedding[1], batch.index(note.embedding_text()))
+        with patch("notes.utils.get_query_embedding", return_value=np.array(FAKE_VEC, dtype=np.float32)):
+            self.assertEqual(len(search_similar("q", top_n=10)), 7)
+
+    def test_unchanged_notes_are_not_sent_again(self):
+        self._notes(2)
+        embed_notes()
+        self.requests.clear()
+
+        note = Note.objects.get(title="Note 0")
+        note.content = "edited"
+        Note.objects.bulk_update([note], ["content"])
+        result = embed_notes()
+
+        self.assertEqual((result.embedded, result.unchanged), (1, 1))
+        self.assertEqual(len(self.requests), 1)
+
+    @patch("notes.embedding_pipeline.time.sleep")
+    def test_transient_errors_are_retried(self, sleep):
+        self._notes(2)
+        self.failures = [_api_error(openai.RateLimitError, 429), _api_error(openai.InternalServerError, 500)]
+
+        result = embed_notes()
+
+        self.assertEqual((result.embedded, result.failed), (2, 0))
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_a_rejected_note_does_not_sink_its_batch(self):
+        self._notes(3)
+        Note.objects.filter(title="Note 1").update(content="poison")
+
+        result = embed_notes()
+
+        self.assertEqual((result.embedded, result.failed), (2, 1))
+        self.assertTrue(Note.objects.get(title="Note 1").embedding_is_stale())
+        self.assertEqual(Note.objects.filter(embedding__isnull=True).count(), 1)
+
+    def test_save_queues_instead_of_calling_the_api(self):
+        queue = EmbeddingQueue()
+        with patch("notes.embedding_pipeline.embedding_queue", queue), \
+                patch("notes.embedding_pipeline.threading.Thread"), \
+                self.captureOnCommitCallbacks(execute=True):
+            note = Note.objects.create(title="Queued", content="c")
+
+        self.assertEqual(self.requests, [])
+        self.assertEqual(queue.pending(), {note.pk})
+
+        result = queue.flush()
+
+        self.assertEqual(result.embedded, 1)
+        self.assertEqual(queue.pending(), set())
+        self.assertFalse(Note.objects.get(pk=note.pk).embedding_is_stale())
+
+    def test_notes_with_no_embedding_text_are_skipped(self):
+        queue = EmbeddingQueue()
+        with patch.object(Note, "embedding_text", return_value="  "), \
+                patch("notes.embedding_pipeline.embedding_queue", queue), \
+                self.captureOnCommitCallbacks(execute=True):
+            note = Note.objects.create(title="Blank", content="")
+            self.assertFalse(note.embedding_is_stale())
+            self.assertEqual(queue.pending(), set())
+            self.assertEqual(embed_notes(force=True).embedded, 0)
+        self.assertEqual(self.requests, [])
+
+    def test_embed_notes_command(self):
+        self._notes(2)
+        out = StringIO()
+        call_command("embed_notes", "--dry-run", stdout=out)
+        self.assertIn("Would embed 2 of 2 notes", out.getvalue())
+        self.assertEqual(self.requests, [])
+
+        call_command("embed_notes", stdout=out)
+        self.assertIn("Embedded 2 notes", out.getvalue())
+
+
+class QueryEmbeddingCacheTests(TestCase):
+    """Repeated questions must not go back to OpenAI for an embedding."""
+
+    def setUp(self):
+        query_embedding_cache.clear()
+        self.addCleanup(query_embedding_cache.clear)
+        self.calls = []
+
+        def create(model, input, **kwargs):
+            self.calls.append(input)
+            return SimpleNamespace(data=[SimpleNamespace(embedding=[0.5, 0.25, 0.125])])
+
+        patcher = patch("notes.utils.client", SimpleNamespace(embeddings=SimpleNamespace(create=create)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeat_question_is_served_from_memory(self):
+        first = get_query_embedding("What is the mean?")
+        again = get_query_embedding("  what IS the   mean? ")
+
+        self.assertEqual(len(self.calls), 1)
+        np.testing.assert_array_equal(first, again)
+        self.assertEqual(again.dtype, np.float32)
+
+    def test_another_worker_is_served_from_the_table(self):
+        get_query_embedding("What is the mean?")
+        query_embedding_cache.clear()   # as if a different process asked
+
+        vector = get_query_embedding("what is the mean?")
+
+        self.assertEqual(len(self.calls), 1)
+        np.testing.assert_allclose(vector, [0.5, 0.25, 0.125])
+        self.assertEqual(QueryEmbedding.objects.get().hit_count, 1)
+
+    def test_expired_entries_are_embedded_again(self):
+        get_query_embedding("What is the mean?")
+        QueryEmbedding.objects.update(created_at=timezone.now() - timedelta(days=365))
+        query_embedding_cache.clear()
+
+        get_query_embedding("What is the mean?")
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(QueryEmbedding.objects.count(), 1)
+
+    def test_key_includes_the_model(self):
+        get_query_embedding("What is the mean?")
+        with patch("notes.utils.EMBED_MODEL", "some-other-model"):
+            get_query_embedding("What is the mean?")
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(QueryEmbedding.objects.count(), 2)
+
+    def test_purge_command_removes_expired_rows(self):
+        get_query_embedding("What is the mean?")
+        get_query_embedding("What is the median?")
+        QueryEmbedding.objects.filter(query_text__contains="median").update(
+            created_at=timezone.now() - timedelta(days=365)
+        )
+        call_command("purge_query_embeddings", stdout=StringIO())
+        self.assertEqual(
+            list(QueryEmbedding.objects.values_list("query_text", flat=True)),
+            ["what is the mean?"],
+        )
+
+
+class VectorFieldTests(TestCase):
+    """Note.embedding is stored packed and read back as a NumPy view."""
+
+    def test_round_trip_returns_float32_array(self):
+        Note.objects.bulk_create([Note(title="Packed", content="c", embedding=[0.1, -2.5, 3.0])])
+        embedding = Note.objects.get(title="Packed").embedding
+
+        self.assertIsInstance(embedding, np.ndarray)
+        self.assertEqual(embedding.dtype, np.float32)
+        np.testing.assert_allclose(embedding, [0.1, -2.5, 3.0], rtol=1e-6)
+
+    @override_settings(NOTE_EMBEDDING_DTYPE="float16")
+    def test_float16_storage_halves_the_bytes(self):
+        self.assertEqual(len(pack_vector([1.0] * 1536)), HEADER_SIZE + 1536 * 2)
+        Note.objects.bulk_create([Note(title="Half", content="c", embedding=[0.5, 0.25])])
+        embedding = Note.objects.get(title="Half").embedding
+
+        self.assertEqual(embedding.dtype, np.float16)
+        np.testing.assert_array_equal(embedding, [0.5, 0.25])
+
+    def test_rejects_bytes_that_are_not_a_packed_vector(self):
+        with self.assertRaises(ValueError):
+            unpack_vector(b"[1.0, 2.0]")
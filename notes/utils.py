@@ -1,21 +1,35 @@
 import numpy as np
-from openai import OpenAI
-from django.db.models import Q
 from notes.models import Note
+from notes.index import get_note_index
+from notes.lexical import get_lexical_index, is_confident
+from notes.embedding_cache import normalise_query, query_embedding_cache
 from django.conf import settings
-from sklearn.metrics.pairwise import cosine_similarity
+from core.lazy import lazy_openai_client
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+client = lazy_openai_client(api_key=settings.OPENAI_API_KEY)
 EMBED_MODEL = getattr(settings, "OPENAI_EMBED_MODEL", "text-embedding-3-small")
 
 
-def get_query_embedding(text: str):
-    """Create an embedding for the user's question, matching note context."""
-    query_text = f"Student question about Leaving Cert Maths:\n{text.strip()}"
-    resp = client.embeddings.create(model=EMBED_MODEL, input=query_text)
+def _embed_query(text: str):
+    query_text = f"Student question about Leaving Cert Maths:\n{text}"
+    # A slow provider should cost a few seconds, not the request: callers fall
+    # back to lexical retrieval when this gives up.
+    resp = client.embeddings.create(
+        model=EMBED_MODEL, input=query_text,
+        timeout=getattr(settings, "QUERY_EMBEDDING_TIMEOUT", 5.0),
+    )
     return np.array(resp.data[0].embedding, dtype=np.float32)
 
 
+def get_query_embedding(text: str):
+    """Create an embedding for the user's question, matching note context.
+
+    Questions repeat constantly, so this goes through the two-level cache in
+    notes/embedding_cache.py and only reaches OpenAI on a miss.
+    """
+    return query_embedding_cache.get_or_compute(normalise_query(text), EMBED_MODEL, _embed_query)
+
+
 def search_similar(query, topic=None, top_n=5, content_type=None, audience=None):
     """
     Retrieve the most relevant notes for a given query.
@@ -34,59 +48,78 @@ def search_similar(query, topic=None, top_n=5, content_type=None, audience=None)
         print(f"⚠️ Embedding unavailable, skipping retrieval: {e}")
         return []
 
-    # --- 2️⃣ Get candidate notes ---
-    notes = Note.objects.exclude(embedding__isnull=True)
-
-    if content_type:
-        notes = notes.filter(content_type=content_type)
-
-    if audience:
-        notes = notes.filter(Q(audience='all') | Q(audience=audience))
-
-    if topic:
-        topic_normalized = topic.replace("-", " ").lower()
-        notes = notes.filter(
-            Q(topic__name__icontains=topic_normalized)
-            | Q(title__icontains=topic_normalized)
-            | Q(topic__name__icontains="statistics")  # fallback for general stats
-        ).distinct()
-
-    # --- 3️⃣ Compute cosine similarities ---
-    scored = []
-    for note in notes:
-        try:
-            vec = np.array(note.embedding, dtype=np.float32)
-            if vec.size == 0 or np.isnan(vec).any():
-                continue
-
-            # Handle vector dimension mismatches gracefully
-            if vec.size != query_vec.size:
-                print(f"⚠️ Skipping {note.title}: dim mismatch {vec.size} vs {query_vec.size}")
-                continue
-
-            # Compute cosine similarity via sklearn
-            sim = cosine_similarity([query_vec], [vec])[0][0]
-            if np.isnan(sim):
-                continue
+    # --- 2️⃣ Score every candidate note in one pass over the index ---
+    # Filtering by content_type/audience/topic happens inside the index, on
+    # the same fields the old queryset filtered on (see notes/index.py).
+    hits = get_note_index().search(
+        query_vec, top_n=top_n, content_type=content_type, audience=audience, topic=topic,
+    )
 
-            scored.append((float(sim), note))
-
-        except Exception as e:
-            print(f"⚠️ Error computing sim for {note.title}: {e}")
-            continue
-
-    # --- 4️⃣ Sort by relevance and apply fallback if needed ---
-    scored.sort(reverse=True, key=lambda x: x[0])
+    # --- 3️⃣ Load only the winning notes ---
+    # A note deleted since the index was built simply drops out.
+    notes = Note.objects.in_bulk([note_id for _, note_id in hits])
+    scored = [(score, notes[note_id]) for score, note_id in hits if note_id in notes]
 
     # No relevant notes is a valid answer: returning unrelated ones (the old
     # "fall back to statistics notes" behaviour) only fed the model noise.
 
-    # --- 5️⃣ Debug log ---
+    # --- 4️⃣ Debug log ---
     if scored:
         print("🔍 RAG retrieved:")
-        for s, n in scored[:top_n]:
+        for s, n in scored:
             print(f"   {n.title} → {s:.3f}")
     else:
         print("🔍 RAG found no relevant notes.")
 
-    return scored[:top_n]
+    return scored
+
+
+def search_hybrid(query, topic=None, top_n=5, content_type=None, audience=None, vector_query=None):
+    """
+    Keyword (BM25) and embedding retrieval combined. Returns (scored, lexical_only)
+    where scored is [(score, note)], best first.
+
+    When one note is a clear keyword winner (lexical.is_confident) it is
+    returned at once, scored by BM25, with lexical_only=True and no network
+    call. Otherwise both rankings are merged: a note's score is its cosine
+    similarity pulled towards 1 by NOTE_LEXICAL_WEIGHT of its keyword score,
+    so keyword evidence only ever adds to a vector match and scores stay on
+    the cosine scale FAQ_MATCH_THRESHOLD and RAG_CONTEXT_MIN_SCORE expect.
+    If the query can't be embedded, the keyword ranking is used on its own.
+
+    ``vector_query`` is the text to embed, if it should differ from ``query``
+    (match_note adds question context to it); keywords always come from ``query``.
+    """
+    filters = {"topic": topic, "content_type": content_type, "audience": audience}
+    lexical = get_lexical_index().search(query, top_n=max(top_n, 2), **filters)
+
+    if is_confident(lexical):
+        notes = Note.objects.in_bulk([lexical[0][1]])
+        if notes:
+            print(f"🔤 Lexical match ({lexical[0][0]:.3f}), no embedding needed")
+            return [(lexical[0][0], notes[lexical[0][1]])], True
+
+    keyword = {note_id: score for score, note_id in lexical}
+    cosine = {}
+    try:
+        query_vec = get_query_embedding(vector_query or query)
+    except Exception as e:
+        print(f"⚠️ Embedding unavailable, using keyword retrieval only: {e}")
+    else:
+        index = get_note_index()
+        hits = index.search(query_vec, top_n=top_n, **filters)
+        # Keyword hits the vector top-n missed still need their cosine score.
+        missing = set(keyword) - {note_id for _, note_id in hits}
+        if missing:
+            hits += index.search(query_vec, top_n=len(missing), note_ids=missing, **filters)
+        cosine = {note_id: score for score, note_id in hits}
+
+    weight = getattr(settings, "NOTE_LEXICAL_WEIGHT", 0.35)
+    fused = {}
+    for note_id in set(cosine) | set(keyword):
+        base = max(cosine.get(note_id, 0.0), 0.0)
+        fused[note_id] = base + weight * keyword.get(note_id, 0.0) * (1 - base)
+
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_n]
+    notes = Note.objects.in_bulk([note_id for note_id, _ in ranked])
+    return [(score, notes[note_id]) for note_id, score in ranked if note_id in notes], False
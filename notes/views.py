@@ -2,6 +2,7 @@
 from django.shortcuts import render, get_list_or_404
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from interactive_lessons.services.rendered_content import prerender
 from .models import Note
 import json
 
@@ -33,8 +34,6 @@ def notes_index(request):
 def notes_topic(request, topic_name):
     """Display all notes for a given topic (by name or ID)."""
     from interactive_lessons.models import Topic
-    import markdown
-    from markdown_katex import KatexExtension
 
     # Try to get topic by ID first, then by name/slug
     try:
@@ -54,15 +53,9 @@ def notes_topic(request, topic_name):
         from django.http import Http404
         raise Http404(f"No study resources found for {topic.name}")
 
-    # Render markdown content for each note
-    for note in notes:
-        if note.content:
-            note.content_html = markdown.markdown(
-                note.content,
-                extensions=["extra", "fenced_code", "tables", KatexExtension()],
-            )
-        else:
-            note.content_html = ""
+    # content_html is stored rendered; this only renders notes saved without it
+    for note in prerender(notes):
+        note.content_html = note.rendered_html["content"]
 
     return render(request, "notes/topic_notes.html", {
         "topic_name": topic.name,
@@ -1,3 +1,47 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+
+from core.models import Subject
+from interactive_lessons.models import Question, QuestionPart, Topic
+from students.models import QuestionAttempt
+from .models import QuickKick, QuickKickView
+
+
+class QuickKickAnswerTests(TestCase):
+    """Only marked answers count towards progress and the QuickKickView."""
+
+    @classmethod
+    def setUpTestData(cls):
+        subject, _ = Subject.objects.get_or_create(name="Maths", defaults={"slug": "maths"})
+        cls.topic = Topic.objects.create(subject=subject, name="Algebra")
+        question = Question.objects.create(topic=cls.topic)
+        cls.part = QuestionPart.objects.create(question=question, prompt="Simplify", answer="x")
+        cls.quickkick = QuickKick.objects.create(
+            title="Simplifying", topic=cls.topic, content_type="geogebra", geogebra_code="abc123", question=question,
+        )
+        cls.student = User.objects.create_user("niamh")
+
+    def answer(self, result):
+        self.client.force_login(self.student)
+        with patch("quickkicks.views.grade_submission", return_value=result):
+            return self.client.post(
+                reverse("quickkicks:quickkick_view", args=[self.topic.slug, self.quickkick.id]),
+                {"part_id": self.part.id, f"answer_{self.part.id}": "9^9^9^9"},
+                HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            )
+
+    def test_timed_out_answer_is_not_an_attempt(self):
+        response = self.answer({"score": 0, "is_correct": False, "unverified": True, "feedback": "Try again."})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(QuestionAttempt.objects.exists())
+        view_record = QuickKickView.objects.get(user=self.student)
+        self.assertEqual((view_record.answer_submitted, view_record.attempts), (False, 0))
 
-# Create your tests here.
+    def test_marked_answer_is_recorded(self):
+        self.answer({"score": 100, "is_correct": True, "feedback": "Correct."})
+        self.assertEqual(QuestionAttempt.objects.get().score_awarded, 100)
+        view_record = QuickKickView.objects.get(user=self.student)
+        self.assertEqual((view_record.answer_submitted, view_record.answer_correct, view_record.attempts), (True, True, 1))
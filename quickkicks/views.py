@@ -8,7 +8,7 @@ from django.utils.safestring import mark_safe
 import markdown
 from interactive_lessons.models import Topic
 from interactive_lessons.services.marking import grade_submission
-from interactive_lessons.views import render_math_markdown
+from interactive_lessons.services.rendered_content import prerender
 from students.models import QuestionAttempt
 from .models import QuickKick, QuickKickView
 
@@ -94,31 +94,35 @@ def quickkick_view(request, topic_slug, quickkick_id):
                 ) or {}
 
                 results[part.id] = result
-                completed_parts.add(part.id)
-
-                # Save attempt for progress tracking
-                try:
-                    QuestionAttempt.objects.create(
-                        student=request.user.studentprofile,
-                        question=part.question,
-                        question_part=part,
-                        student_answer=answer,
-                        score_awarded=result.get("score", 0),
-                        is_correct=result.get("is_correct", False),
-                    )
-                except Exception as e:
-                    print(f"[Progress Tracking Error] {e}")
-
-                # Update QuickKickView tracking
-                try:
-                    view_record.answer_submitted = True
-                    view_record.answer_correct = result.get("is_correct", False)
-                    view_record.score_awarded = result.get("score", 0)
-                    view_record.attempts += 1
-                    view_record.last_attempt_at = timezone.now()
-                    view_record.save()
-                except Exception as e:
-                    print(f"[QuickKickView Tracking Error] {e}")
+
+                # An answer that timed out was never marked, so it is not an
+                # attempt: neither progress nor the QuickKickView counts it.
+                if not result.get("unverified"):
+                    completed_parts.add(part.id)
+
+                    # Save attempt for progress tracking
+                    try:
+                        QuestionAttempt.objects.create(
+                            student=request.user.studentprofile,
+                            question=part.question,
+                            question_part=part,
+                            student_answer=answer,
+                            score_awarded=result.get("score", 0),
+                            is_correct=result.get("is_correct", False),
+                        )
+                    except Exception as e:
+                        print(f"[Progress Tracking Error] {e}")
+
+                    # Update QuickKickView tracking
+                    try:
+                        view_record.answer_submitted = True
+                        view_record.answer_correct = result.get("is_correct", False)
+                        view_record.score_awarded = result.get("score", 0)
+                        view_record.attempts += 1
+                        view_record.last_attempt_at = timezone.now()
+                        view_record.save()
+                    except Exception as e:
+                        print(f"[QuickKickView Tracking Error] {e}")
 
                 # AJAX JSON feedback response
                 if request.headers.get("x-requested-with") == "XMLHttpRequest":
@@ -129,14 +133,15 @@ def quickkick_view(request, topic_slug, quickkick_id):
                         "hint": result.get("hint", ""),
                     })
 
-    # Render question and part content (Math/KaTeX compatible)
-    question.hint = render_math_markdown(question.hint)
+    # Render question and part content (Math/KaTeX compatible), all at once
+    prerender([question, *parts])
+    question.hint = question.rendered_html["hint"]
     for part in parts:
-        part.prompt = render_math_markdown(part.prompt)
-        part.expected_format = render_math_markdown(part.expected_format or "")
-        part.solution = render_math_markdown(part.solution or "")
+        part.prompt = part.rendered_html["prompt"]
+        part.expected_format = part.rendered_html["expected_format"]
+        part.solution = part.rendered_html["solution"]
 
-    question.solution = render_math_markdown(question.solution or "")
+    question.solution = question.rendered_html["solution"]
 
     # Check if all parts were completed
     all_parts_answered = all(
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("revision", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="revisionsection",
+            name="rendered_hash",
+            field=models.CharField(blank=True, editable=False, help_text="sha1 of the renderer and source text the HTML columns were rendered from", max_length=40),
+        ),
+        migrations.AddField(
+            model_name="revisionsection",
+            name="text_content_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
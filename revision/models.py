@@ -1,6 +1,8 @@
 from django.db import models
 from django.utils.text import slugify
 
+from interactive_lessons.services.rendered_content import RenderedContent
+
 
 class RevisionModule(models.Model):
     """Main revision module for a topic"""
@@ -30,7 +32,7 @@ class RevisionModule(models.Model):
         return self.topic.slug
 
 
-class RevisionSection(models.Model):
+class RevisionSection(RenderedContent):
     """Individual sections within a revision module"""
     module = models.ForeignKey(
         RevisionModule,
@@ -45,6 +47,11 @@ class RevisionSection(models.Model):
         blank=True,
         help_text="Main content - supports Markdown and LaTeX (use $...$ for inline math, $$...$$ for display math)"
     )
+    # Rendered by save(); see interactive_lessons/services/rendered_content.py.
+    # The page shows this text with the linebreaks filter, so that is the renderer.
+    rendered_fields = {"text_content": "text_content_html"}
+    renderer = "linebreaks"
+    text_content_html = models.TextField(blank=True, editable=False)
 
     # Optional image
     image = models.ImageField(
@@ -11,6 +11,8 @@
  *                   long gone by the time feedback comes back, so anything
  *                   injected afterwards has to be rendered explicitly.
  *
+ * Plus preview(), for NumSkull answers shown while they are still streaming.
+ *
  * Loaded from _base.html, so it is available to every page that extends it.
  * The phone upload page deliberately does not extend _base and keeps its own
  * copy -- see students/templates/students/work_mobile.html.
@@ -41,6 +43,21 @@
       .replace(/(^|[\s(])\*([^*\n]+?)\*(?=[\s.,;:)]|$)/g, "$1<em>$2</em>");
   }
 
+  /* Stand-in formatting for an answer still arriving token by token: escaped
+   * text, tidy()'s emphasis, paragraphs and line breaks. Maths renders as
+   * soon as its closing delimiter arrives. The server's full Markdown
+   * rendering replaces all of it once the answer is complete.
+   */
+  function preview(text) {
+    var escaped = (text || "")
+      .replace(/&/g, "&amp;")
+      .replace(/</g, "&lt;")
+      .replace(/>/g, "&gt;");
+    return tidy(escaped).split(/\n{2,}/).map(function (para) {
+      return "<p>" + para.replace(/\n/g, "<br>") + "</p>";
+    }).join("");
+  }
+
   /* Safe to call when KaTeX has not loaded or the element is missing: the text
    * keeps its dollars and stays readable, which is how every call site behaved
    * before this was shared. Returns whether it actually rendered.
@@ -61,6 +78,7 @@
 
   window.Feedback = {
     tidy: tidy,
+    preview: preview,
     renderMaths: renderMaths,
     DELIMITERS: DELIMITERS
   };
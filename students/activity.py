@@ -0,0 +1,114 @@
+"""
+Coalesced UserSession.last_activity writes.
+
+SessionActivityMiddleware used to load and save the UserSession row on every
+authenticated request: a SELECT and an UPDATE per page, per AJAX call, just
+to move a timestamp nobody needs to the second.
+
+Requests now only record a heartbeat in this process's ActivityTracker. A
+session already written within SESSION_ACTIVITY_GRANULARITY seconds is not
+even buffered. Every SESSION_ACTIVITY_FLUSH_INTERVAL seconds the middleware
+flushes the buffer as one UPDATE, which also skips rows another worker has
+written more recently than the granularity allows.
+
+So the "Active Sessions" admin shows last_activity at most
+granularity + flush interval behind while the worker keeps serving requests.
+Flushes only happen on a request, though: a worker that goes idle keeps its
+last heartbeats until its next request, or until it exits. A flush that
+fails keeps its heartbeats buffered for the next one.
+"""
+import atexit
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Sessions per UPDATE statement.
+FLUSH_BATCH = 200
+
+
+class ActivityTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}    # session_key -> latest heartbeat not yet written
+        self._written = {}    # session_key -> last timestamp this process wrote
+        self._flushed_at = None
+
+    @staticmethod
+    def granularity():
+        return timedelta(seconds=getattr(settings, 'SESSION_ACTIVITY_GRANULARITY', 60))
+
+    def touch(self, session_key, now=None):
+        """Record activity on a session. Returns True if it will be written."""
+        now = now or timezone.now()
+        with self._lock:
+            written = self._written.get(session_key)
+            if written is not None and now - written < self.granularity():
+                return False
+            self._pending[session_key] = now
+            return True
+
+    def due(self, now=None):
+        """Whether the buffer should be flushed now."""
+        now = now or timezone.now()
+        interval = getattr(settings, 'SESSION_ACTIVITY_FLUSH_INTERVAL', 30)
+        with self._lock:
+            if not self._pending:
+                return False
+            return self._flushed_at is None or (now - self._flushed_at).total_seconds() >= interval
+
+    def flush(self, now=None):
+        """Write every buffered heartbeat in bulk. Returns the rows updated."""
+        from .models import UserSession
+
+        now = now or timezone.now()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = now
+            # Forget sessions quiet for longer than the granularity; their next
+            # heartbeat is written anyway.
+            cutoff = now - self.granularity()
+            self._written = {key: at for key, at in self._written.items() if at >= cutoff}
+        if not pending:
+            return 0
+
+        granularity = self.granularity()
+        items = list(pending.items())
+        updated = 0
+        for start in range(0, len(items), FLUSH_BATCH):
+            batch = dict(items[start:start + FLUSH_BATCH])
+            try:
+                # Each row only moves forward, and only if its stored value is
+                # more than the granularity older than the heartbeat.
+                updated += UserSession.objects.filter(
+                    session_key__in=batch, last_activity__lt=max(batch.values()) - granularity,
+                ).update(last_activity=Case(
+                    *(
+                        When(session_key=key, last_activity__lt=at - granularity, then=Value(at))
+                        for key, at in batch.items()
+                    ),
+                    default=F('last_activity'),
+                    output_field=DateTimeField(),
+                ))
+            except Exception:
+                # Activity is advisory: never fail a request over it. Keep the
+                # unwritten heartbeats (unless newer ones arrived) for next time.
+                logger.warning("Could not write session activity", exc_info=True)
+                unwritten = dict(items[start:])
+                with self._lock:
+                    for key, at in unwritten.items():
+                        if self._pending.get(key, at) <= at:
+                            self._pending[key] = at
+                break
+            with self._lock:
+                self._written.update(batch)
+        return updated
+
+
+tracker = ActivityTracker()
+atexit.register(tracker.flush)
@@ -6,12 +6,6 @@ from django.http import HttpResponse
 from django.db.models import Count, Avg, Q
 from datetime import timedelta
 from io import BytesIO
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
 from .models import StudentProfile, QuestionAttempt, RegistrationCode, LoginHistory, UserSession, QuestionFeedback, WorkSubmission
 
 
@@ -97,7 +91,14 @@ class StudentProfileAdmin(admin.ModelAdmin):
 
         student_stats.sort(key=lambda x: x['attempt_count'], reverse=True)
 
-        # Generate PDF
+        # Generate PDF (reportlab is imported here, not at startup: only these reports use it)
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_CENTER
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
         story = []
@@ -296,7 +297,14 @@ class StudentProfileAdmin(admin.ModelAdmin):
                         'topics': list(topics),
                     })
 
-        # Generate PDF
+        # Generate PDF (reportlab is imported here, not at startup: only these reports use it)
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_CENTER
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
         story = []
@@ -464,7 +472,14 @@ class StudentProfileAdmin(admin.ModelAdmin):
         # Sort topic_breakdown by total attempts (descending)
         topic_breakdown.sort(key=lambda x: sum(t['attempt_count'] for t in x['topics']), reverse=True)
 
-        # Generate PDF
+        # Generate PDF (reportlab is imported here, not at startup: only these reports use it)
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_CENTER
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
         story = []
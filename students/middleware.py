@@ -1,14 +1,13 @@
 """
 Middleware to track user session activity
 """
-from django.utils import timezone
-from django.contrib.sessions.models import Session
-from .models import UserSession
+from .activity import tracker
 
 
 class SessionActivityMiddleware:
     """
-    Middleware to update the last_activity timestamp for active sessions
+    Middleware to update the last_activity timestamp for active sessions.
+    Heartbeats are buffered and written in bulk (see students/activity.py).
     """
     def __init__(self, get_response):
         self.get_response = get_response
@@ -16,10 +15,10 @@ class SessionActivityMiddleware:
     def __call__(self, request):
         # Update session activity before processing the request
         if request.user.is_authenticated and hasattr(request, 'session') and request.session.session_key:
-            user_session = UserSession.objects.filter(session_key=request.session.session_key).first()
-            if user_session:
-                # The last_activity field has auto_now=True, so it will update automatically
-                user_session.save()
+            tracker.touch(request.session.session_key)
 
         response = self.get_response(request)
+
+        if tracker.due():
+            tracker.flush()
         return response
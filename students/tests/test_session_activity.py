@@ -0,0 +1,95 @@
+"""Session activity is buffered and written in bulk, not saved on every request.
+
+SessionActivityMiddleware used to load and save the UserSession row on every
+authenticated request. Heartbeats now go through students/activity.py, which
+writes a session at most once per SESSION_ACTIVITY_GRANULARITY and never
+moves last_activity backwards.
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from students.activity import ActivityTracker
+from students.models import UserSession
+
+
+@override_settings(SESSION_ACTIVITY_GRANULARITY=60, SESSION_ACTIVITY_FLUSH_INTERVAL=30)
+class ActivityTrackerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("sorcha")
+        self.start = timezone.now() - timedelta(hours=1)
+        UserSession.objects.create(user=self.user, session_key="a" * 32)
+        UserSession.objects.create(user=self.user, session_key="b" * 32)
+        UserSession.objects.update(last_activity=self.start)
+        self.tracker = ActivityTracker()
+
+    def last_activity(self, key):
+        return UserSession.objects.get(session_key=key).last_activity
+
+    def test_heartbeats_are_coalesced(self):
+        t0 = self.start + timedelta(minutes=5)
+        self.assertTrue(self.tracker.touch("a" * 32, t0))
+        self.assertTrue(self.tracker.touch("b" * 32, t0 + timedelta(seconds=1)))
+        self.assertTrue(self.tracker.due(t0))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.tracker.flush(t0 + timedelta(seconds=1)), 2)
+        self.assertEqual(self.last_activity("a" * 32), t0)
+        self.assertEqual(self.last_activity("b" * 32), t0 + timedelta(seconds=1))
+
+        # Within the granularity: not even buffered.
+        self.assertFalse(self.tracker.touch("a" * 32, t0 + timedelta(seconds=20)))
+        self.assertFalse(self.tracker.due(t0 + timedelta(minutes=5)))
+
+        later = t0 + timedelta(seconds=90)
+        self.assertTrue(self.tracker.touch("a" * 32, later))
+        self.assertFalse(self.tracker.due(t0 + timedelta(seconds=10)))
+        self.tracker.flush(later)
+        self.assertEqual(self.last_activity("a" * 32), later)
+
+    def test_failed_flush_keeps_the_heartbeats(self):
+        t0 = self.start + timedelta(minutes=5)
+        self.tracker.touch("a" * 32, t0)
+        with patch.object(UserSession.objects, "filter", side_effect=DatabaseError("locked")):
+            self.assertEqual(self.tracker.flush(t0), 0)
+        self.assertEqual(self.last_activity("a" * 32), self.start)
+        self.assertTrue(self.tracker.due(t0 + timedelta(seconds=30)))   # still buffered
+
+        # Not treated as written, so neither suppressed nor lost.
+        self.assertTrue(self.tracker.touch("a" * 32, t0 + timedelta(seconds=10)))
+        self.assertEqual(self.tracker.flush(t0 + timedelta(seconds=40)), 1)
+        self.assertEqual(self.last_activity("a" * 32), t0 + timedelta(seconds=10))
+
+    def test_never_moves_activity_backwards(self):
+        newer = self.start + timedelta(minutes=10)
+        UserSession.objects.filter(session_key="a" * 32).update(last_activity=newer)
+        self.tracker.touch("a" * 32, newer - timedelta(minutes=2))
+        self.tracker.touch("b" * 32, newer - timedelta(minutes=2))
+        self.tracker.flush()
+        self.assertEqual(self.last_activity("a" * 32), newer)
+        self.assertEqual(self.last_activity("b" * 32), newer - timedelta(minutes=2))
+
+
+class SessionActivityMiddlewareTests(TestCase):
+    def test_requests_do_not_touch_the_table_between_flushes(self):
+        user = User.objects.create_user("ronan", password="pw")
+        self.client.login(username="ronan", password="pw")
+        session = UserSession.objects.get(user=user)
+        UserSession.objects.update(last_activity=timezone.now() - timedelta(hours=1))
+
+        tracker = ActivityTracker()
+        with patch("students.middleware.tracker", tracker):
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(3):
+                    self.client.get(reverse("select_topic"))
+            writes = [q["sql"] for q in queries if "students_usersession" in q["sql"]]
+            self.assertEqual(len(writes), 1)
+            self.assertTrue(writes[0].startswith("UPDATE"))
+
+        session.refresh_from_db()
+        self.assertGreater(session.last_activity, timezone.now() - timedelta(minutes=1))